@@ -1,7 +1,73 @@
 from flask import Flask, jsonify, request
 import os
 
+from ban_manager import DEFAULT_RULES, BanManager
+from file_manager import FileManager
+from user_manager import SESSION_COOKIE, UserManager, parse_basic_auth
+
 app = Flask(__name__)
+file_manager = FileManager('uploaded_files')
+user_manager = UserManager()
+PUBLIC_ENDPOINTS = {'status', 'login'}
+# Échecs d'authentification par adresse : au-delà, plus aucune dérivation de mot de passe pendant le bannissement
+login_limiter = BanManager(rules={'auth_failure': DEFAULT_RULES['auth_failure']}, ban_duration=300)
+
+def too_many_failures():
+    return jsonify({'error': 'too many failed logins'}), 429
+
+def batch_selection_error(data):
+    """Vérifier les champs 'names' et 'pattern' d'une opération par lot ; retourne un message d'erreur ou None."""
+    if not isinstance(data, dict):
+        return "request body must be a JSON object"
+    names = data.get('names')
+    if names is not None and not (isinstance(names, list) and all(isinstance(name, str) for name in names)):
+        return "'names' must be a list of file names"
+    if data.get('pattern') is not None and not isinstance(data['pattern'], str):
+        return "'pattern' must be a string"
+    return None
+
+@app.before_request
+def require_authentication():
+    """Exiger un jeton de session (Bearer ou cookie) ou des identifiants HTTP Basic, puis appliquer les règles d'accès."""
+    if request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    header = request.headers.get('Authorization', '')
+    token = header[7:].strip() if header[:7].lower() == 'bearer ' else request.cookies.get(SESSION_COOKIE)
+    user = user_manager.validate_session(token) if token else None
+    username = user['username'] if user else None
+    if username is None:
+        name, password = parse_basic_auth(header)
+        if name is not None:
+            if login_limiter.is_banned(request.remote_addr):
+                return too_many_failures()
+            if user_manager.authenticate_cached(name, password):
+                username = name
+            else:
+                login_limiter.record(request.remote_addr, 'auth_failure')
+    if username is None:
+        return jsonify({'error': 'authentication required'}), 401, {'WWW-Authenticate': 'Bearer, Basic realm="api"'}
+    if not user_manager.is_allowed(username, request.path):
+        return jsonify({'error': 'forbidden'}), 403
+    return None
+
+@app.route('/login', methods=['POST'])
+def login():
+    if login_limiter.is_banned(request.remote_addr):
+        return too_many_failures()
+    data = request.get_json(silent=True) or {}
+    token = user_manager.login(str(data.get('username', '')), str(data.get('password', '')))
+    if token is None:
+        login_limiter.record(request.remote_addr, 'auth_failure')
+        return jsonify({'error': 'invalid credentials'}), 401
+    return jsonify({'token': token, 'expires_in': user_manager.sessions.ttl})
+
+@app.route('/logout', methods=['POST'])
+def logout():
+    header = request.headers.get('Authorization', '')
+    token = header[7:].strip() if header[:7].lower() == 'bearer ' else request.cookies.get(SESSION_COOKIE)
+    if token:
+        user_manager.logout(token)
+    return jsonify({'status': 'ok'})
 
 @app.route('/status')
 def status():
@@ -16,5 +82,34 @@ def list_files():
             files.append(file)
     return jsonify({'files': files})
 
+@app.route('/files/delete', methods=['POST'])
+def delete_files():
+    data = request.get_json(silent=True) or {}
+    error = batch_selection_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    # L'index relit lui-même les répertoires modifiés par l'interface graphique (FileManager.refresh)
+    result = file_manager.delete_files(data.get('names'), data.get('pattern'))
+    return jsonify(result)
+
+@app.route('/files/rename', methods=['POST'])
+def rename_files():
+    data = request.get_json(silent=True) or {}
+    renames = data.get('renames') if isinstance(data, dict) else None
+    if not isinstance(renames, dict) or not all(isinstance(name, str) for name in renames.values()):
+        return jsonify({'error': "'renames' must be an object mapping old names to new names"}), 400
+    return jsonify(file_manager.rename_files(renames))
+
+@app.route('/files/move', methods=['POST'])
+def move_files():
+    data = request.get_json(silent=True) or {}
+    error = batch_selection_error(data)
+    if error:
+        return jsonify({'error': error}), 400
+    if not isinstance(data.get('destination'), str):
+        return jsonify({'error': "'destination' is required and must be a string"}), 400
+    result = file_manager.move_files(data['destination'], data.get('names'), data.get('pattern'))
+    return jsonify(result)
+
 if __name__ == '__main__':
     app.run(port=5000)
\ No newline at end of file
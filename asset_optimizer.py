@@ -0,0 +1,201 @@
+import io
+import os
+import re
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+TEXT_EXTENSIONS = ('.css', '.js')
+
+# Suffixes des variantes générées : nom.opt.png, nom.min.css, nom.w320.jpg
+VARIANT_PATTERN = re.compile(r'\.(opt|min|w\d+)\.[^./]+$', re.IGNORECASE)
+
+CSS_TOKEN = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/|\s+', re.DOTALL)
+CSS_PUNCTUATION = '{};,>'
+
+
+def variant_path(file_path, tag):
+    """Construire le chemin d'une variante à côté du fichier d'origine."""
+    name, ext = os.path.splitext(file_path)
+    return f"{name}.{tag}{ext}"
+
+
+def is_variant(file_path):
+    """Vérifier si un fichier est une variante générée."""
+    return bool(VARIANT_PATTERN.search(file_path))
+
+
+def original_path(file_path):
+    """Chemin du fichier d'origine d'une variante (nom.w320.jpg -> nom.jpg), ou le chemin lui-même."""
+    match = VARIANT_PATTERN.search(file_path)
+    if not match:
+        return file_path
+    return file_path[:match.start()] + file_path[match.end(1):]
+
+
+def renamed_variant(file_path, new_original):
+    """Nom d'une variante après renommage de son original (nom.min.css -> autre.min.css)."""
+    return variant_path(new_original, VARIANT_PATTERN.search(file_path).group(1))
+
+
+def best_variant(file_path, original_of):
+    """Obtenir la variante optimisée la plus légère et à jour d'un fichier, ou le fichier lui-même ;
+    original_of(chemin) donne l'original d'une variante créée par l'optimiseur, None pour un fichier ordinaire."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        candidate = variant_path(file_path, 'min')
+    elif ext in IMAGE_EXTENSIONS:
+        candidate = variant_path(file_path, 'opt')
+    else:
+        return file_path
+    try:
+        candidate_stat, original_stat = os.stat(candidate), os.stat(file_path)
+    except OSError:
+        return file_path
+    # Un nom.min.css téléchargé par l'utilisateur n'est pas une variante de nom.css
+    original = original_of(candidate)
+    try:
+        if original is None or not os.path.samefile(original, file_path):
+            return file_path
+    except OSError:
+        return file_path
+    # Une variante plus ancienne que l'original date d'une version remplacée depuis
+    if candidate_stat.st_mtime >= original_stat.st_mtime and candidate_stat.st_size < original_stat.st_size:
+        return candidate
+    return file_path
+
+
+def minify_css(text):
+    """Minifier une feuille de style en préservant les chaînes."""
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        if match.group(0).startswith('/*'):
+            return ''
+        before = match.string[match.start() - 1:match.start()]
+        after = match.string[match.end():match.end() + 1]
+        if not before or not after or before in CSS_PUNCTUATION or after in CSS_PUNCTUATION:
+            return ''
+        return ' '
+    return CSS_TOKEN.sub(replace, text).strip()
+
+
+def minify_js(text):
+    """Minifier un script de façon conservatrice (espaces et commentaires de ligne)."""
+    if '`' in text:
+        # Les littéraux de gabarit peuvent contenir des retours à la ligne significatifs
+        return '\n'.join(line.rstrip() for line in text.splitlines()).strip()
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def _write_variant(dest_path, data):
+    # Création exclusive : un fichier existant (celui de l'utilisateur) n'est jamais écrasé ; les variantes d'une
+    # version remplacée sont supprimées par FileManager avant une nouvelle optimisation
+    try:
+        f = open(dest_path, 'xb')
+    except FileExistsError:
+        return False
+    try:
+        with f:
+            f.write(data)
+    except BaseException:
+        os.remove(dest_path)
+        raise
+    return True
+
+
+def _write_if_smaller(file_path, dest_path, data):
+    return len(data) < os.path.getsize(file_path) and _write_variant(dest_path, data)
+
+
+def _optimize_image(file_path, jpeg_quality, thumbnail_widths):
+    created = []
+    ext = os.path.splitext(file_path)[1].lower()
+    with Image.open(file_path) as img:
+        img.load()
+        save_args = {'format': 'PNG', 'optimize': True}
+        if ext in ('.jpg', '.jpeg'):
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+            save_args = {'format': 'JPEG', 'quality': jpeg_quality, 'optimize': True, 'progressive': True}
+
+        buffer = io.BytesIO()
+        img.save(buffer, **save_args)
+        dest_path = variant_path(file_path, 'opt')
+        if _write_if_smaller(file_path, dest_path, buffer.getvalue()):
+            created.append(dest_path)
+
+        for width in thumbnail_widths:
+            if img.width <= width:
+                continue
+            height = max(1, round(img.height * width / img.width))
+            thumbnail = img.resize((width, height), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, **save_args)
+            dest_path = variant_path(file_path, f'w{width}')
+            if _write_variant(dest_path, buffer.getvalue()):
+                created.append(dest_path)
+    return created
+
+
+def optimize_asset(file_path, jpeg_quality=85, thumbnail_widths=THUMBNAIL_WIDTHS):
+    """Générer les variantes optimisées d'un fichier (exécuté dans un processus du pool)."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if is_variant(file_path):
+        return []
+    if ext in TEXT_EXTENSIONS:
+        with open(file_path, 'r', encoding='utf-8', errors='surrogateescape') as f:
+            text = f.read()
+        minified = minify_css(text) if ext == '.css' else minify_js(text)
+        dest_path = variant_path(file_path, 'min')
+        data = minified.encode('utf-8', errors='surrogateescape')
+        return [dest_path] if _write_if_smaller(file_path, dest_path, data) else []
+    if ext in IMAGE_EXTENSIONS and PIL_AVAILABLE:
+        return _optimize_image(file_path, jpeg_quality, thumbnail_widths)
+    return []
+
+
+class AssetOptimizer:
+    def __init__(self, jpeg_quality=85, thumbnail_widths=THUMBNAIL_WIDTHS, workers=None):
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_widths = tuple(thumbnail_widths)
+        self.workers = workers
+        self.executor = None
+
+    def submit(self, file_path, callback=None):
+        """Planifier l'optimisation d'un fichier sur le pool de processus."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        future = self.executor.submit(optimize_asset, file_path, self.jpeg_quality, self.thumbnail_widths)
+
+        def done(future):
+            try:
+                created = future.result()
+            except Exception as e:
+                logging.error(f"Failed to optimize {file_path}: {e}")
+                return
+            if created:
+                logging.info(f"Optimized variants created for {os.path.basename(file_path)}: {len(created)}")
+            if callback:
+                callback(created)
+
+        future.add_done_callback(done)
+        return future
+
+    def shutdown(self):
+        """Arrêter le pool de processus."""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
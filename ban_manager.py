@@ -0,0 +1,135 @@
+import time
+import heapq
+import logging
+import threading
+from collections import deque
+
+# Règles par défaut : événement -> (nombre maximal d'événements, fenêtre glissante en secondes)
+DEFAULT_RULES = {
+    'not_found': (20, 60),   # réponses 404 (recherche de fichiers sensibles, scanners)
+    'request': (200, 10),    # rafales de requêtes HTTP (chaque requête compte, connexion persistante ou non)
+    'tls_error': (5, 60),    # poignées de main TLS échouées
+    'auth_failure': (10, 300),  # identifiants refusés
+}
+REASONS = {
+    'not_found': "too many 404 responses",
+    'request': "request burst",
+    'tls_error': "failed TLS handshakes",
+    'auth_failure': "too many failed logins",
+}
+
+class BanManager:
+    """Bannissement temporaire des adresses au comportement abusif, à la manière de fail2ban."""
+
+    def __init__(self, rules=None, ban_duration=600, max_ban_duration=86400, exempt=None, max_tracked=100000):
+        self.rules = dict(DEFAULT_RULES if rules is None else rules)
+        self.ban_duration = ban_duration
+        # Chaque nouveau bannissement d'une même adresse double la durée, jusqu'à cette limite
+        self.max_ban_duration = max_ban_duration
+        # Fonction indiquant les adresses à ne jamais bannir (ex. liste autorisée)
+        self.exempt = exempt
+        self.max_tracked = max_tracked
+        self.enabled = True
+        self.bans = {}
+        # Adresse -> (nombre de bannissements, date d'oubli) ; oubliée max_ban_duration après la fin du dernier
+        self.strikes = {}
+        self._events = {}
+        # Tas (expiration, adresse) : la prochaine expiration est toujours en tête, retrait en O(log n)
+        self._heap = []
+        self._strike_heap = []
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def _expire(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            expires, ip = heapq.heappop(self._heap)
+            ban = self.bans.get(ip)
+            # Entrée périmée (bannissement prolongé ou levé entre-temps) : ignorée
+            if ban and ban['expires'] == expires:
+                del self.bans[ip]
+                self.version += 1
+                logging.info(f"Ban expired for {ip}")
+        while self._strike_heap and self._strike_heap[0][0] <= now:
+            forget, ip = heapq.heappop(self._strike_heap)
+            # Sans nouveau bannissement depuis, la récidive est oubliée
+            if self.strikes.get(ip, (0, None))[1] == forget:
+                del self.strikes[ip]
+
+    def _prune(self, now):
+        """Oublier les compteurs sans événement récent pour borner la mémoire."""
+        longest = max((window for _, window in self.rules.values()), default=0)
+        for key in [key for key, events in self._events.items() if not events or events[-1] <= now - longest]:
+            del self._events[key]
+
+    def _ban(self, ip, reason, now, duration=None):
+        self._expire(now)
+        strikes = self.strikes.get(ip, (0, None))[0] + 1
+        if duration is None:
+            duration = min(self.max_ban_duration, self.ban_duration * 2 ** (strikes - 1))
+        expires = now + duration
+        forget = expires + self.max_ban_duration
+        self.strikes[ip] = (strikes, forget)
+        heapq.heappush(self._strike_heap, (forget, ip))
+        self.bans[ip] = {'ip': ip, 'reason': reason, 'since': now, 'expires': expires, 'count': strikes}
+        heapq.heappush(self._heap, (expires, ip))
+        self.version += 1
+        logging.warning(f"Banned {ip} for {duration:.0f}s: {reason}")
+
+    def record(self, ip, event, now=None):
+        """Compter un événement pour une adresse ; retourne True si l'adresse est (ou vient d'être) bannie."""
+        rule = self.rules.get(event)
+        if not self.enabled or rule is None or (self.exempt and self.exempt(ip)):
+            return False
+        if now is None:
+            now = time.monotonic()
+        max_events, window = rule
+        with self._lock:
+            self._expire(now)
+            if ip in self.bans:
+                return True
+            events = self._events.get((ip, event))
+            if events is None:
+                if len(self._events) >= self.max_tracked:
+                    self._prune(now)
+                events = self._events[(ip, event)] = deque()
+            events.append(now)
+            while events and events[0] <= now - window:
+                events.popleft()
+            if len(events) < max_events:
+                return False
+            del self._events[(ip, event)]
+            self._ban(ip, REASONS.get(event, event), now)
+            return True
+
+    def ban(self, ip, reason="manual ban", duration=None, now=None):
+        """Bannir une adresse immédiatement."""
+        with self._lock:
+            self._ban(ip, reason, time.monotonic() if now is None else now, duration)
+
+    def unban(self, ip):
+        """Lever le bannissement d'une adresse (l'entrée du tas est ignorée à son expiration)."""
+        with self._lock:
+            self.strikes.pop(ip, None)
+            if self.bans.pop(ip, None) is None:
+                return False
+            self.version += 1
+            return True
+
+    def is_banned(self, ip, now=None):
+        """Vérifier si une adresse est bannie."""
+        if not self.bans:
+            return False
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return ip in self.bans
+
+    def get_bans(self, now=None):
+        """Bannissements en cours, du plus proche de l'expiration au plus lointain."""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            bans = [dict(ban, remaining=ban['expires'] - now) for ban in self.bans.values()]
+        return sorted(bans, key=lambda ban: ban['expires'])
@@ -0,0 +1,194 @@
+import asyncio
+import re
+import ssl
+
+HTTP_PORTS = {80, 8000, 8008, 8080, 8888}
+TLS_PORTS = {443, 465, 636, 853, 993, 995, 8443}
+
+# OID X.520 les plus courants dans les noms de certificats
+NAME_OIDS = {
+    '2.5.4.3': 'commonName',
+    '2.5.4.6': 'countryName',
+    '2.5.4.7': 'localityName',
+    '2.5.4.8': 'stateOrProvinceName',
+    '2.5.4.10': 'organizationName',
+    '2.5.4.11': 'organizationalUnitName',
+}
+
+
+def _der_element(data, offset):
+    """Lire un élément DER ; retourne (tag, début du contenu, fin de l'élément)."""
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7f
+        length = int.from_bytes(data[offset:offset + count], 'big')
+        offset += count
+    return tag, offset, offset + length
+
+
+def _der_children(data, start, end):
+    children = []
+    while start < end:
+        tag, content, start = _der_element(data, start)
+        children.append((tag, content, start))
+    return children
+
+
+def _decode_oid(raw):
+    first = raw[0]
+    parts = [str(min(first // 40, 2)), str(first - 40 * min(first // 40, 2))]
+    value = 0
+    for byte in raw[1:]:
+        value = (value << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            parts.append(str(value))
+            value = 0
+    return '.'.join(parts)
+
+
+def _decode_name(data, start, end):
+    name = {}
+    for _, set_start, set_end in _der_children(data, start, end):
+        for _, attr_start, attr_end in _der_children(data, set_start, set_end):
+            (_, oid_start, oid_end), (tag, value_start, value_end) = _der_children(data, attr_start, attr_end)[:2]
+            oid = _decode_oid(data[oid_start:oid_end])
+            encoding = 'utf-16-be' if tag == 0x1e else 'utf-8'
+            name[NAME_OIDS.get(oid, oid)] = data[value_start:value_end].decode(encoding, errors='replace')
+    return name
+
+
+def parse_certificate(der):
+    """Extraire le sujet et l'émetteur d'un certificat X.509 encodé en DER."""
+    _, cert_start, cert_end = _der_element(der, 0)
+    _, tbs_start, tbs_end = _der_element(der, cert_start)
+    fields = _der_children(der, tbs_start, tbs_end)
+    if fields and fields[0][0] == 0xa0:
+        # Champ de version explicite [0]
+        fields = fields[1:]
+    # serialNumber, signature, issuer, validity, subject
+    issuer, subject = fields[2], fields[4]
+    return {
+        'subject': _decode_name(der, subject[1], subject[2]),
+        'issuer': _decode_name(der, issuer[1], issuer[2]),
+    }
+
+
+def classify_banner(banner):
+    """Identifier un service à partir de son message d'accueil."""
+    if banner.startswith('SSH-'):
+        return 'ssh'
+    if banner.startswith('HTTP/'):
+        return 'http'
+    if re.match(r'^220[ -]', banner):
+        upper = banner.upper()
+        if 'SMTP' in upper or 'MAIL' in upper:
+            return 'smtp'
+        if 'FTP' in upper:
+            return 'ftp'
+        return 'ftp/smtp'
+    if banner.startswith('+OK'):
+        return 'pop3'
+    if banner.startswith('* OK'):
+        return 'imap'
+    return 'unknown'
+
+
+def parse_http_response(raw):
+    """Extraire la ligne de statut et l'en-tête Server d'une réponse HTTP."""
+    head = raw.split('\r\n\r\n', 1)[0]
+    lines = head.split('\r\n')
+    server = None
+    for line in lines[1:]:
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'server':
+            server = value.strip()
+    return lines[0], server
+
+
+class BannerGrabber:
+    def __init__(self, timeout=3.0, greeting_timeout=1.0, concurrency=50, read_limit=1024):
+        self.timeout = timeout
+        self.greeting_timeout = greeting_timeout
+        self.concurrency = concurrency
+        self.read_limit = read_limit
+        self.tls_context = ssl.create_default_context()
+        # On cherche à identifier le service, pas à valider le certificat
+        self.tls_context.check_hostname = False
+        self.tls_context.verify_mode = ssl.CERT_NONE
+
+    async def _read_greeting(self, reader):
+        try:
+            data = await asyncio.wait_for(reader.read(self.read_limit), self.greeting_timeout)
+        except asyncio.TimeoutError:
+            return ''
+        return data.decode('latin-1').strip()
+
+    async def _http_head(self, host, reader, writer):
+        writer.write(f"HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: PortForwardingManager\r\n\r\n".encode())
+        await writer.drain()
+        data = await reader.read(self.read_limit * 4)
+        return data.decode('latin-1')
+
+    async def _probe(self, host, port):
+        result = {'port': port, 'service': 'unknown', 'banner': '', 'status': None, 'server': None,
+                  'tls': None, 'error': None}
+        use_tls = port in TLS_PORTS
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self.tls_context if use_tls else None,
+            server_hostname=host if use_tls else None
+        )
+        try:
+            if use_tls:
+                der = writer.get_extra_info('ssl_object').getpeercert(binary_form=True)
+                result['tls'] = parse_certificate(der) if der else {}
+                result['service'] = 'tls'
+
+            banner = '' if port in HTTP_PORTS else await self._read_greeting(reader)
+            if banner:
+                result['banner'] = banner.splitlines()[0]
+                result['service'] = classify_banner(banner)
+            else:
+                # Service silencieux : tenter une requête HTTP HEAD
+                response = await self._http_head(host, reader, writer)
+                if response.startswith('HTTP/'):
+                    result['status'], result['server'] = parse_http_response(response)
+                    result['banner'] = result['status']
+                    result['service'] = 'https' if use_tls else 'http'
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+        return result
+
+    async def grab(self, host, port):
+        """Identifier le service d'un port avec un délai strict par sonde."""
+        try:
+            return await asyncio.wait_for(self._probe(host, port), self.timeout)
+        except asyncio.TimeoutError:
+            error = 'timeout'
+        except (OSError, ssl.SSLError, ValueError, IndexError) as e:
+            error = str(e) or e.__class__.__name__
+        return {'port': port, 'service': 'unknown', 'banner': '', 'status': None, 'server': None,
+                'tls': None, 'error': error}
+
+    async def grab_many(self, host, ports, on_result=None):
+        """Identifier plusieurs ports en limitant le nombre de sondes simultanées."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited(port):
+            async with semaphore:
+                result = await self.grab(host, port)
+            if on_result:
+                on_result(result)
+            return result
+
+        results = await asyncio.gather(*(limited(port) for port in ports))
+        return sorted(results, key=lambda result: result['port'])
+
+    def grab_banners(self, host, ports, on_result=None):
+        """Version synchrone de grab_many."""
+        return asyncio.run(self.grab_many(host, ports, on_result))
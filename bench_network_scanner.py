@@ -0,0 +1,160 @@
+"""Banc d'essai du scanner de ports sur des écouteurs locaux.
+
+Exemple : python bench_network_scanner.py --open 50 --closed 2000 --tarpit 20 --concurrency 50 200 500
+"""
+import os
+import json
+import time
+import socket
+import argparse
+import threading
+
+from network_scanner import AdaptiveTimeout, NetworkScanner
+
+HOST = '127.0.0.1'
+
+
+def fd_count():
+    """Nombre de descripteurs ouverts par le processus (None si /proc n'est pas disponible)."""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+class FdMonitor:
+    """Échantillonner le nombre de descripteurs ouverts pour en relever le maximum."""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = fd_count()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            count = fd_count()
+            if count is not None and count > self.peak:
+                self.peak = count
+
+    def __enter__(self):
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+
+class ListenerFixtures:
+    """Ports locaux ouverts, fermés et « tarpit » (connexion jamais acceptée)."""
+
+    def __init__(self, open_count=50, closed_count=1000, tarpit_count=10):
+        self.open_count = open_count
+        self.closed_count = closed_count
+        self.tarpit_count = tarpit_count
+        self.open_ports = []
+        self.closed_ports = []
+        self.tarpit_ports = []
+        self._sockets = []
+
+    def _bind(self):
+        sock = socket.socket()
+        sock.bind((HOST, 0))
+        self._sockets.append(sock)
+        return sock
+
+    def _tarpit(self):
+        # File d'attente de taille 0 remplie par une connexion : les SYN suivants sont ignorés
+        sock = self._bind()
+        sock.listen(0)
+        filler = socket.socket()
+        filler.connect(sock.getsockname())
+        self._sockets.append(filler)
+        return sock.getsockname()[1]
+
+    def __enter__(self):
+        try:
+            for _ in range(self.open_count):
+                sock = self._bind()
+                sock.listen(128)
+                self.open_ports.append(sock.getsockname()[1])
+            for _ in range(self.closed_count):
+                # Un socket lié sans écoute réserve le port et répond RST aux connexions
+                self.closed_ports.append(self._bind().getsockname()[1])
+            for _ in range(self.tarpit_count):
+                self.tarpit_ports.append(self._tarpit())
+        except OSError:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+
+    @property
+    def ports(self):
+        return sorted(self.open_ports + self.closed_ports + self.tarpit_ports)
+
+
+def run_benchmark(fixtures, concurrency, timeout=1.0):
+    """Scanner les ports des fixtures et mesurer durée, débit, CPU et descripteurs."""
+    ports = fixtures.ports
+    fds_before = fd_count()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    with FdMonitor() as monitor:
+        open_ports = NetworkScanner.scan_port_list(
+            HOST, ports, concurrency=concurrency,
+            timeout=AdaptiveTimeout(initial=timeout, maximum=timeout)
+        )
+    elapsed = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'ports': len(ports),
+        'elapsed': elapsed,
+        'ports_per_s': len(ports) / max(elapsed, 1e-9),
+        'cpu': time.process_time() - cpu_start,
+        'fd_peak': monitor.peak - fds_before if monitor.peak is not None else None,
+        'correct': open_ports == sorted(fixtures.open_ports),
+    }
+
+
+def format_results(results):
+    """Mettre en forme les résultats sous forme de tableau."""
+    lines = [f"{'concurrency':>11} {'ports':>7} {'wall s':>8} {'ports/s':>9} {'cpu s':>7} {'fd peak':>8} correct"]
+    for r in results:
+        fd_peak = '-' if r['fd_peak'] is None else r['fd_peak']
+        lines.append(f"{r['concurrency']:>11} {r['ports']:>7} {r['elapsed']:>8.3f} {r['ports_per_s']:>9.0f} "
+                     f"{r['cpu']:>7.3f} {fd_peak:>8} {'yes' if r['correct'] else 'NO'}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark NetworkScanner against local listeners.")
+    parser.add_argument('--open', type=int, default=50, help="number of listening ports")
+    parser.add_argument('--closed', type=int, default=1000, help="number of closed ports")
+    parser.add_argument('--tarpit', type=int, default=10, help="number of ports that never complete the handshake")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--timeout', type=float, default=1.0, help="maximum probe timeout in seconds")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with ListenerFixtures(args.open, args.closed, args.tarpit) as fixtures:
+        for concurrency in args.concurrency:
+            for _ in range(args.repeat):
+                results.append(run_benchmark(fixtures, concurrency, args.timeout))
+
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+    return results
+
+
+if __name__ == '__main__':
+    main()
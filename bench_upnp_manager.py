@@ -0,0 +1,134 @@
+"""Banc d'essai de UPnPManager sur des passerelles simulées (mock_igd, mock_natpmp).
+
+Exemple : python bench_upnp_manager.py --table-size 0 500 --latency 5 --mappings 20
+"""
+import json
+import time
+import argparse
+import statistics
+
+from igd_client import IGDClient
+from mock_igd import MockIGD
+from mock_natpmp import MockNatPmp
+from natpmp_client import NatPmpClient
+from upnp_manager import UPnPManager
+
+HOST = '127.0.0.1'
+FIRST_PORT = 30000  # hors de la plage remplie par MockIGD.populate
+BACKENDS = ('upnp-v2', 'upnp-v1', 'pcp', 'natpmp')
+
+
+def _gateway(backend, table_size, latency, fail_rate, seed):
+    """Passerelle simulée et fabrique de client correspondant à un chemin du gestionnaire."""
+    if backend in ('pcp', 'natpmp'):
+        gateway = MockNatPmp(HOST, pcp=backend == 'pcp', latency=latency).start()
+        return gateway, lambda: NatPmpClient(gateway=gateway.address)
+    gateway = MockIGD(HOST, version=2 if backend == 'upnp-v2' else 1, latency=latency, table_size=table_size,
+                      fail_rate=fail_rate, seed=seed).start()
+    return gateway, lambda: IGDClient([HOST], gateway.ssdp_address)
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def run_benchmark(backend='upnp-v2', table_size=0, latency=0.0, mappings=20, workers=8, fail_rate=0.0, seed=1):
+    """Mesurer découverte, ajout/suppression (un par un et par lot) et lecture de la table."""
+    gateway, factory = _gateway(backend, table_size, latency, fail_rate, seed)
+    try:
+        discovery, manager = _timed(lambda: UPnPManager(backends=[factory], background=False))
+        if not manager.ready:
+            raise RuntimeError(f"discovery failed: {manager.error}")
+
+        single_ports = range(FIRST_PORT, FIRST_PORT + mappings)
+        batch_ports = range(FIRST_PORT + mappings, FIRST_PORT + 2 * mappings)
+        errors = 0
+        add_times = []
+        for port in single_ports:
+            elapsed, ok = _timed(manager.add_port_mapping, port)
+            add_times.append(elapsed)
+            errors += not ok
+        batch_add, results = _timed(manager.add_port_mappings, list(batch_ports), 'Benchmark', 0, workers)
+        errors += sum(not r['ok'] for r in results)
+
+        list_time, entries = _timed(manager.list_port_mappings, True)
+        cached_list_time, _ = _timed(manager.list_port_mappings)
+
+        delete_times = []
+        for port in single_ports:
+            elapsed, ok = _timed(manager.delete_port_mapping, port)
+            delete_times.append(elapsed)
+            errors += not ok
+        batch_delete, results = _timed(manager.delete_port_mappings, list(batch_ports), workers)
+        errors += sum(not r['ok'] for r in results)
+    finally:
+        gateway.stop()
+
+    return {
+        'backend': backend,
+        'table_size': table_size,
+        'latency_ms': latency * 1000,
+        'mappings': mappings,
+        'discovery': discovery,
+        'add_median': statistics.median(add_times),
+        'add_p95': _percentile(add_times, 0.95),
+        'batch_add': batch_add,
+        'list': list_time,
+        'list_cached': cached_list_time,
+        'listed': len(entries),
+        'bulk_listing': manager.bulk_listing,
+        'delete_median': statistics.median(delete_times),
+        'batch_delete': batch_delete,
+        'errors': errors,
+    }
+
+
+def format_results(results):
+    """Mettre en forme les résultats sous forme de tableau (durées en millisecondes)."""
+    columns = [('backend', 'backend', '>8', None), ('table', 'table_size', '>6', None),
+               ('lat ms', 'latency_ms', '>7.1f', None), ('discover', 'discovery', '>9.1f', 1000),
+               ('add med', 'add_median', '>8.2f', 1000), ('add p95', 'add_p95', '>8.2f', 1000),
+               ('batch add', 'batch_add', '>10.1f', 1000), ('list', 'list', '>8.1f', 1000),
+               ('cached', 'list_cached', '>7.3f', 1000), ('listed', 'listed', '>7', None),
+               ('del med', 'delete_median', '>8.2f', 1000), ('batch del', 'batch_delete', '>10.1f', 1000),
+               ('errors', 'errors', '>7', None)]
+    lines = [' '.join(f"{title:>{fmt[1:].split('.')[0]}}" for title, _, fmt, _ in columns)]
+    for r in results:
+        lines.append(' '.join(format(r[key] * scale if scale else r[key], fmt) for _, key, fmt, scale in columns))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark UPnPManager against local mock gateways.")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument('--table-size', type=int, nargs='+', default=[0, 200],
+                        help="pre-existing mappings on the UPnP gateway")
+    parser.add_argument('--latency', type=float, default=2.0, help="gateway response latency in milliseconds")
+    parser.add_argument('--mappings', type=int, default=20, help="mappings added one by one, and again as a batch")
+    parser.add_argument('--workers', type=int, default=8, help="batch concurrency")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="fraction of SOAP actions that fail")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for backend in args.backends:
+        # La table des passerelles NAT-PMP/PCP ne contient que nos propres règles
+        for table_size in args.table_size if backend.startswith('upnp') else [0]:
+            for _ in range(args.repeat):
+                results.append(run_benchmark(backend, table_size, args.latency / 1000, args.mappings,
+                                             args.workers, args.fail_rate))
+
+    print(json.dumps(results, indent=2) if args.json else format_results(results))
+    return results
+
+
+if __name__ == '__main__':
+    main()
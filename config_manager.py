@@ -1,6 +1,67 @@
 import json
 import os
 import logging
+import threading
+
+def _non_negative(value):
+    return value >= 0
+
+def _port(value):
+    return 1 <= value <= 65535
+
+def _string_list(value):
+    return all(isinstance(item, str) for item in value)
+
+def _ban_rules(value):
+    return all(isinstance(rule, list) and len(rule) == 2 and all(isinstance(n, int) and n > 0 for n in rule)
+               for rule in value.values())
+
+# Schéma de validation : clé -> (types acceptés, contrôle facultatif de la valeur)
+SCHEMA = {
+    'port': (int, _port),
+    'upnp_enabled': (bool, None),
+    'auto_start': (bool, None),
+    'theme': (str, lambda value: value in ('light', 'dark')),
+    'max_file_size': ((int, float), lambda value: value > 0),
+    'allowed_extensions': (list, lambda value: all(isinstance(ext, str) and ext.startswith('.') for ext in value)),
+    'quota_max_total_mb': (int, _non_negative),
+    'quota_max_files': (int, _non_negative),
+    'retention_max_age_days': (int, _non_negative),
+    'retention_keep_versions': (int, _non_negative),
+    'retention_sweep_interval': (int, lambda value: value > 0),
+    'optimize_uploads': (bool, None),
+    'jpeg_quality': (int, lambda value: 1 <= value <= 100),
+    'scrub_max_mb_per_s': ((int, float), _non_negative),
+    'advertise_interface': (str, None),
+    'port_search_range': (int, _non_negative),
+    'upnp_extra_ports': (list, _string_list),
+    'upnp_description': (str, None),
+    'upnp_lease_duration': (int, _non_negative),
+    'upnp_check_interval': (int, lambda value: value > 0),
+    'natpmp_enabled': (bool, None),
+    'auto_ban_enabled': (bool, None),
+    'auto_ban_duration': (int, lambda value: value > 0),
+    'auto_ban_rules': (dict, _ban_rules),
+    'web_auth_enabled': (bool, None),
+    'session_ttl': (int, lambda value: value > 0),
+    'last_directory': (str, None),
+    'window_geometry': (str, None),
+}
+
+def validate_config(config):
+    """Vérifier les valeurs connues du schéma ; retourne les erreurs par clé (vide si valide)."""
+    errors = {}
+    for key, value in config.items():
+        if key not in SCHEMA:
+            continue
+        types, check = SCHEMA[key]
+        types = types if isinstance(types, tuple) else (types,)
+        # bool est une sous-classe de int : True n'est pas un port valide
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            errors[key] = f"expected {' or '.join(t.__name__ for t in types)}, got {type(value).__name__}"
+        elif check and not check(value):
+            errors[key] = f"invalid value {value!r}"
+    return errors
 
 class ConfigManager:
     def __init__(self, config_file='config.json'):
@@ -12,26 +73,166 @@ class ConfigManager:
             'theme': 'light',
             'max_file_size': 50,  # Mo
             'allowed_extensions': ['.html', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.ico'],
+            'quota_max_total_mb': 0,  # Mo, 0 = illimité
+            'quota_max_files': 0,
+            'retention_max_age_days': 0,
+            'retention_keep_versions': 0,
+            'retention_sweep_interval': 300,  # secondes
+            'optimize_uploads': False,
+            'jpeg_quality': 85,
+            'scrub_max_mb_per_s': 50,  # 0 = illimité
+            'advertise_interface': '',  # '' = route par défaut
+            'port_search_range': 100,  # ports essayés après le port demandé, 0 = aucun
+            'upnp_extra_ports': [],  # ex. ['8443', '5000/udp'], redirigés avec le port du serveur
+            'upnp_description': 'Port Forwarding App',
+            'upnp_lease_duration': 3600,  # secondes, 0 = permanent
+            'upnp_check_interval': 60,  # secondes
+            'natpmp_enabled': True,  # essayer NAT-PMP/PCP avant UPnP
+            'auto_ban_enabled': True,
+            'auto_ban_duration': 600,  # secondes, doublée à chaque récidive
+            'auto_ban_rules': {  # événement : [nombre maximal, fenêtre en secondes]
+                'not_found': [20, 60],
+                'request': [200, 10],
+                'tls_error': [5, 60],
+                'auth_failure': [10, 300]
+            },
+            'web_auth_enabled': False,  # connexion requise pour le serveur web (utilisateurs de users.db)
+            'session_ttl': 3600,  # secondes
             'last_directory': os.path.expanduser('~'),
             'window_geometry': '1000x700+100+100'
         }
+        # Dernière configuration appliquée : les modifications sont comparées à celle-ci
+        self.current = None
+        self._signature = None
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        """Lire le fichier ; les valeurs invalides sont remplacées par celles de la configuration courante."""
+        with open(self.config_file, 'r') as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("configuration must be a JSON object")
+        config = {**self.default_config, **config}
+        fallback = self.current or self.default_config
+        for key, error in validate_config(config).items():
+            logging.warning(f"Ignoring invalid setting {key} in {self.config_file}: {error}")
+            config[key] = fallback[key]
+        return config
 
     def load_config(self):
         """Charger la configuration depuis un fichier."""
-        if os.path.exists(self.config_file):
+        with self._lock:
+            self._signature = self._file_signature()
+            config = self.default_config.copy()
+            if self._signature:
+                try:
+                    config = self._read()
+                except Exception as e:
+                    logging.error(f"Failed to load config: {e}")
+            self.current = config
+            return dict(config)
+
+    def save_config(self, config):
+        """Sauvegarder la configuration dans un fichier (remplacement atomique) et notifier les abonnés ;
+        lève OSError si l'écriture échoue, la configuration courante restant alors inchangée."""
+        errors = validate_config(config)
+        if errors:
+            raise ValueError("Invalid settings: " + '; '.join(f"{key}: {error}" for key, error in errors.items()))
+        with self._lock:
+            temp_file = self.config_file + '.tmp'
             try:
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                return {**self.default_config, **config}
+                with open(temp_file, 'w') as f:
+                    json.dump(config, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, self.config_file)
+            except OSError as e:
+                logging.error(f"Failed to save config: {e}")
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+                # Rien n'est appliqué ni notifié : l'appelant affiche l'erreur
+                raise
+            # Notre propre écriture ne doit pas être relue comme une modification externe
+            self._signature = self._file_signature()
+            changes = self._update(dict(config))
+        self._notify(changes)
+
+    def _update(self, config):
+        previous = self.current or {}
+        self.current = config
+        return {key: value for key, value in config.items() if previous.get(key) != value}
+
+    def check_for_changes(self):
+        """Relire config.json s'il a été modifié et notifier les abonnés ; retourne les valeurs modifiées."""
+        with self._lock:
+            signature = self._file_signature()
+            if signature is None or signature == self._signature:
+                return {}
+            self._signature = signature
+            try:
+                config = self._read()
             except Exception as e:
-                logging.error(f"Failed to load config: {e}")
-                return self.default_config.copy()
-        return self.default_config.copy()
+                # Fichier en cours d'écriture par un éditeur, ou invalide : on garde la configuration courante
+                logging.error(f"Failed to reload config: {e}")
+                return {}
+            changes = self._update(config)
+        if changes:
+            logging.info(f"Configuration reloaded: {', '.join(sorted(changes))} changed")
+        self._notify(changes)
+        return changes
 
-    def save_config(self, config):
-        """Sauvegarder la configuration dans un fichier."""
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=4)
-        except Exception as e:
-            logging.error(f"Failed to save config: {e}")
+    def subscribe(self, callback, keys=None):
+        """Appeler callback(modifications) à chaque changement, éventuellement limité à certaines clés."""
+        with self._lock:
+            self._subscribers.append((callback, set(keys) if keys else None))
+
+    def unsubscribe(self, callback):
+        """Ne plus notifier callback."""
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] != callback]
+
+    def _notify(self, changes):
+        if not changes:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, keys in subscribers:
+            relevant = changes if keys is None else {key: value for key, value in changes.items() if key in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                logging.error(f"Config subscriber failed: {e}")
+
+    def _run(self, interval):
+        while not self._stop_event.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                logging.error(f"Config reload failed: {e}")
+
+    def start_watching(self, interval=1.0):
+        """Surveiller config.json en arrière-plan."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def stop_watching(self):
+        """Arrêter la surveillance."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
@@ -1,31 +1,298 @@
+import io
 import os
+import json
+import fnmatch
+import hashlib
 import shutil
 import logging
+import threading
+import time
+import zipfile
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import mimetypes
+from asset_optimizer import renamed_variant
+from integrity_manager import hash_file
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+COPY_CHUNK_SIZE = 1024 * 1024
+# Suffixe des copies en cours : un fichier laissé par une copie interrompue n'est ni indexé ni vérifié
+PART_SUFFIX = '.part'
 
 class FileManager:
-    def __init__(self, upload_dir='uploaded_files'):
+    def __init__(self, upload_dir='uploaded_files', variants_file=None):
         self.upload_dir = os.path.abspath(upload_dir)
+        # Manifeste des variantes créées par l'optimiseur, à côté du répertoire servi
+        self.variants_file = variants_file or self.upload_dir + '.variants.json'
         self.logs_dir = os.path.abspath('logs')
         for directory in [self.upload_dir, self.logs_dir]:
             if not os.path.exists(directory):
                 os.makedirs(directory)
 
+        # Quotas de stockage (0 = illimité)
+        self.max_total_bytes = 0
+        self.max_files = 0
+
+        # Limites par défaut des téléchargements, modifiables à chaud (voir on_config_change)
+        self.max_file_size = 50  # Mo
+        self.allowed_extensions = ['.html', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.ico']
+
+        # Optimiseur de ressources facultatif (voir asset_optimizer.AssetOptimizer)
+        self.optimizer = None
+
+        # Manifeste d'intégrité facultatif (voir integrity_manager.IntegrityManager)
+        self.integrity = None
+
+        # Index des fichiers : nom relatif -> informations
+        self._lock = threading.RLock()
+        self.index = {}
+        # Variantes créées par l'optimiseur : nom de la variante -> nom de l'original. Seules celles-ci suivent
+        # leur original ; un jquery.min.js téléchargé par l'utilisateur reste un fichier comme un autre
+        self.variants = {}
+        # Date de modification de chaque répertoire lors du dernier parcours : un ajout ou une suppression
+        # faits hors de l'application la change et provoque un nouveau parcours (voir list_files)
+        self._dir_mtimes = {}
+        # Place réservée par les copies en cours, comptée par check_quota
+        self._reserved = {'bytes': 0, 'files': 0}
+        self.index_version = 0
+        self.rescan()
+
+    def _file_info(self, name, file_path):
+        stat = os.stat(file_path)
+        return {
+            'name': name,
+            'size': stat.st_size,
+            'modified': datetime.fromtimestamp(stat.st_mtime),
+            'path': file_path
+        }
+
+    def _relative_name(self, file_path):
+        return os.path.relpath(file_path, self.upload_dir).replace(os.sep, '/')
+
+    def rescan(self):
+        """Reconstruire l'index à partir du répertoire de téléchargement."""
+        index = {}
+        dir_mtimes = {}
+        for root, dirs, files in os.walk(self.upload_dir):
+            try:
+                dir_mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            for file in files:
+                if file.endswith(PART_SUFFIX):
+                    continue
+                file_path = os.path.join(root, file)
+                try:
+                    name = self._relative_name(file_path)
+                    index[name] = self._file_info(name, file_path)
+                except OSError:
+                    continue
+        # Le manifeste est relu : une autre instance (l'API) a pu créer ou supprimer des variantes
+        variants = {name: original for name, original in self._load_variants().items() if name in index}
+        with self._lock:
+            self.index = index
+            self.variants = variants
+            self._dir_mtimes = dir_mtimes
+            self.index_version += 1
+        return len(index)
+
+    def _load_variants(self):
+        """Charger le manifeste des variantes générées."""
+        if os.path.exists(self.variants_file):
+            try:
+                with open(self.variants_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logging.error(f"Failed to load variants manifest: {e}")
+        return {}
+
+    def _save_variants(self):
+        """Sauvegarder le manifeste des variantes de façon atomique (appelé sous le verrou de l'index)."""
+        tmp_file = self.variants_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(self.variants, f, indent=1, sort_keys=True)
+            os.replace(tmp_file, self.variants_file)
+        except OSError as e:
+            logging.error(f"Failed to save variants manifest: {e}")
+
+    def _changed_on_disk(self):
+        """Vérifier si un répertoire a été modifié depuis le dernier parcours."""
+        with self._lock:
+            dir_mtimes = dict(self._dir_mtimes)
+        for directory, mtime in dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def refresh(self):
+        """Reparcourir le répertoire s'il a changé depuis le dernier parcours ; retourne True si l'index a été rebâti."""
+        if not self._changed_on_disk():
+            return False
+        self.rescan()
+        return True
+
+    def set_quota(self, max_total_mb=0, max_files=0):
+        """Définir les quotas de stockage (0 = illimité)."""
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024) if max_total_mb else 0
+        self.max_files = int(max_files) if max_files else 0
+
+    def on_config_change(self, changes):
+        """Appliquer les nouvelles limites ; les téléchargements en cours gardent celles de leur début."""
+        if 'max_file_size' in changes:
+            self.max_file_size = changes['max_file_size']
+        if 'allowed_extensions' in changes:
+            self.allowed_extensions = list(changes['allowed_extensions'])
+
+    def get_usage(self):
+        """Obtenir l'utilisation actuelle du stockage."""
+        with self._lock:
+            return {
+                'files': len(self.index),
+                'bytes': sum(info['size'] for info in self.index.values()),
+                'max_files': self.max_files,
+                'max_bytes': self.max_total_bytes
+            }
+
+    def check_quota(self, extra_bytes, extra_files=1):
+        """Vérifier qu'un ajout respecte les quotas de stockage, copies en cours comprises."""
+        with self._lock:
+            usage = self.get_usage()
+            files = usage['files'] + self._reserved['files'] + extra_files
+            total = usage['bytes'] + self._reserved['bytes'] + extra_bytes
+        if self.max_files and files > self.max_files:
+            raise ValueError(f"Storage quota exceeded: {self.max_files} files maximum")
+        if self.max_total_bytes and total > self.max_total_bytes:
+            max_mb = self.max_total_bytes / (1024 * 1024)
+            raise ValueError(f"Storage quota exceeded: {max_mb:.0f} MB maximum")
+
+    def _reserve(self, name, size):
+        """Vérifier le quota et réserver la place d'un fichier avant sa copie (name=None : nouveau fichier)."""
+        with self._lock:
+            replaced = self.index.get(name) if name else None
+            extra = (size - (replaced['size'] if replaced else 0), 0 if replaced else 1)
+            self.check_quota(*extra)
+            self._reserved['bytes'] += extra[0]
+            self._reserved['files'] += extra[1]
+        return extra
+
+    def _release(self, extra):
+        with self._lock:
+            self._reserved['bytes'] -= extra[0]
+            self._reserved['files'] -= extra[1]
+
+    def _commit_index(self, removed=(), added=(), variants=None):
+        """Appliquer un lot de modifications à l'index en une seule mise à jour ; variants enregistre les
+        variantes générées parmi les fichiers ajoutés (nom de la variante -> nom de l'original)."""
+        with self._lock:
+            recorded = len(self.variants)
+            for name in removed:
+                self.index.pop(name, None)
+                self.variants.pop(name, None)
+            for name, file_path in added:
+                # Un fichier écrit à la place d'une variante appartient désormais à l'utilisateur
+                self.variants.pop(name, None)
+                try:
+                    self.index[name] = self._file_info(name, file_path)
+                except OSError:
+                    self.index.pop(name, None)
+            if variants:
+                self.variants.update(variants)
+            if variants or len(self.variants) != recorded:
+                self._save_variants()
+            self.index_version += 1
+
+    def _index_variants(self, file_path, variants):
+        """Indexer et enregistrer les variantes créées par l'optimiseur ; elles comptent dans le quota."""
+        with self._lock:
+            # Un fichier de l'utilisateur écrit au même nom depuis la création de la variante l'a remplacée
+            variants = [variant for variant in variants
+                        if self._relative_name(variant) not in self.index or self._relative_name(variant) in self.variants]
+        if not variants:
+            return
+        original = self._relative_name(file_path)
+        try:
+            if not os.path.exists(file_path):
+                raise ValueError("original removed during optimization")
+            with self._lock:
+                extra_bytes, extra_files = 0, 0
+                for variant in variants:
+                    replaced = self.index.get(self._relative_name(variant))
+                    extra_bytes += os.path.getsize(variant) - (replaced['size'] if replaced else 0)
+                    extra_files += 0 if replaced else 1
+                self.check_quota(extra_bytes, extra_files)
+                self._commit_index(
+                    added=[(self._relative_name(variant), variant) for variant in variants],
+                    variants={self._relative_name(variant): original for variant in variants}
+                )
+            if self.integrity:
+                # Variantes produites ici : enregistrées pour que la vérification ne les signale pas comme inconnues
+                for variant in variants:
+                    self.integrity.record(self._relative_name(variant), *hash_file(variant))
+        except (OSError, ValueError) as e:
+            # Les variantes sont facultatives : l'original reste servi tel quel
+            logging.warning(f"Discarding optimized variants of {os.path.basename(file_path)}: {e}")
+            self._remove_paths(variants)
+            self._commit_index(removed=[self._relative_name(variant) for variant in variants])
+
+    def _optimize(self, file_path):
+        """Confier un fichier téléchargé à l'optimiseur, si activé."""
+        if self.optimizer:
+            self.optimizer.submit(file_path, callback=lambda created: self._index_variants(file_path, created))
+
+    def _variants(self, names):
+        """Variantes générées présentes dans l'index pour chacun des noms donnés."""
+        wanted = set(names)
+        variants = {}
+        with self._lock:
+            for name, original in self.variants.items():
+                if original in wanted and name in self.index:
+                    variants.setdefault(original, []).append(name)
+        return variants
+
+    def variant_original(self, file_path, case_sensitive=True):
+        """Chemin de l'original d'une variante créée par l'optimiseur, None pour tout autre fichier."""
+        name = self._relative_name(file_path)
+        with self._lock:
+            original = self.variants.get(name)
+            if original is None and not case_sensitive:
+                folded = name.casefold()
+                original = next((o for v, o in self.variants.items() if v.casefold() == folded), None)
+        return os.path.join(self.upload_dir, *original.split('/')) if original else None
+
+    def _remove_paths(self, paths):
+        for file_path in paths:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def _remove_variants(self, names):
+        """Supprimer les variantes des fichiers donnés ; retourne les noms retirés."""
+        removed = [variant for variants in self._variants(names).values() for variant in variants]
+        self._remove_paths(os.path.join(self.upload_dir, name) for name in removed)
+        return removed
+
     def is_valid_mime(self, file_path, allowed_mimes):
         mime_type, _ = mimetypes.guess_type(file_path)
         return mime_type in allowed_mimes
 
-    def upload_file(self, file_path, max_size_mb=50, allowed_extensions=None, allowed_mimes=None):
-        """Télécharger un fichier avec vérification MIME."""
+    def _default_filters(self, allowed_extensions, allowed_mimes):
         if allowed_extensions is None:
-            allowed_extensions = ['.html', '.css', '.js', '.png', '.jpg', '.jpeg', '.gif', '.ico']
+            allowed_extensions = self.allowed_extensions
         if allowed_mimes is None:
             allowed_mimes = [
-                'text/html', 'text/css', 'application/javascript',
+                'text/html', 'text/css', 'application/javascript', 'text/javascript',
                 'image/png', 'image/jpeg', 'image/gif', 'image/x-icon'
             ]
+        return allowed_extensions, allowed_mimes
 
+    def validate_file(self, file_path, file_size, max_size_mb, allowed_extensions, allowed_mimes):
+        """Vérifier l'extension, le type MIME et la taille d'un fichier."""
         if not any(file_path.lower().endswith(ext) for ext in allowed_extensions):
             raise ValueError(f"File type not allowed. Allowed: {', '.join(allowed_extensions)}")
 
@@ -33,41 +300,215 @@ class FileManager:
             mime_type, _ = mimetypes.guess_type(file_path)
             raise ValueError(f"Type MIME non autorisé : {mime_type}")
 
-        if os.path.getsize(file_path) > max_size_mb * 1024 * 1024:
+        if file_size > max_size_mb * 1024 * 1024:
             raise ValueError(f"File size exceeds {max_size_mb} MB")
 
+    def upload_file(self, file_path, max_size_mb=None, allowed_extensions=None, allowed_mimes=None):
+        """Télécharger un fichier avec vérification MIME."""
+        max_size_mb = max_size_mb or self.max_file_size
+        allowed_extensions, allowed_mimes = self._default_filters(allowed_extensions, allowed_mimes)
+        file_size = os.path.getsize(file_path)
+        self.validate_file(file_path, file_size, max_size_mb, allowed_extensions, allowed_mimes)
+
         file_name = os.path.basename(file_path)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         name, ext = os.path.splitext(file_name)
         new_file_name = f"{timestamp}_{name}{ext}"
         dest_path = os.path.join(self.upload_dir, new_file_name)
-        shutil.copy2(file_path, dest_path)
+        # Place réservée avant la copie : deux téléchargements simultanés ne peuvent pas dépasser le quota ensemble
+        reserved = self._reserve(None, file_size)
+        try:
+            with open(file_path, 'rb') as source:
+                written, digest = self._copy_stream(source, dest_path)
+            shutil.copystat(file_path, dest_path)
+            self._commit_index(added=[(new_file_name, dest_path)])
+        finally:
+            self._release(reserved)
+        if self.integrity:
+            self.integrity.record(new_file_name, digest, written)
         logging.info(f"File uploaded: {new_file_name}")
+        self._optimize(dest_path)
         return new_file_name
 
+    @staticmethod
+    def is_archive(file_path):
+        """Vérifier si un fichier est une archive prise en charge."""
+        return file_path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+    def safe_destination(self, member_name):
+        """Calculer la destination d'un membre d'archive en refusant les sorties du répertoire."""
+        name = member_name.replace('\\', '/')
+        if name.startswith('/') or (len(name) > 1 and name[1] == ':'):
+            raise ValueError(f"Absolute path in archive: {member_name}")
+        parts = [part for part in name.split('/') if part not in ('', '.')]
+        if not parts or '..' in parts:
+            raise ValueError(f"Unsafe path in archive: {member_name}")
+        root = os.path.realpath(self.upload_dir)
+        dest_path = os.path.realpath(os.path.join(root, *parts))
+        if os.path.commonpath([root, dest_path]) != root:
+            raise ValueError(f"Unsafe path in archive: {member_name}")
+        return '/'.join(parts), dest_path
+
+    def _copy_stream(self, source, dest_path, limit=None):
+        """Copier un flux dans un fichier en calculant son empreinte SHA-256."""
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        part_path = dest_path + PART_SUFFIX
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            with open(part_path, 'wb') as out:
+                while True:
+                    chunk = source.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if limit is not None and written > limit:
+                        raise ValueError(f"File size exceeds {limit // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    out.write(chunk)
+            os.replace(part_path, dest_path)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        return written, digest.hexdigest()
+
+    def _write_member(self, source, name, dest_path, limit):
+        """Écrire un membre d'archive en flux, sans dépasser la taille autorisée."""
+        written, digest = self._copy_stream(source, dest_path, limit)
+        # Les variantes de la version remplacée sont périmées ; l'optimiseur les régénère
+        self._commit_index(removed=self._remove_variants([name]), added=[(name, dest_path)])
+        if self.integrity:
+            self.integrity.record(name, digest, written)
+        self._optimize(dest_path)
+        return written
+
+    def upload_archive(self, archive_path, max_size_mb=None, allowed_extensions=None, allowed_mimes=None, workers=4):
+        """Extraire une archive zip/tar en flux, membre par membre, avec écriture parallèle."""
+        max_size_mb = max_size_mb or self.max_file_size
+        allowed_extensions, allowed_mimes = self._default_filters(allowed_extensions, allowed_mimes)
+        limit = max_size_mb * 1024 * 1024
+        stats = {'files': 0, 'bytes': 0, 'failed': 0, 'names': []}
+        stats_lock = threading.Lock()
+        start = time.perf_counter()
+
+        def fail(member_name, error):
+            with stats_lock:
+                stats['failed'] += 1
+            logging.error(f"Failed to extract {member_name}: {error}")
+
+        def accept(member_name, size):
+            """Valider un membre et réserver sa place dans le quota."""
+            name, dest_path = self.safe_destination(member_name)
+            self.validate_file(name, size, max_size_mb, allowed_extensions, allowed_mimes)
+            return name, dest_path, self._reserve(name, size)
+
+        def write(member_name, name, dest_path, extra, open_source):
+            """Écrire un membre ; un membre illisible (corrompu, chiffré, tronqué) n'échoue que lui-même."""
+            try:
+                with open_source() as source:
+                    written = self._write_member(source, name, dest_path, limit)
+                with stats_lock:
+                    stats['files'] += 1
+                    stats['bytes'] += written
+                    stats['names'].append(name)
+            except Exception as e:
+                fail(member_name, e)
+            finally:
+                # Le fichier écrit est désormais compté par l'index
+                self._release(extra)
+
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as zf:
+                members = [info for info in zf.infolist() if not info.is_dir()]
+
+            def extract_zip_chunk(chunk):
+                # Chaque tâche ouvre sa propre poignée pour lire en parallèle
+                with zipfile.ZipFile(archive_path) as zf:
+                    for info in chunk:
+                        try:
+                            name, dest_path, extra = accept(info.filename, info.file_size)
+                        except Exception as e:
+                            fail(info.filename, e)
+                            continue
+                        write(info.filename, name, dest_path, extra, lambda: zf.open(info))
+
+            workers = max(1, min(workers, len(members)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(extract_zip_chunk, [members[i::workers] for i in range(workers)]))
+        elif tarfile.is_tarfile(archive_path):
+            # Lecture séquentielle en flux : les petits membres sont confiés au pool (mémoire bornée à
+            # workers * 2 morceaux), les autres sont copiés en flux depuis l'archive, comme pour le zip
+            pending = threading.BoundedSemaphore(workers * 2)
+
+            def write_tar_member(*args):
+                try:
+                    write(*args)
+                finally:
+                    pending.release()
+
+            with ThreadPoolExecutor(max_workers=workers) as executor, \
+                    tarfile.open(archive_path, 'r|*') as tf:
+                members = iter(tf)
+                while True:
+                    try:
+                        member = next(members)
+                    except StopIteration:
+                        break
+                    except (tarfile.TarError, OSError, EOFError) as e:
+                        # Flux tronqué ou corrompu : les membres suivants sont illisibles
+                        fail(os.path.basename(archive_path), e)
+                        break
+                    if member.isdir():
+                        continue
+                    try:
+                        if not member.isfile():
+                            raise ValueError("not a regular file")
+                        name, dest_path, extra = accept(member.name, member.size)
+                    except Exception as e:
+                        fail(member.name, e)
+                        continue
+                    if member.size > COPY_CHUNK_SIZE:
+                        write(member.name, name, dest_path, extra, lambda: tf.extractfile(member))
+                        continue
+                    try:
+                        data = tf.extractfile(member).read()
+                    except Exception as e:
+                        self._release(extra)
+                        fail(member.name, e)
+                        continue
+                    pending.acquire()
+                    executor.submit(write_tar_member, member.name, name, dest_path, extra,
+                                    lambda data=data: io.BytesIO(data))
+        else:
+            raise ValueError("Unsupported archive format")
+
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        stats['elapsed'] = elapsed
+        stats['files_per_s'] = stats['files'] / elapsed
+        stats['mb_per_s'] = stats['bytes'] / (1024 * 1024) / elapsed
+        logging.info(
+            f"Archive extracted: {os.path.basename(archive_path)} - {stats['files']} files, "
+            f"{stats['failed']} failed ({stats['files_per_s']:.1f} files/s, {stats['mb_per_s']:.2f} MB/s)"
+        )
+        return stats
+
     def list_files(self):
-        """Lister les fichiers téléchargés."""
-        files_info = []
-        if not os.path.exists(self.upload_dir):
-            return files_info
-
-        for file in os.listdir(self.upload_dir):
-            file_path = os.path.join(self.upload_dir, file)
-            if os.path.isfile(file_path):
-                stat = os.stat(file_path)
-                files_info.append({
-                    'name': file,
-                    'size': stat.st_size,
-                    'modified': datetime.fromtimestamp(stat.st_mtime),
-                    'path': file_path
-                })
-        return files_info
+        """Lister les fichiers téléchargés, en tenant compte des modifications faites hors de l'application."""
+        self.refresh()
+        with self._lock:
+            return list(self.index.values())
 
     def delete_file(self, file_name):
         """Supprimer un fichier."""
         file_path = os.path.join(self.upload_dir, file_name)
         if os.path.exists(file_path):
+            name = self._relative_name(file_path)
             os.remove(file_path)
+            removed = [name] + self._remove_variants([name])
+            self._commit_index(removed=removed)
+            if self.integrity:
+                self.integrity.forget(removed)
             logging.info(f"File deleted: {file_name}")
             return True
         return False
@@ -78,6 +519,123 @@ class FileManager:
         new_path = os.path.join(self.upload_dir, new_name)
         if os.path.exists(old_path) and not os.path.exists(new_path):
             os.rename(old_path, new_path)
+            renamed = {self._relative_name(old_path): self._relative_name(new_path)}
+            removed, added, variants = self._rename_variants(renamed)
+            self._commit_index(
+                removed=[self._relative_name(old_path)] + removed,
+                added=[(self._relative_name(new_path), new_path)] + added,
+                variants=variants
+            )
+            if self.integrity:
+                self.integrity.rename(renamed)
             logging.info(f"File renamed from {old_name} to {new_name}")
             return True
-        return False
\ No newline at end of file
+        return False
+
+    def _rename_variants(self, renames):
+        """Suivre le renommage des originaux ; les variantes ne pouvant suivre sont supprimées."""
+        removed, added, recorded = [], [], {}
+        variant_renames, dropped = {}, []
+        for old_name, variants in self._variants(renames).items():
+            new_name = renames[old_name]
+            same_type = os.path.splitext(old_name)[1].lower() == os.path.splitext(new_name)[1].lower()
+            for variant in variants:
+                old_path = os.path.join(self.upload_dir, variant)
+                removed.append(variant)
+                if same_type:
+                    new_variant = renamed_variant(variant, new_name)
+                    new_path = os.path.join(self.upload_dir, new_variant)
+                    try:
+                        if os.path.exists(new_path):
+                            raise FileExistsError(new_variant)
+                        os.rename(old_path, new_path)
+                        added.append((new_variant, new_path))
+                        recorded[new_variant] = new_name
+                        variant_renames[variant] = new_variant
+                        continue
+                    except OSError as e:
+                        logging.warning(f"Failed to rename variant {variant}: {e}")
+                self._remove_paths([old_path])
+                dropped.append(variant)
+        if self.integrity:
+            self.integrity.rename(variant_renames)
+            self.integrity.forget(dropped)
+        return removed, added, recorded
+
+    def select_files(self, pattern):
+        """Sélectionner les fichiers de l'index correspondant à un motif glob."""
+        self.refresh()
+        with self._lock:
+            names = list(self.index)
+        return sorted(fnmatch.filter(names, pattern))
+
+    def _batch_names(self, names, pattern):
+        selected = list(names or [])
+        if pattern:
+            selected.extend(self.select_files(pattern))
+        selected = list(dict.fromkeys(selected))
+        # Une variante dont l'original est aussi sélectionné suit celui-ci
+        originals = set(selected)
+        with self._lock:
+            return [name for name in selected if self.variants.get(name) not in originals]
+
+    def delete_files(self, names=None, pattern=None):
+        """Supprimer un lot de fichiers (liste de noms et/ou motif glob)."""
+        deleted, failed = [], []
+        for file_name in self._batch_names(names, pattern):
+            try:
+                name, file_path = self.safe_destination(file_name)
+                os.remove(file_path)
+                deleted.append(name)
+            except (OSError, ValueError) as e:
+                failed.append(file_name)
+                logging.error(f"Failed to delete {file_name}: {e}")
+        removed = deleted + self._remove_variants(deleted)
+        self._commit_index(removed=removed)
+        if self.integrity:
+            self.integrity.forget(removed)
+        logging.info(f"Batch delete: {len(deleted)} files deleted, {len(failed)} failed")
+        return {'deleted': deleted, 'failed': failed}
+
+    def rename_files(self, renames):
+        """Renommer un lot de fichiers à partir d'un dictionnaire ancien nom -> nouveau nom."""
+        renamed, failed = {}, []
+        removed, added = [], []
+        for old_name, new_name in renames.items():
+            try:
+                old_name, old_path = self.safe_destination(old_name)
+                new_name, new_path = self.safe_destination(new_name)
+                if not os.path.isfile(old_path) or os.path.exists(new_path):
+                    raise ValueError("source missing or destination already exists")
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                os.rename(old_path, new_path)
+                renamed[old_name] = new_name
+                removed.append(old_name)
+                added.append((new_name, new_path))
+            except (OSError, ValueError) as e:
+                failed.append(old_name)
+                logging.error(f"Failed to rename {old_name} to {new_name}: {e}")
+        variants_removed, variants_added, variants = self._rename_variants(renamed)
+        self._commit_index(removed=removed + variants_removed, added=added + variants_added, variants=variants)
+        if self.integrity:
+            self.integrity.rename(renamed)
+        logging.info(f"Batch rename: {len(renamed)} files renamed, {len(failed)} failed")
+        return {'renamed': renamed, 'failed': failed}
+
+    def move_files(self, destination, names=None, pattern=None):
+        """Déplacer un lot de fichiers dans un sous-répertoire du répertoire de téléchargement."""
+        destination = destination.replace('\\', '/').strip('/')
+        renames = {}
+        for file_name in self._batch_names(names, pattern):
+            base_name = file_name.replace('\\', '/').rsplit('/', 1)[-1]
+            renames[file_name] = f"{destination}/{base_name}" if destination else base_name
+        return self.rename_files(renames)
+
+    def scrub(self, workers=None, max_bytes_per_s=0, adopt_unrecorded=False, progress=None):
+        """Vérifier l'intégrité des fichiers hébergés par rapport au manifeste ; les fichiers absents du manifeste
+        sont signalés (adopt_unrecorded=True pour les y ajouter)."""
+        if not self.integrity:
+            raise RuntimeError("Integrity manifest is not enabled")
+        with self._lock:
+            names = list(self.index)
+        return self.integrity.scrub(names, workers, max_bytes_per_s, adopt_unrecorded, progress)
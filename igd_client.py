@@ -0,0 +1,394 @@
+import socket
+import asyncio
+import logging
+import http.client
+import threading
+import urllib.parse
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+WANIP_V1 = 'urn:schemas-upnp-org:service:WANIPConnection:1'
+WANIP_V2 = 'urn:schemas-upnp-org:service:WANIPConnection:2'
+WANPPP_V1 = 'urn:schemas-upnp-org:service:WANPPPConnection:1'
+
+# Codes d'erreur UPnP signifiant que l'action n'existe pas sur la passerelle
+UNSUPPORTED_ACTION_CODES = (401, 602)
+NO_SUCH_ENTRY_CODES = (713, 714)
+
+SSDP_ADDRESS = ('239.255.255.250', 1900)
+IGD_SEARCH_TARGETS = (
+    'urn:schemas-upnp-org:device:InternetGatewayDevice:2',
+    'urn:schemas-upnp-org:device:InternetGatewayDevice:1',
+)
+# Services de connexion WAN, par ordre de préférence
+WAN_SERVICES = (WANIP_V2, WANIP_V1, WANPPP_V1)
+
+
+class UPnPError(Exception):
+    """Erreur SOAP renvoyée par la passerelle."""
+
+    def __init__(self, code, description):
+        super().__init__(f"{code} {description}")
+        self.code = code
+        self.description = description
+
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def build_envelope(service_type, action, args=()):
+    """Construire l'enveloppe SOAP d'une action."""
+    arguments = ''.join(f"<{name}>{escape(str(value))}</{name}>" for name, value in args)
+    return (
+        '<?xml version="1.0"?>'
+        '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+        's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+        f'<s:Body><u:{action} xmlns:u="{service_type}">{arguments}</u:{action}></s:Body>'
+        '</s:Envelope>'
+    ).encode('utf-8')
+
+
+def parse_response(body):
+    """Lire les arguments de sortie d'une réponse SOAP ; lève UPnPError pour une erreur SOAP."""
+    root = ET.fromstring(body)
+    for element in root.iter():
+        if _local_name(element.tag) == 'UPnPError':
+            values = {_local_name(child.tag): (child.text or '') for child in element}
+            raise UPnPError(int(values.get('errorCode') or 0), values.get('errorDescription', ''))
+    for element in root.iter():
+        if _local_name(element.tag).endswith('Response'):
+            return {_local_name(child.tag): (child.text or '') for child in element}
+    raise UPnPError(0, "Malformed SOAP response")
+
+
+def parse_port_listing(listing):
+    """Convertir le NewPortListing de GetListOfPortMappings en liste de règles."""
+    mappings = []
+    if not listing or not listing.strip():
+        return mappings
+    root = ET.fromstring(listing)
+    for entry in root.iter():
+        if _local_name(entry.tag) != 'PortMappingEntry':
+            continue
+        values = {_local_name(child.tag): (child.text or '') for child in entry}
+        mappings.append({
+            'external_port': int(values.get('NewExternalPort') or 0),
+            'protocol': values.get('NewProtocol', 'TCP').upper(),
+            'internal_ip': values.get('NewInternalClient', ''),
+            'internal_port': int(values.get('NewInternalPort') or 0),
+            'description': values.get('NewDescription', ''),
+            'enabled': values.get('NewEnabled', '1') in ('1', 'true'),
+            'lease': int(values.get('NewLeaseTime') or 0),
+            'remote_host': values.get('NewRemoteHost', ''),
+        })
+    return mappings
+
+
+class SoapClient:
+    """Client SOAP réutilisant une connexion HTTP persistante par thread vers l'URL de contrôle."""
+
+    def __init__(self, control_url, service_type, timeout=3.0):
+        parsed = urllib.parse.urlsplit(control_url)
+        self.control_url = control_url
+        self.service_type = service_type
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or '/'
+        if parsed.query:
+            self.path += '?' + parsed.query
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            with self._lock:
+                if connection in self._connections:
+                    self._connections.remove(connection)
+            self._local.connection = None
+
+    def call(self, action, args=()):
+        """Appeler une action SOAP ; retourne ses arguments de sortie."""
+        body = build_envelope(self.service_type, action, args)
+        headers = {
+            'Content-Type': 'text/xml; charset="utf-8"',
+            'SOAPAction': f'"{self.service_type}#{action}"',
+            'Connection': 'keep-alive',
+        }
+        for attempt in range(2):
+            try:
+                connection = self._connection()
+                connection.request('POST', self.path, body, headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # La passerelle a pu fermer la connexion persistante : une nouvelle tentative suffit
+                self._reset_connection()
+                if attempt:
+                    raise
+        if response.will_close:
+            self._reset_connection()
+        if response.status == 500 and data:
+            parse_response(data)
+        if response.status != 200:
+            raise UPnPError(response.status, response.reason)
+        return parse_response(data)
+
+    def close(self):
+        """Fermer toutes les connexions ouvertes."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def get_list_of_port_mappings(self, protocol, start=0, end=65535, chunk=1000):
+        """Lister les règles d'un protocole par lots avec l'action IGDv2 GetListOfPortMappings."""
+        mappings = []
+        while start <= end:
+            try:
+                response = self.call('GetListOfPortMappings', [
+                    ('NewStartPort', start), ('NewEndPort', end), ('NewProtocol', protocol),
+                    ('NewManage', 1), ('NewNumberOfPorts', chunk)
+                ])
+            except UPnPError as e:
+                if e.code in NO_SUCH_ENTRY_CODES:
+                    break
+                raise
+            entries = parse_port_listing(response.get('NewPortListing'))
+            mappings.extend(entries)
+            if len(entries) < chunk:
+                break
+            start = max(entry['external_port'] for entry in entries) + 1
+        return mappings
+
+
+def build_msearch(search_target, mx=1, address=SSDP_ADDRESS):
+    """Construire une requête SSDP M-SEARCH."""
+    return (
+        'M-SEARCH * HTTP/1.1\r\n'
+        f'HOST: {address[0]}:{address[1]}\r\n'
+        'MAN: "ssdp:discover"\r\n'
+        f'MX: {mx}\r\n'
+        f'ST: {search_target}\r\n\r\n'
+    ).encode('ascii')
+
+
+def parse_ssdp_response(data):
+    """Lire les en-têtes d'une réponse SSDP (noms en minuscules)."""
+    lines = data.decode('latin-1').split('\r\n')
+    if not lines or not lines[0].startswith('HTTP/'):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        key, sep, value = line.partition(':')
+        if sep:
+            headers[key.strip().lower()] = value.strip()
+    return headers
+
+
+def parse_description(xml_text, location):
+    """Extraire les services WAN (type, URL de contrôle absolue) d'une description de périphérique."""
+    root = ET.fromstring(xml_text)
+    base = location
+    for element in root.iter():
+        if _local_name(element.tag) == 'URLBase' and element.text:
+            base = element.text.strip()
+    services = []
+    for service in root.iter():
+        if _local_name(service.tag) != 'service':
+            continue
+        values = {_local_name(child.tag): (child.text or '').strip() for child in service}
+        if values.get('serviceType') in WAN_SERVICES and values.get('controlURL'):
+            services.append((values['serviceType'], urllib.parse.urljoin(base, values['controlURL'])))
+    services.sort(key=lambda service: WAN_SERVICES.index(service[0]))
+    return services
+
+
+def local_ipv4_addresses():
+    """Adresses IPv4 locales utilisées pour la découverte sur chaque interface."""
+    try:
+        import psutil
+    except ImportError:
+        return ['0.0.0.0']
+    addresses = [addr.address for addrs in psutil.net_if_addrs().values() for addr in addrs
+                 if addr.family == socket.AF_INET and not addr.address.startswith('127.')]
+    return addresses or ['0.0.0.0']
+
+
+class _SSDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, found, event):
+        self.found = found
+        self.event = event
+
+    def datagram_received(self, data, addr):
+        headers = parse_ssdp_response(data)
+        if headers and headers.get('location'):
+            self.found.setdefault(headers['location'], headers)
+            self.event.set()
+
+
+async def ssdp_search(timeout=2.0, interfaces=None, address=SSDP_ADDRESS, search_targets=IGD_SEARCH_TARGETS,
+                      grace=0.2):
+    """Envoyer des M-SEARCH depuis chaque interface en parallèle ; retourne {location: en-têtes}."""
+    loop = asyncio.get_running_loop()
+    found = {}
+    event = asyncio.Event()
+    transports = []
+    mx = max(1, int(timeout))
+    for interface in interfaces or local_ipv4_addresses():
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _SSDPProtocol(found, event), local_addr=(interface, 0), family=socket.AF_INET)
+        except OSError as e:
+            logging.warning(f"SSDP discovery unavailable on {interface}: {e}")
+            continue
+        sock = transport.get_extra_info('socket')
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        if interface != '0.0.0.0':
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+        for search_target in search_targets:
+            try:
+                transport.sendto(build_msearch(search_target, mx, address), address)
+            except OSError as e:
+                logging.warning(f"SSDP search failed on {interface}: {e}")
+        transports.append(transport)
+
+    try:
+        if transports:
+            # Dès la première réponse, on n'attend plus qu'un court délai pour les autres passerelles
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+                await asyncio.sleep(grace)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        for transport in transports:
+            transport.close()
+    return found
+
+
+async def fetch_description(location, timeout=3.0):
+    """Télécharger une description de périphérique ; retourne (services WAN, adresse locale utilisée)."""
+    parsed = urllib.parse.urlsplit(location)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parsed.hostname, parsed.port or 80), timeout)
+    try:
+        path = parsed.path or '/'
+        writer.write(f"GET {path} HTTP/1.0\r\nHost: {parsed.netloc}\r\nConnection: close\r\n\r\n".encode('ascii'))
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), timeout)
+        lan_address = writer.get_extra_info('sockname')[0]
+    finally:
+        writer.close()
+    head, _, body = data.partition(b'\r\n\r\n')
+    if not head.startswith(b'HTTP/') or head.split()[1] != b'200':
+        raise UPnPError(0, f"Failed to fetch {location}")
+    return parse_description(body, location), lan_address
+
+
+async def discover_gateways(timeout=2.0, interfaces=None, address=SSDP_ADDRESS):
+    """Découvrir les passerelles IGD et lire leurs descriptions en parallèle."""
+    found = await ssdp_search(timeout, interfaces, address)
+    results = await asyncio.gather(*(fetch_description(location, timeout) for location in found),
+                                   return_exceptions=True)
+    gateways = []
+    for location, result in zip(found, results):
+        if isinstance(result, Exception):
+            logging.warning(f"Ignoring gateway {location}: {result}")
+            continue
+        services, lan_address = result
+        if services:
+            service_type, control_url = services[0]
+            gateways.append({'location': location, 'service_type': service_type,
+                             'control_url': control_url, 'lan_address': lan_address})
+    gateways.sort(key=lambda gateway: WAN_SERVICES.index(gateway['service_type']))
+    return gateways
+
+
+class IGDClient:
+    """Client IGD en Python pur, avec la même interface que miniupnpc.UPnP."""
+
+    # Une connexion HTTP par thread (SoapClient) : les appels peuvent être concurrents
+    thread_safe = True
+
+    def __init__(self, interfaces=None, ssdp_address=SSDP_ADDRESS, timeout=3.0):
+        self.discoverdelay = 2000  # ms, comme miniupnpc
+        self.interfaces = interfaces
+        self.ssdp_address = ssdp_address
+        self.timeout = timeout
+        self.gateways = []
+        self.lanaddr = None
+        self.soap = None
+
+    def discover(self):
+        """Découvrir les passerelles ; retourne leur nombre."""
+        self.gateways = asyncio.run(discover_gateways(self.discoverdelay / 1000, self.interfaces, self.ssdp_address))
+        return len(self.gateways)
+
+    def selectigd(self):
+        """Choisir la première passerelle découverte ; retourne son URL de contrôle."""
+        if not self.gateways:
+            raise Exception("No UPnP internet gateway device found")
+        gateway = self.gateways[0]
+        if self.soap:
+            self.soap.close()
+        self.soap = SoapClient(gateway['control_url'], gateway['service_type'], self.timeout)
+        self.lanaddr = gateway['lan_address']
+        return gateway['control_url']
+
+    def externalipaddress(self):
+        return self.soap.call('GetExternalIPAddress')['NewExternalIPAddress']
+
+    def addportmapping(self, external_port, protocol, internal_client, internal_port, description, remote_host,
+                       lease=0):
+        self.soap.call('AddPortMapping', [
+            ('NewRemoteHost', remote_host), ('NewExternalPort', external_port), ('NewProtocol', protocol),
+            ('NewInternalPort', internal_port), ('NewInternalClient', internal_client), ('NewEnabled', 1),
+            ('NewPortMappingDescription', description), ('NewLeaseDuration', lease)
+        ])
+        return True
+
+    def deleteportmapping(self, external_port, protocol, remote_host=''):
+        self.soap.call('DeletePortMapping', [
+            ('NewRemoteHost', remote_host), ('NewExternalPort', external_port), ('NewProtocol', protocol)
+        ])
+        return True
+
+    def getspecificportmapping(self, external_port, protocol, remote_host=''):
+        try:
+            r = self.soap.call('GetSpecificPortMappingEntry', [
+                ('NewRemoteHost', remote_host), ('NewExternalPort', external_port), ('NewProtocol', protocol)
+            ])
+        except UPnPError as e:
+            if e.code in NO_SUCH_ENTRY_CODES:
+                return None
+            raise
+        return (r.get('NewInternalClient'), int(r.get('NewInternalPort') or 0), r.get('NewPortMappingDescription', ''),
+                r.get('NewEnabled', '1') in ('1', 'true'), int(r.get('NewLeaseDuration') or 0))
+
+    def getgenericportmapping(self, index):
+        try:
+            r = self.soap.call('GetGenericPortMappingEntry', [('NewPortMappingIndex', index)])
+        except UPnPError as e:
+            if e.code in NO_SUCH_ENTRY_CODES:
+                return None
+            raise
+        return (int(r.get('NewExternalPort') or 0), r.get('NewProtocol', 'TCP'),
+                (r.get('NewInternalClient'), int(r.get('NewInternalPort') or 0)),
+                r.get('NewPortMappingDescription', ''), r.get('NewEnabled', '1'),
+                r.get('NewRemoteHost', ''), int(r.get('NewLeaseDuration') or 0))
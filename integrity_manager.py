@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _lower_priority():
+    """Réduire la priorité des processus de vérification pour ne pas pénaliser le serveur web."""
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(10)
+        except OSError:
+            pass
+
+
+def hash_file(file_path, max_bytes_per_s=0):
+    """Calculer le SHA-256 d'un fichier, avec limitation de débit facultative."""
+    digest = hashlib.sha256()
+    size = 0
+    start = time.monotonic()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+            if max_bytes_per_s:
+                delay = size / max_bytes_per_s - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+    return digest.hexdigest(), size
+
+
+class IntegrityManager:
+    def __init__(self, upload_dir, manifest_file='file_manifest.json'):
+        self.upload_dir = os.path.abspath(upload_dir)
+        self.manifest_file = manifest_file
+        self._lock = threading.Lock()
+        self._save_timer = None
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        """Charger le manifeste des empreintes."""
+        if os.path.exists(self.manifest_file):
+            try:
+                with open(self.manifest_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logging.error(f"Failed to load integrity manifest: {e}")
+        return {}
+
+    def save_manifest(self):
+        """Sauvegarder le manifeste de façon atomique."""
+        with self._lock:
+            self._save_timer = None
+            data = json.dumps(self.manifest, indent=1, sort_keys=True)
+        tmp_file = self.manifest_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                f.write(data)
+            os.replace(tmp_file, self.manifest_file)
+        except Exception as e:
+            logging.error(f"Failed to save integrity manifest: {e}")
+
+    def _schedule_save(self):
+        # Regrouper les écritures lors de téléchargements en série
+        with self._lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(1.0, self.save_manifest)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Écrire immédiatement les modifications en attente."""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer:
+            timer.cancel()
+            self.save_manifest()
+
+    def record(self, name, digest, size):
+        """Enregistrer l'empreinte d'un fichier téléchargé."""
+        with self._lock:
+            self.manifest[name] = {
+                'sha256': digest,
+                'size': size,
+                'recorded': datetime.now().isoformat(timespec='seconds')
+            }
+        self._schedule_save()
+
+    def forget(self, names):
+        """Retirer des fichiers du manifeste."""
+        with self._lock:
+            for name in names:
+                self.manifest.pop(name, None)
+        self._schedule_save()
+
+    def rename(self, renames):
+        """Reporter des renommages dans le manifeste."""
+        with self._lock:
+            for old_name, new_name in renames.items():
+                if old_name in self.manifest:
+                    self.manifest[new_name] = self.manifest.pop(old_name)
+        self._schedule_save()
+
+    def scrub(self, existing_names=(), workers=None, max_bytes_per_s=0, adopt_unrecorded=False, progress=None):
+        """Revérifier les empreintes sur un pool de processus et signaler les écarts."""
+        with self._lock:
+            manifest = dict(self.manifest)
+        unrecorded = sorted(set(existing_names) - set(manifest))
+        targets = sorted(manifest) + (unrecorded if adopt_unrecorded else [])
+
+        workers = workers or os.cpu_count() or 1
+        # Le débit maximal est partagé entre les processus
+        per_worker_rate = max_bytes_per_s / workers if max_bytes_per_s else 0
+        report = {'checked': 0, 'ok': 0, 'mismatched': [], 'missing': [],
+                  'unrecorded': [] if adopt_unrecorded else unrecorded,
+                  'adopted': [], 'errors': [], 'bytes': 0}
+        start = time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority) as executor:
+            futures = {}
+            for name in targets:
+                file_path = os.path.join(self.upload_dir, *name.split('/'))
+                if not os.path.isfile(file_path):
+                    report['missing'].append(name)
+                    continue
+                futures[executor.submit(hash_file, file_path, per_worker_rate)] = name
+
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    digest, size = future.result()
+                except Exception as e:
+                    report['errors'].append(name)
+                    logging.error(f"Failed to hash {name}: {e}")
+                    continue
+                report['checked'] += 1
+                report['bytes'] += size
+                expected = manifest.get(name)
+                if expected is None:
+                    self.record(name, digest, size)
+                    report['adopted'].append(name)
+                elif expected['sha256'] == digest and expected['size'] == size:
+                    report['ok'] += 1
+                else:
+                    report['mismatched'].append(name)
+                if progress:
+                    progress(report['checked'], len(futures))
+
+        for key in ('mismatched', 'missing', 'adopted', 'errors'):
+            report[key].sort()
+        report['elapsed'] = time.perf_counter() - start
+        report['mb_per_s'] = report['bytes'] / (1024 * 1024) / max(report['elapsed'], 1e-9)
+        self.flush()
+        logging.info(
+            f"Integrity scrub: {report['ok']} ok, {len(report['mismatched'])} mismatched, "
+            f"{len(report['missing'])} missing ({report['mb_per_s']:.1f} MB/s)"
+        )
+        return report
@@ -1,70 +1,270 @@
+import csv
 import json
 import os
+import socket
+import logging
+import threading
+import ipaddress
+from itertools import islice
 
-class IPManager:
-    def __init__(self, allowed_ips_file='allowed_ips.json', blocked_ips_file='blocked_ips.json'):
-        self.allowed_ips_file = allowed_ips_file
-        self.blocked_ips_file = blocked_ips_file
-        self.allowed_ips = self.load_ips(self.allowed_ips_file)
-        self.blocked_ips = self.load_ips(self.blocked_ips_file)
+# Le fichier principal n'est réécrit que lorsque le journal dépasse ce nombre d'opérations (et la taille de la liste)
+COMPACT_MIN_OPERATIONS = 1000
+
+def parse_entry(text):
+    """Normaliser une adresse IP ou un réseau CIDR ; retourne None si le texte n'est pas valide."""
+    text = str(text).strip()
+    try:
+        # Chemin rapide pour les adresses IPv4 (la grande majorité des listes de blocage)
+        return socket.inet_ntop(socket.AF_INET, socket.inet_pton(socket.AF_INET, text))
+    except (OSError, ValueError):
+        pass
+    try:
+        if '/' in text:
+            network = ipaddress.ip_network(text, strict=False)
+            if network.num_addresses == 1:
+                return str(network.network_address)
+            return str(network)
+        address = ipaddress.ip_address(text)
+    except ValueError:
+        return None
+    # Les serveurs double pile présentent les clients IPv4 sous la forme ::ffff:a.b.c.d
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return str(address)
+
+def _strip_comment(cell):
+    # Commentaires (# ou ;) et texte après l'adresse, comme dans les listes publiques
+    cell = cell.split('#', 1)[0].split(';', 1)[0].strip()
+    return cell.split()[0] if cell else ''
+
+def read_entries(lines, fmt=None):
+    """Extraire les adresses d'une liste texte, CSV ou CIDR ; retourne (entrées valides, nombre de lignes invalides)."""
+    entries = []
+    invalid = 0
+    rows = csv.reader(lines) if fmt == 'csv' else (line.split(',') for line in lines)
+    for row in rows:
+        cells = [cell for cell in map(_strip_comment, row) if cell]
+        if not cells:
+            continue
+        # Première colonne contenant une adresse (les CSV ont souvent un horodatage ou un nom avant)
+        entry = next(filter(None, map(parse_entry, cells)), None)
+        if entry:
+            entries.append(entry)
+        else:
+            invalid += 1
+    return entries, invalid
+
+class IPList:
+    """Ensemble d'adresses et de réseaux, journal en ajout seul et compaction périodique du fichier principal."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.journal_file = filename + '.journal'
+        # dict utilisé comme ensemble ordonné : appartenance en O(1), ordre d'ajout conservé pour l'affichage
+        self.entries = {}
+        # Réseaux CIDR indexés par (version, longueur de préfixe) : une recherche par longueur présente
+        self.networks = {}
+        self.journal_size = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def _index(self, entry, add=True):
+        if '/' not in entry:
+            return
+        network = ipaddress.ip_network(entry)
+        key = (network.version, network.prefixlen)
+        if add:
+            self.networks.setdefault(key, set()).add(int(network.network_address))
+        else:
+            self.networks.get(key, set()).discard(int(network.network_address))
+            if not self.networks.get(key):
+                self.networks.pop(key, None)
+
+    def _apply(self, operation, entry):
+        if operation == '+' and entry not in self.entries:
+            self.entries[entry] = None
+            self._index(entry)
+            return True
+        if operation == '-' and entry in self.entries:
+            del self.entries[entry]
+            self._index(entry, add=False)
+            return True
+        return False
 
-    def load_ips(self, filename):
-        """Charger les adresses IP depuis un fichier."""
-        if os.path.exists(filename):
+    def load(self):
+        """Charger le fichier principal puis rejouer le journal."""
+        self.entries.clear()
+        self.networks.clear()
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, 'r') as f:
+                    for value in json.load(f):
+                        entry = parse_entry(value)
+                        if entry:
+                            self._apply('+', entry)
+                        else:
+                            logging.warning(f"Ignoring invalid address {value!r} in {self.filename}")
+            except Exception as e:
+                logging.error(f"Failed to load {self.filename}: {e}")
+        self.journal_size = 0
+        if os.path.exists(self.journal_file):
             try:
-                with open(filename, 'r') as f:
-                    return json.load(f)
-            except Exception:
-                return []
-        return []
-
-    def save_ips(self, filename, ips):
-        """Sauvegarder les adresses IP dans un fichier."""
+                with open(self.journal_file, 'r') as f:
+                    for line in f:
+                        # Une dernière ligne incomplète (arrêt pendant l'écriture) est ignorée
+                        if line.endswith('\n') and line[:1] in '+-':
+                            self._apply(line[0], line[1:-1])
+                            self.journal_size += 1
+            except Exception as e:
+                logging.error(f"Failed to replay {self.journal_file}: {e}")
+
+    def _write(self, operations):
+        """Journaliser des opérations ; compacter lorsque le journal devient aussi long que la liste."""
+        if not operations:
+            return
         try:
-            with open(filename, 'w') as f:
-                json.dump(ips, f)
+            with open(self.journal_file, 'a') as f:
+                f.write(''.join(f"{operation}{entry}\n" for operation, entry in operations))
         except Exception as e:
-            print(f"Failed to save IPs: {e}")
+            logging.error(f"Failed to write {self.journal_file}: {e}")
+            return
+        self.journal_size += len(operations)
+        if self.journal_size >= max(COMPACT_MIN_OPERATIONS, len(self.entries)):
+            self._compact()
 
-    def add_allowed_ip(self, ip):
-        """Ajouter une adresse IP autorisée."""
-        if ip not in self.allowed_ips:
-            self.allowed_ips.append(ip)
-            self.save_ips(self.allowed_ips_file, self.allowed_ips)
+    def _compact(self):
+        try:
+            temp_file = self.filename + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump(list(self.entries), f)
+            os.replace(temp_file, self.filename)
+            # Rejouer un journal déjà compacté est sans effet : un arrêt entre ces deux étapes ne perd rien
+            open(self.journal_file, 'w').close()
+            self.journal_size = 0
+        except Exception as e:
+            logging.error(f"Failed to compact {self.filename}: {e}")
+
+    def compact(self):
+        """Réécrire le fichier principal et vider le journal."""
+        with self._lock:
+            self._compact()
+
+    def add(self, entry):
+        with self._lock:
+            if not self._apply('+', entry):
+                return False
+            self._write([('+', entry)])
+            return True
+
+    def remove(self, entry):
+        with self._lock:
+            if not self._apply('-', entry):
+                return False
+            self._write([('-', entry)])
+            return True
+
+    def add_many(self, entries):
+        """Ajouter des entrées normalisées en une seule écriture ; retourne le nombre d'entrées nouvelles."""
+        with self._lock:
+            added = [('+', entry) for entry in entries if self._apply('+', entry)]
+            self._write(added)
+            return len(added)
+
+    def contains(self, ip):
+        """Vérifier si une adresse figure dans la liste, directement ou dans l'un de ses réseaux."""
+        if ip in self.entries:
             return True
+        entry = parse_entry(ip)
+        if entry is None or '/' in entry:
+            return False
+        if entry in self.entries:
+            return True
+        if not self.networks:
+            return False
+        family, version = (socket.AF_INET6, 6) if ':' in entry else (socket.AF_INET, 4)
+        packed = socket.inet_pton(family, entry)
+        bits = len(packed) * 8
+        value = int.from_bytes(packed, 'big')
+        for (network_version, prefixlen), networks in list(self.networks.items()):
+            if network_version == version and (value >> (bits - prefixlen)) << (bits - prefixlen) in networks:
+                return True
         return False
 
+    def page(self, filter_text='', offset=0, limit=500):
+        """Obtenir une page d'entrées, éventuellement filtrées ; retourne (entrées, total)."""
+        with self._lock:
+            if filter_text:
+                matches = [entry for entry in self.entries if filter_text in entry]
+                return matches[offset:offset + limit], len(matches)
+            return list(islice(self.entries, offset, offset + limit)), len(self.entries)
+
+    def __contains__(self, ip):
+        return self.contains(ip)
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+class IPManager:
+    def __init__(self, allowed_ips_file='allowed_ips.json', blocked_ips_file='blocked_ips.json'):
+        self.allowed_ips_file = allowed_ips_file
+        self.blocked_ips_file = blocked_ips_file
+        self.allowed_ips = IPList(self.allowed_ips_file)
+        self.blocked_ips = IPList(self.blocked_ips_file)
+
+    def _list(self, name):
+        return self.allowed_ips if name == 'allowed' else self.blocked_ips
+
+    def add_allowed_ip(self, ip):
+        """Ajouter une adresse IP (ou un réseau CIDR) autorisée."""
+        entry = parse_entry(ip)
+        return bool(entry) and self.allowed_ips.add(entry)
+
     def remove_allowed_ip(self, ip):
         """Supprimer une adresse IP autorisée."""
-        if ip in self.allowed_ips:
-            self.allowed_ips.remove(ip)
-            self.save_ips(self.allowed_ips_file, self.allowed_ips)
-            return True
-        return False
+        return self.allowed_ips.remove(parse_entry(ip) or ip)
 
     def add_blocked_ip(self, ip):
-        """Ajouter une adresse IP bloquée."""
-        if ip not in self.blocked_ips:
-            self.blocked_ips.append(ip)
-            self.save_ips(self.blocked_ips_file, self.blocked_ips)
-            return True
-        return False
+        """Ajouter une adresse IP (ou un réseau CIDR) bloquée."""
+        entry = parse_entry(ip)
+        return bool(entry) and self.blocked_ips.add(entry)
 
     def remove_blocked_ip(self, ip):
         """Supprimer une adresse IP bloquée."""
-        if ip in self.blocked_ips:
-            self.blocked_ips.remove(ip)
-            self.save_ips(self.blocked_ips_file, self.blocked_ips)
-            return True
-        return False
+        return self.blocked_ips.remove(parse_entry(ip) or ip)
+
+    def import_ips(self, source, list_name='blocked', fmt=None):
+        """Importer une liste (chemin ou lignes) au format texte, CSV ou CIDR ; retourne les compteurs."""
+        if isinstance(source, str):
+            if fmt is None and source.lower().endswith('.csv'):
+                fmt = 'csv'
+            with open(source, 'r', newline='', encoding='utf-8', errors='replace') as f:
+                entries, invalid = read_entries(f, fmt)
+        else:
+            entries, invalid = read_entries(source, fmt)
+        added = self._list(list_name).add_many(entries)
+        logging.info(f"Imported {added} addresses into the {list_name} list "
+                     f"({len(entries) - added} duplicates, {invalid} invalid lines)")
+        return {'added': added, 'duplicates': len(entries) - added, 'invalid': invalid}
+
+    def page_ips(self, list_name, filter_text='', offset=0, limit=500):
+        """Obtenir une page de la liste 'allowed' ou 'blocked' ; retourne (entrées, total)."""
+        return self._list(list_name).page(filter_text, offset, limit)
+
+    def compact(self):
+        """Réécrire les fichiers des deux listes et vider leurs journaux."""
+        self.allowed_ips.compact()
+        self.blocked_ips.compact()
 
     def get_allowed_ips(self):
         """Obtenir la liste des adresses IP autorisées."""
-        return self.allowed_ips
+        return list(self.allowed_ips)
 
     def get_blocked_ips(self):
         """Obtenir la liste des adresses IP bloquées."""
-        return self.blocked_ips
+        return list(self.blocked_ips)
 
     def is_ip_allowed(self, ip):
         """Vérifier si une adresse IP est autorisée."""
@@ -0,0 +1,172 @@
+import time
+import logging
+import threading
+
+from upnp_manager import DEFAULT_DESCRIPTION, parse_mapping
+
+# Erreur UPnP 725 : le routeur n'accepte que des baux permanents
+PERMANENT_ONLY_CODE = 725
+PERMANENT_ONLY_DESCRIPTION = 'OnlyPermanentLeasesSupported'
+
+def is_permanent_only(result):
+    """Reconnaître l'erreur 725 par son code (client IGD) ou par sa description exacte (miniupnpc)."""
+    if result.get('code') == PERMANENT_ONLY_CODE:
+        return True
+    return PERMANENT_ONLY_DESCRIPTION in (result['error'] or '').split()
+
+class LeaseRenewer:
+    def __init__(self, upnp_manager, lease=3600, check_interval=60, retry_delay=5, max_backoff=300,
+                 description=DEFAULT_DESCRIPTION):
+        self.upnp_manager = upnp_manager
+        self.lease = lease
+        self.check_interval = check_interval
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+        self.description = description
+        self.mappings = {}
+        self._lock = threading.Lock()
+        # Sérialise les appels au routeur : une vérification ne peut pas recréer une règle retirée entre-temps
+        self._router_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _map(self, keys, now):
+        """Créer ou renouveler des règles et mettre à jour leur état (appelé avec _router_lock)."""
+        with self._lock:
+            keys = [key for key in keys if key in self.mappings]
+        if not keys:
+            return []
+        lan_address = self.upnp_manager.get_lan_address()
+        results = self.upnp_manager.add_port_mappings(keys, self.description, self.lease)
+        if self.lease and any(is_permanent_only(r) for r in results):
+            logging.warning("Gateway only supports permanent leases, falling back to permanent mappings")
+            self.lease = 0
+            results = self.upnp_manager.add_port_mappings(keys, self.description, 0)
+
+        with self._lock:
+            for result in results:
+                key = (result['port'], result['protocol'])
+                mapping = self.mappings.get(key)
+                if mapping is None:
+                    continue
+                if result['ok']:
+                    if mapping['since'] is None or mapping['lan_address'] != lan_address:
+                        mapping['since'] = now
+                    mapping.update(status='active', failures=0, error=None, mapped_at=now,
+                                   lan_address=lan_address, next_check=now + self.check_interval)
+                else:
+                    mapping['failures'] += 1
+                    delay = min(self.max_backoff, self.retry_delay * 2 ** (mapping['failures'] - 1))
+                    mapping.update(status='failed', since=None, error=result['error'], next_check=now + delay)
+        return results
+
+    def add(self, specs):
+        """Rediriger des ports et les maintenir actifs ; retourne un résultat par règle."""
+        keys = list(dict.fromkeys(parse_mapping(spec) for spec in specs))
+        with self._lock:
+            for port, protocol in keys:
+                self.mappings.setdefault((port, protocol), {
+                    'port': port, 'protocol': protocol, 'status': 'pending', 'since': None,
+                    'mapped_at': None, 'lan_address': None, 'failures': 0, 'error': None, 'next_check': 0
+                })
+        with self._router_lock:
+            return self._map(keys, time.monotonic())
+
+    def remove(self, specs=None):
+        """Arrêter de maintenir des ports (tous par défaut) et supprimer leurs règles."""
+        # Attend la fin d'une création en cours, qui retrouve ensuite la règle dans l'état actif
+        with self._router_lock:
+            with self._lock:
+                keys = list(self.mappings) if specs is None else [parse_mapping(spec) for spec in specs]
+                active = [key for key in keys if self.mappings.get(key, {}).get('status') == 'active']
+                for key in keys:
+                    self.mappings.pop(key, None)
+            if active:
+                self.upnp_manager.delete_port_mappings(active)
+
+    def _needs_mapping(self, mapping, lan_address, now):
+        if mapping['status'] != 'active':
+            return "mapping failed"
+        if mapping['lan_address'] != lan_address:
+            return f"LAN address changed to {lan_address}"
+        if self.lease and now - mapping['mapped_at'] >= self.lease / 2:
+            return "lease renewal"
+        try:
+            entry = self.upnp_manager.get_specific_port_mapping(mapping['port'], mapping['protocol'])
+        except Exception as e:
+            entry = None
+            logging.warning(f"Failed to check port mapping {mapping['port']}/{mapping['protocol']}: {e}")
+        if entry is None:
+            return "mapping disappeared"
+        if entry['internal_ip'] != lan_address:
+            return f"mapping points to {entry['internal_ip']}"
+        # Les redirections NAT-PMP/PCP ont toujours une durée limitée, même demandées permanentes
+        if entry['lease'] and entry['lease'] <= 2 * self.check_interval:
+            return "lease expiring"
+        return None
+
+    def check(self, now=None):
+        """Vérifier les règles échues et recréer celles qui ont disparu ; retourne les ports recréés."""
+        now = now or time.monotonic()
+        if not self.upnp_manager.ready:
+            return []
+        lan_address = self.upnp_manager.get_lan_address()
+        with self._lock:
+            due = [dict(mapping) for mapping in self.mappings.values() if mapping['next_check'] <= now]
+
+        remap = []
+        for mapping in due:
+            reason = self._needs_mapping(mapping, lan_address, now)
+            key = (mapping['port'], mapping['protocol'])
+            if reason:
+                logging.info(f"Re-creating port mapping {key[0]}/{key[1]}: {reason}")
+                remap.append(key)
+            else:
+                with self._lock:
+                    if key in self.mappings:
+                        self.mappings[key]['next_check'] = now + self.check_interval
+        if remap:
+            with self._router_lock:
+                # Les règles retirées pendant la vérification sont écartées par _map
+                remap = [(r['port'], r['protocol']) for r in self._map(remap, now)]
+        return remap
+
+    def uptime(self, port, protocol='TCP', now=None):
+        """Durée depuis laquelle une règle est active sans interruption (None si inactive)."""
+        with self._lock:
+            mapping = self.mappings.get((port, protocol))
+            since = mapping and mapping['since']
+        if since is None:
+            return None
+        return (now or time.monotonic()) - since
+
+    def status(self):
+        """État des règles maintenues."""
+        now = time.monotonic()
+        with self._lock:
+            mappings = [dict(mapping) for mapping in self.mappings.values()]
+        for mapping in mappings:
+            mapping['uptime'] = now - mapping['since'] if mapping['since'] is not None else None
+        return sorted(mappings, key=lambda mapping: (mapping['port'], mapping['protocol']))
+
+    def _run(self):
+        while not self._stop_event.wait(min(self.check_interval, self.retry_delay)):
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Port mapping check failed: {e}")
+
+    def start(self):
+        """Démarrer la surveillance des règles en arrière-plan."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrêter la surveillance des règles."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
@@ -5,8 +5,11 @@ import os
 import shutil
 import logging
 import threading
+import queue
+import time
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 import socket
+import ipaddress
 import subprocess
 import platform
 import webbrowser
@@ -16,21 +19,23 @@ import qrcode
 from PIL import Image, ImageTk
 import io
 
-# Définir UPNP_AVAILABLE
-try:
-    import miniupnpc
-    UPNP_AVAILABLE = True
-except ImportError:
-    UPNP_AVAILABLE = False
-
 # Import des modules personnalisés
 from network_scanner import NetworkScanner
-from config_manager import ConfigManager
-from upnp_manager import UPnPManager
+from config_manager import ConfigManager, validate_config
+from upnp_manager import UPnPManager, STATE_DISCOVERING, STATE_READY, default_upnp_factory, parse_mapping
 from web_server import WebServer
 from file_manager import FileManager
 from qr_code_generator import QRCodeGenerator
 from ip_manager import IPManager
+from retention_manager import RetentionManager
+from asset_optimizer import AssetOptimizer
+from integrity_manager import IntegrityManager
+from scan_store import ScanStore
+from banner_grabber import BannerGrabber
+from network_state import NetworkState
+from lease_renewer import LeaseRenewer
+from ban_manager import BanManager
+from user_manager import UserManager
 
 class PortForwardingGUI:
     def __init__(self, root):
@@ -57,21 +62,80 @@ class PortForwardingGUI:
         )
 
         # Initialisation des gestionnaires
-        self.upnp_manager = UPnPManager()
+        self.upnp_manager = UPnPManager(backends=self.upnp_backends())
         self.file_manager = FileManager()
+        self.file_manager.integrity = IntegrityManager(self.file_manager.upload_dir)
+        self.file_manager.set_quota(self.config['quota_max_total_mb'], self.config['quota_max_files'])
+        self.retention_manager = RetentionManager(
+            self.file_manager,
+            self.config['retention_max_age_days'],
+            self.config['retention_keep_versions'],
+            self.config['retention_sweep_interval']
+        )
+        self.retention_manager.start()
+        self.files_index_version = None
         self.web_server = WebServer(self.file_manager.upload_dir)
+        self.web_server.variant_original = self.file_manager.variant_original
+        self.apply_optimizer_settings()
         self.network_scanner = NetworkScanner()
         self.ip_manager = IPManager()
+        self.ban_manager = BanManager(
+            rules=self.config['auto_ban_rules'],
+            ban_duration=self.config['auto_ban_duration'],
+            exempt=lambda ip: ip in self.ip_manager.allowed_ips
+        )
+        self.ban_manager.enabled = self.config['auto_ban_enabled']
+        self.web_server.ban_manager = self.ban_manager
+        self.user_manager = UserManager(session_ttl=self.config['session_ttl'])
+        self.web_server.user_manager = self.user_manager
+        self.web_server.auth_required = self.config['web_auth_enabled']
+        self.scan_store = ScanStore()
+        self.network_state = NetworkState(
+            self.upnp_manager.get_public_ip,
+            advertise_interface=self.config['advertise_interface']
+        )
+        self.network_events = queue.Queue()
+        self.network_state.subscribe(self.network_events.put)
+        self.network_state.subscribe(self.upnp_manager.on_network_change)
+        self.network_state.start()
+        self.lease_renewer = LeaseRenewer(
+            self.upnp_manager,
+            lease=self.config['upnp_lease_duration'],
+            check_interval=self.config['upnp_check_interval'],
+            description=self.config['upnp_description']
+        )
+        self.lease_renewer.start()
+
+        # Les modifications de config.json (ou des paramètres) sont appliquées à chaud
+        self.file_manager.on_config_change(self.config)
+        self.config_manager.subscribe(self.file_manager.on_config_change, keys=('max_file_size', 'allowed_extensions'))
+        self.config_manager.subscribe(self.web_server.on_config_change, keys=('port', 'web_auth_enabled'))
+        self.config_manager.subscribe(self.upnp_manager.on_config_change, keys=('natpmp_enabled',))
+        self.config_events = queue.Queue()
+        self.config_manager.subscribe(self.config_events.put)
+        # Le port change sur un thread du serveur web ; le résultat revient par cette file,
+        # comme celui du déplacement de la redirection qui le suit
+        self.port_events = queue.Queue()
+        self.forwarding_events = queue.Queue()
+        self.web_server.port_change_callback = lambda port, error: self.port_events.put((port, error))
+        self.config_manager.start_watching()
 
         # Variables d'état
         self.server_running = False
         self.port_forwarding_active = False
+        self.forwarded_port = None
+        # Suppression des règles après l'arrêt du serveur, hors du thread de l'interface
+        self.release_thread = None
 
         # Configuration de l'interface
         self.setup_gui()
         self.load_settings()
         self.refresh_timer = None
         self.start_refresh_timer()
+        self.poll_network_state()
+        self.poll_config_changes()
+        self.upnp_shown_state = None
+        self.poll_upnp_state()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def setup_gui(self):
@@ -144,6 +208,7 @@ class PortForwardingGUI:
         menubar.add_cascade(label="Tools", menu=tools_menu)
         tools_menu.add_command(label="Port Scanner", command=self.open_port_scanner)
         tools_menu.add_command(label="Network Info", command=self.show_network_info)
+        tools_menu.add_command(label="Verify File Integrity", command=self.verify_file_integrity)
         tools_menu.add_separator()
         tools_menu.add_command(label="Generate QR Code", command=self.generate_qr_code)
 
@@ -172,6 +237,10 @@ class PortForwardingGUI:
         self.port_status_label = ttk.Label(status_frame, textvariable=self.port_status_var, foreground='red')
         self.port_status_label.grid(row=1, column=1, sticky='w')
 
+        self.mapping_uptime_var = tk.StringVar(value="-")
+        ttk.Label(status_frame, text="Mapping Uptime:").grid(row=2, column=0, sticky='w', padx=(0, 10))
+        ttk.Label(status_frame, textvariable=self.mapping_uptime_var).grid(row=2, column=1, sticky='w')
+
         # Contrôle du serveur
         control_frame = ttk.LabelFrame(server_frame, text="Server Control", padding=10)
         control_frame.pack(fill='x', padx=10, pady=5)
@@ -186,12 +255,16 @@ class PortForwardingGUI:
         ttk.Button(port_frame, text="Check Port", command=self.check_port).pack(side='left', padx=5)
 
         self.upnp_var = tk.BooleanVar(value=self.config['upnp_enabled'])
-        upnp_check = ttk.Checkbutton(control_frame, text="Enable UPnP Port Forwarding", variable=self.upnp_var)
-        upnp_check.pack(anchor='w', pady=5)
+        upnp_frame = ttk.Frame(control_frame)
+        upnp_frame.pack(fill='x', pady=5)
+        self.upnp_check = ttk.Checkbutton(upnp_frame, text="Enable UPnP Port Forwarding", variable=self.upnp_var)
+        self.upnp_check.pack(side='left')
+        self.upnp_state_var = tk.StringVar()
+        self.upnp_state_label = ttk.Label(upnp_frame, textvariable=self.upnp_state_var, foreground='gray')
+        self.upnp_state_label.pack(side='left', padx=10)
 
-        if not UPNP_AVAILABLE:
-            upnp_check.config(state='disabled')
-            ttk.Label(control_frame, text="UPnP not available (install miniupnpc)", foreground='red').pack(anchor='w')
+        # Activé une fois la passerelle trouvée (voir poll_upnp_state)
+        self.upnp_check.config(state='disabled')
 
         button_frame = ttk.Frame(control_frame)
         button_frame.pack(fill='x', pady=10)
@@ -234,12 +307,16 @@ class PortForwardingGUI:
         ttk.Button(upload_frame, text="Select Files...", command=self.upload_files).pack(side='left', padx=5)
         ttk.Button(upload_frame, text="Upload Folder...", command=self.upload_folder).pack(side='left', padx=5)
 
+        self.storage_usage_var = tk.StringVar()
+        self.storage_usage_label = ttk.Label(upload_frame, textvariable=self.storage_usage_var)
+        self.storage_usage_label.pack(side='right', padx=5)
+
         # Liste des fichiers
         list_frame = ttk.LabelFrame(files_frame, text="Uploaded Files", padding=10)
         list_frame.pack(fill='both', expand=True, padx=10, pady=5)
 
         columns = ('Name', 'Size', 'Modified', 'Type')
-        self.files_tree = ttk.Treeview(list_frame, columns=columns, show='tree headings')
+        self.files_tree = ttk.Treeview(list_frame, columns=columns, show='tree headings', selectmode='extended')
 
         self.files_tree.heading('#0', text='')
         self.files_tree.column('#0', width=20)
@@ -264,6 +341,7 @@ class PortForwardingGUI:
         self.files_context_menu = tk.Menu(self.root, tearoff=0)
         self.files_context_menu.add_command(label="Open", command=self.open_selected_file)
         self.files_context_menu.add_command(label="Rename", command=self.rename_selected_file)
+        self.files_context_menu.add_command(label="Move...", command=self.move_selected_files)
         self.files_context_menu.add_command(label="Delete", command=self.delete_selected_file)
         self.files_context_menu.add_separator()
         self.files_context_menu.add_command(label="Show in Explorer", command=self.show_in_explorer)
@@ -275,8 +353,10 @@ class PortForwardingGUI:
         ops_frame = ttk.Frame(list_frame)
         ops_frame.grid(row=2, column=0, columnspan=2, pady=5, sticky='ew')
 
-        ttk.Button(ops_frame, text="Refresh", command=self.refresh_files_list).pack(side='left', padx=5)
+        ttk.Button(ops_frame, text="Refresh", command=self.rescan_files).pack(side='left', padx=5)
         ttk.Button(ops_frame, text="Delete Selected", command=self.delete_selected_file).pack(side='left', padx=5)
+        ttk.Button(ops_frame, text="Delete Matching...", command=self.delete_matching_files).pack(side='left', padx=5)
+        ttk.Button(ops_frame, text="Move Selected...", command=self.move_selected_files).pack(side='left', padx=5)
         ttk.Button(ops_frame, text="Open Folder", command=self.open_upload_directory).pack(side='left', padx=5)
 
         self.refresh_files_list()
@@ -293,7 +373,7 @@ class PortForwardingGUI:
         self.network_info_text = scrolledtext.ScrolledText(info_frame, height=10, wrap=tk.WORD)
         self.network_info_text.pack(fill='both', expand=True)
 
-        ttk.Button(info_frame, text="Refresh Network Info", command=self.refresh_network_info).pack(pady=5)
+        ttk.Button(info_frame, text="Refresh Network Info", command=self.force_network_refresh).pack(pady=5)
 
         # Mappage UPnP
         upnp_frame = ttk.LabelFrame(network_frame, text="UPnP Port Mappings", padding=10)
@@ -312,7 +392,38 @@ class PortForwardingGUI:
         self.upnp_tree.pack(side='left', fill='both', expand=True)
         upnp_v_scroll.pack(side='right', fill='y')
 
-        ttk.Button(upnp_frame, text="Refresh UPnP Mappings", command=self.refresh_upnp_mappings).pack(pady=5)
+        ttk.Button(upnp_frame, text="Refresh UPnP Mappings",
+                   command=lambda: self.refresh_upnp_mappings(force=True)).pack(pady=5)
+
+        # Découverte des hôtes du réseau local
+        discovery_frame = ttk.LabelFrame(network_frame, text="Host Discovery", padding=10)
+        discovery_frame.pack(fill='both', expand=True, padx=10, pady=5)
+
+        discovery_controls = ttk.Frame(discovery_frame)
+        discovery_controls.pack(fill='x')
+
+        ttk.Label(discovery_controls, text="Network (CIDR):").pack(side='left')
+        networks = [network['network'] for network in self.network_scanner.get_local_networks()]
+        self.sweep_cidr_var = tk.StringVar(value=networks[0] if networks else "192.168.1.0/24")
+        ttk.Combobox(discovery_controls, textvariable=self.sweep_cidr_var, values=networks, width=20).pack(side='left', padx=5)
+        self.sweep_button = ttk.Button(discovery_controls, text="Sweep", command=self.start_host_sweep)
+        self.sweep_button.pack(side='left', padx=5)
+        self.sweep_cancel_button = ttk.Button(discovery_controls, text="Cancel", state='disabled',
+                                              command=lambda: self.sweep_stop_event.set())
+        self.sweep_cancel_button.pack(side='left', padx=5)
+        self.sweep_status_var = tk.StringVar()
+        ttk.Label(discovery_controls, textvariable=self.sweep_status_var).pack(side='left', padx=5)
+
+        discovery_columns = ('Host', 'Status', 'Response Time', 'Port')
+        self.hosts_tree = ttk.Treeview(discovery_frame, columns=discovery_columns, show='headings', height=6)
+        for col in discovery_columns:
+            self.hosts_tree.heading(col, text=col)
+            self.hosts_tree.column(col, width=120)
+        self.hosts_tree.pack(fill='both', expand=True, pady=5)
+
+        self.sweep_stop_event = threading.Event()
+        self.sweep_queue = queue.Queue()
+        self.sweep_thread = None
 
         self.refresh_network_info()
         self.refresh_upnp_mappings()
@@ -326,6 +437,13 @@ class PortForwardingGUI:
         allowed_ip_frame = ttk.LabelFrame(ip_frame, text="Allowed IPs", padding=10)
         allowed_ip_frame.pack(fill='both', expand=True, padx=10, pady=5)
 
+        # Les listes peuvent contenir des centaines de milliers d'entrées : affichage par pages, avec filtre
+        self.ip_page_size = 500
+        self.ip_list_offsets = {'allowed': 0, 'blocked': 0}
+        self.ip_filter_vars = {}
+        self.ip_page_vars = {}
+        self.create_ip_list_toolbar(allowed_ip_frame, 'allowed')
+
         columns = ('IP Address', 'Status')
         self.allowed_ip_tree = ttk.Treeview(allowed_ip_frame, columns=columns, show='headings')
 
@@ -355,8 +473,11 @@ class PortForwardingGUI:
         ttk.Button(add_ip_frame, text="Add IP", command=self.add_ip).pack(side='left', padx=5)
 
         # Liste des adresses IP bloquées
-        blocked_ip_frame = ttk.LabelFrame(ip_frame, text="Blocked IPs", padding=10)
-        blocked_ip_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        blocked_row = ttk.Frame(ip_frame)
+        blocked_row.pack(fill='both', expand=True, padx=10, pady=5)
+        blocked_ip_frame = ttk.LabelFrame(blocked_row, text="Blocked IPs", padding=10)
+        blocked_ip_frame.pack(side='left', fill='both', expand=True)
+        self.create_ip_list_toolbar(blocked_ip_frame, 'blocked')
 
         self.blocked_ip_tree = ttk.Treeview(blocked_ip_frame, columns=columns, show='headings')
 
@@ -384,9 +505,58 @@ class PortForwardingGUI:
         self.new_blocked_ip_var = tk.StringVar()
         ttk.Entry(add_blocked_ip_frame, textvariable=self.new_blocked_ip_var, width=20).pack(side='left', padx=5)
         ttk.Button(add_blocked_ip_frame, text="Block IP", command=self.block_ip).pack(side='left', padx=5)
+        self.import_blocklist_button = ttk.Button(add_blocked_ip_frame, text="Import Blocklist...", command=self.import_blocklist)
+        self.import_blocklist_button.pack(side='left', padx=5)
+        self.ip_import_queue = queue.Queue()
+
+        # Bannissements automatiques, à côté de la liste de blocage permanente
+        auto_ban_frame = ttk.LabelFrame(blocked_row, text="Auto-Banned IPs", padding=10)
+        auto_ban_frame.pack(side='left', fill='both', expand=True, padx=(10, 0))
+
+        ban_columns = ('IP Address', 'Reason', 'Expires In', 'Bans')
+        self.auto_ban_tree = ttk.Treeview(auto_ban_frame, columns=ban_columns, show='headings')
+        for col in ban_columns:
+            self.auto_ban_tree.heading(col, text=col)
+            self.auto_ban_tree.column(col, width=110)
+
+        v_scrollbar_bans = ttk.Scrollbar(auto_ban_frame, orient='vertical', command=self.auto_ban_tree.yview)
+        self.auto_ban_tree.configure(yscrollcommand=v_scrollbar_bans.set)
+
+        self.auto_ban_tree.pack(side='left', fill='both', expand=True)
+        v_scrollbar_bans.pack(side='right', fill='y')
+
+        self.auto_ban_context_menu = tk.Menu(self.root, tearoff=0)
+        self.auto_ban_context_menu.add_command(label="Unban", command=self.unban_selected_ip)
+        self.auto_ban_context_menu.add_command(label="Block Permanently", command=self.block_banned_ip)
+
+        self.auto_ban_tree.bind("<Button-3>", self.show_auto_ban_context_menu)
 
         # Rafraîchir les listes
         self.refresh_ip_lists()
+        self.refresh_auto_bans()
+
+    def create_ip_list_toolbar(self, parent, list_name):
+        """Créer le filtre et la navigation par pages d'une liste d'adresses IP."""
+        toolbar = ttk.Frame(parent)
+        toolbar.pack(fill='x', pady=(0, 5))
+
+        ttk.Label(toolbar, text="Filter:").pack(side='left')
+        filter_var = tk.StringVar()
+        filter_var.trace_add('write', lambda *args: self.change_ip_page(list_name, None))
+        ttk.Entry(toolbar, textvariable=filter_var, width=20).pack(side='left', padx=5)
+        self.ip_filter_vars[list_name] = filter_var
+
+        ttk.Button(toolbar, text="Next ▶", command=lambda: self.change_ip_page(list_name, 1)).pack(side='right')
+        page_var = tk.StringVar()
+        ttk.Label(toolbar, textvariable=page_var).pack(side='right', padx=5)
+        ttk.Button(toolbar, text="◀ Prev", command=lambda: self.change_ip_page(list_name, -1)).pack(side='right')
+        self.ip_page_vars[list_name] = page_var
+
+    def change_ip_page(self, list_name, step):
+        """Changer de page (step = -1 ou 1) ou revenir à la première page (step = None, nouveau filtre)."""
+        offset = 0 if step is None else self.ip_list_offsets[list_name] + step * self.ip_page_size
+        self.ip_list_offsets[list_name] = max(0, offset)
+        self.refresh_ip_lists()
 
     def create_logs_tab(self):
         """Créer l'onglet des logs."""
@@ -435,6 +605,15 @@ class PortForwardingGUI:
         self.auto_start_var = tk.BooleanVar(value=self.config['auto_start'])
         ttk.Checkbutton(general_frame, text="Auto-start server on launch", variable=self.auto_start_var).pack(anchor='w', pady=2)
 
+        interface_frame = ttk.Frame(general_frame)
+        interface_frame.pack(fill='x', pady=2)
+
+        ttk.Label(interface_frame, text="Advertised Interface:").pack(side='left')
+        self.advertise_interface_var = tk.StringVar(value=self.config['advertise_interface'] or 'auto')
+        self.advertise_interface_combo = ttk.Combobox(interface_frame, textvariable=self.advertise_interface_var,
+                                                      values=['auto'], width=20, state='readonly')
+        self.advertise_interface_combo.pack(side='left', padx=5)
+
         # Paramètres de téléchargement
         upload_frame = ttk.LabelFrame(scrollable_frame, text="File Upload Settings", padding=10)
         upload_frame.pack(fill='x', padx=10, pady=5)
@@ -451,6 +630,47 @@ class PortForwardingGUI:
         self.extensions_text.pack(fill='x', pady=2)
         self.extensions_text.insert('1.0', ', '.join(self.config['allowed_extensions']))
 
+        optimize_frame = ttk.Frame(upload_frame)
+        optimize_frame.pack(fill='x', pady=2)
+
+        self.optimize_uploads_var = tk.BooleanVar(value=self.config['optimize_uploads'])
+        ttk.Checkbutton(optimize_frame, text="Optimize uploaded assets (images, CSS, JS)", variable=self.optimize_uploads_var).pack(side='left')
+        ttk.Label(optimize_frame, text="JPEG Quality:").pack(side='left', padx=(10, 0))
+        self.jpeg_quality_var = tk.StringVar(value=str(self.config['jpeg_quality']))
+        ttk.Spinbox(optimize_frame, from_=10, to=100, textvariable=self.jpeg_quality_var, width=5).pack(side='left', padx=5)
+
+        # Paramètres de quota et de rétention
+        storage_frame = ttk.LabelFrame(scrollable_frame, text="Storage Quota & Retention", padding=10)
+        storage_frame.pack(fill='x', padx=10, pady=5)
+
+        storage_settings = [
+            ("Max Total Size (MB, 0 = unlimited):", 'quota_max_total_mb', 1000000),
+            ("Max File Count (0 = unlimited):", 'quota_max_files', 1000000),
+            ("Delete Files Older Than (days, 0 = never):", 'retention_max_age_days', 3650),
+            ("Keep Latest Versions Per File (0 = all):", 'retention_keep_versions', 1000),
+        ]
+        self.storage_setting_vars = {}
+        for row, (label, key, maximum) in enumerate(storage_settings):
+            ttk.Label(storage_frame, text=label).grid(row=row, column=0, sticky='w', pady=2)
+            var = tk.StringVar(value=str(self.config[key]))
+            ttk.Spinbox(storage_frame, from_=0, to=maximum, textvariable=var, width=10).grid(row=row, column=1, sticky='w', padx=5)
+            self.storage_setting_vars[key] = var
+
+        # Paramètres UPnP
+        upnp_settings_frame = ttk.LabelFrame(scrollable_frame, text="UPnP Settings", padding=10)
+        upnp_settings_frame.pack(fill='x', padx=10, pady=5)
+
+        ttk.Label(upnp_settings_frame, text="Additional Ports (e.g. 8443, 5000/udp):").grid(row=0, column=0, sticky='w', pady=2)
+        self.upnp_extra_ports_var = tk.StringVar(value=', '.join(self.config['upnp_extra_ports']))
+        ttk.Entry(upnp_settings_frame, textvariable=self.upnp_extra_ports_var, width=30).grid(row=0, column=1, sticky='w', padx=5)
+
+        ttk.Label(upnp_settings_frame, text="Mapping Description:").grid(row=1, column=0, sticky='w', pady=2)
+        self.upnp_description_var = tk.StringVar(value=self.config['upnp_description'])
+        ttk.Entry(upnp_settings_frame, textvariable=self.upnp_description_var, width=30).grid(row=1, column=1, sticky='w', padx=5)
+
+        self.natpmp_enabled_var = tk.BooleanVar(value=self.config['natpmp_enabled'])
+        ttk.Checkbutton(upnp_settings_frame, text="Try NAT-PMP/PCP before UPnP", variable=self.natpmp_enabled_var).grid(row=2, column=0, columnspan=2, sticky='w', pady=2)
+
         # Paramètres de sécurité
         security_frame = ttk.LabelFrame(scrollable_frame, text="Security Settings", padding=10)
         security_frame.pack(fill='x', padx=10, pady=5)
@@ -458,6 +678,16 @@ class PortForwardingGUI:
         ttk.Label(security_frame, text="⚠️ Always be cautious when port forwarding", foreground='orange').pack(anchor='w')
         ttk.Label(security_frame, text="Only forward ports when necessary", foreground='gray').pack(anchor='w')
 
+        self.auto_ban_enabled_var = tk.BooleanVar(value=self.config['auto_ban_enabled'])
+        ttk.Checkbutton(security_frame, text="Automatically ban abusive clients (404 scans, request bursts, TLS errors)",
+                        variable=self.auto_ban_enabled_var).pack(anchor='w', pady=(5, 0))
+
+        auth_frame = ttk.Frame(security_frame)
+        auth_frame.pack(fill='x', pady=(5, 0))
+        self.web_auth_enabled_var = tk.BooleanVar(value=self.config['web_auth_enabled'])
+        ttk.Checkbutton(auth_frame, text="Require login for the web server", variable=self.web_auth_enabled_var).pack(side='left')
+        ttk.Button(auth_frame, text="Add User...", command=self.add_web_user).pack(side='left', padx=10)
+
         # Paramètres d'apparence
         appearance_frame = ttk.LabelFrame(scrollable_frame, text="Appearance", padding=10)
         appearance_frame.pack(fill='x', padx=10, pady=5)
@@ -476,6 +706,8 @@ class PortForwardingGUI:
 
         ttk.Button(buttons_frame, text="Save Settings", command=self.save_settings).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Reset to Defaults", command=self.reset_settings).pack(side='left', padx=5)
+        self.settings_error_var = tk.StringVar()
+        ttk.Label(buttons_frame, textvariable=self.settings_error_var, foreground='red', wraplength=500).pack(side='left', padx=10)
 
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
@@ -497,23 +729,77 @@ class PortForwardingGUI:
 
     def load_settings(self):
         """Charger les paramètres depuis la configuration."""
-        self.port_var.set(str(self.config['port']))
+        self.port_var.set(str(self.web_server.port if self.server_running else self.config['port']))
         self.upnp_var.set(self.config['upnp_enabled'])
+        self.default_port_var.set(str(self.config['port']))
+        self.auto_start_var.set(self.config['auto_start'])
+        self.advertise_interface_var.set(self.config['advertise_interface'] or 'auto')
+        self.max_size_var.set(str(self.config['max_file_size']))
+        self.extensions_text.delete('1.0', tk.END)
+        self.extensions_text.insert('1.0', ', '.join(self.config['allowed_extensions']))
+        self.optimize_uploads_var.set(self.config['optimize_uploads'])
+        self.jpeg_quality_var.set(str(self.config['jpeg_quality']))
+        for key, var in self.storage_setting_vars.items():
+            var.set(str(self.config[key]))
+        self.upnp_extra_ports_var.set(', '.join(self.config['upnp_extra_ports']))
+        self.upnp_description_var.set(self.config['upnp_description'])
+        self.natpmp_enabled_var.set(self.config['natpmp_enabled'])
+        self.auto_ban_enabled_var.set(self.config['auto_ban_enabled'])
+        self.web_auth_enabled_var.set(self.config['web_auth_enabled'])
+        self.theme_var.set(self.config['theme'])
 
     def save_settings(self):
         """Sauvegarder les paramètres actuels dans la configuration."""
+        # Les valeurs sont préparées et validées sur une copie : rien n'est appliqué si l'une d'elles est refusée
+        config = dict(self.config)
         try:
-            self.config['port'] = int(self.default_port_var.get())
-            self.config['auto_start'] = self.auto_start_var.get()
-            self.config['max_file_size'] = int(self.max_size_var.get())
-            self.config['theme'] = self.theme_var.get()
-            self.config['window_geometry'] = self.root.geometry()
+            config['port'] = int(self.default_port_var.get())
+            config['auto_start'] = self.auto_start_var.get()
+            config['max_file_size'] = int(self.max_size_var.get())
+            config['theme'] = self.theme_var.get()
+            config['window_geometry'] = self.root.geometry()
 
             extensions_text = self.extensions_text.get('1.0', tk.END).strip()
-            extensions = [ext.strip() for ext in extensions_text.split(',') if ext.strip()]
-            self.config['allowed_extensions'] = extensions
+            config['allowed_extensions'] = [ext.strip() for ext in extensions_text.split(',') if ext.strip()]
+
+            for key, var in self.storage_setting_vars.items():
+                config[key] = int(var.get())
+
+            config['optimize_uploads'] = self.optimize_uploads_var.get()
+            config['jpeg_quality'] = int(self.jpeg_quality_var.get())
+
+            extra_ports = [spec.strip() for spec in self.upnp_extra_ports_var.get().split(',') if spec.strip()]
+            for spec in extra_ports:
+                parse_mapping(spec)
+            config['upnp_extra_ports'] = extra_ports
+            config['upnp_description'] = self.upnp_description_var.get().strip() or 'Port Forwarding App'
+            config['natpmp_enabled'] = self.natpmp_enabled_var.get()
+            config['auto_ban_enabled'] = self.auto_ban_enabled_var.get()
+            config['web_auth_enabled'] = self.web_auth_enabled_var.get()
+
+            interface = self.advertise_interface_var.get()
+            config['advertise_interface'] = '' if interface == 'auto' else interface
+        except ValueError as e:
+            self.settings_error_var.set(f"Invalid value: {e}")
+            return
+
+        errors = validate_config(config)
+        if errors:
+            self.settings_error_var.set('; '.join(f"{key}: {error}" for key, error in errors.items()))
+            return
+        if config['web_auth_enabled'] and not self.user_manager.count_users():
+            messagebox.showwarning("Settings", "Add a user before requiring login for the web server.")
+            self.web_auth_enabled_var.set(False)
+            config['web_auth_enabled'] = False
+        self.settings_error_var.set('')
 
-            self.config_manager.save_config(self.config)
+        try:
+            self.config_manager.save_config(config)
+            self.config = config
+            self.apply_storage_settings()
+            self.apply_optimizer_settings()
+            self.ban_manager.enabled = self.config['auto_ban_enabled']
+            self.network_state.set_advertise_interface(self.config['advertise_interface'])
             messagebox.showinfo("Settings", "Settings saved successfully!")
             self.status_text.set("Settings saved")
 
@@ -523,13 +809,147 @@ class PortForwardingGUI:
             messagebox.showerror("Error", f"Failed to save settings: {e}")
             logging.error(f"Failed to save settings: {e}")
 
+    def add_web_user(self):
+        """Ajouter un utilisateur (ou changer son mot de passe) pour l'accès au serveur web."""
+        username = simpledialog.askstring("Add User", "Username:", parent=self.root)
+        if not username or not username.strip():
+            return
+        password = simpledialog.askstring("Add User", f"Password for {username.strip()}:", show='*', parent=self.root)
+        if not password:
+            return
+        self.user_manager.add_user(username.strip(), password)
+        self.status_text.set(f"User {username.strip()} saved")
+        logging.info(f"Web user {username.strip()} saved")
+
+    def apply_storage_settings(self):
+        """Appliquer les paramètres de quota et de rétention."""
+        self.file_manager.set_quota(self.config['quota_max_total_mb'], self.config['quota_max_files'])
+        self.retention_manager.configure(
+            self.config['retention_max_age_days'],
+            self.config['retention_keep_versions'],
+            self.config['retention_sweep_interval']
+        )
+        self.update_storage_usage()
+
+    def apply_optimizer_settings(self):
+        """Activer ou désactiver l'optimisation des fichiers téléchargés."""
+        if self.file_manager.optimizer:
+            self.file_manager.optimizer.shutdown()
+            self.file_manager.optimizer = None
+        if self.config['optimize_uploads']:
+            self.file_manager.optimizer = AssetOptimizer(self.config['jpeg_quality'])
+        # Optimisation désactivée : les variantes existantes ne sont plus servies à la place des originaux
+        self.web_server.set_serve_variants(bool(self.config['optimize_uploads']))
+
     def reset_settings(self):
         """Réinitialiser les paramètres aux valeurs par défaut."""
         if messagebox.askyesno("Reset Settings", "Reset all settings to defaults?"):
-            self.config = self.config_manager.default_config.copy()
-            self.config_manager.save_config(self.config)
+            config = self.config_manager.default_config.copy()
+            try:
+                self.config_manager.save_config(config)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to save settings: {e}")
+                return
+            self.config = config
             messagebox.showinfo("Settings", "Settings reset to defaults!")
+            self.settings_error_var.set('')
             self.load_settings()
+            self.apply_storage_settings()
+            self.apply_optimizer_settings()
+            self.network_state.set_advertise_interface('')
+            self.ban_manager.enabled = self.config['auto_ban_enabled']
+
+    def poll_config_changes(self):
+        """Appliquer les modifications de configuration signalées par ConfigManager."""
+        changes = {}
+        while not self.config_events.empty():
+            changes.update(self.config_events.get_nowait())
+        if changes:
+            self.apply_config_changes(changes)
+        while not self.port_events.empty():
+            self.apply_port_change(*self.port_events.get_nowait())
+        while not self.forwarding_events.empty():
+            self.apply_forwarding_move(*self.forwarding_events.get_nowait())
+        self.root.after(500, self.poll_config_changes)
+
+    def apply_config_changes(self, changes):
+        """Appliquer une configuration modifiée ; serveur web, fichiers et UPnP sont déjà à jour (abonnés)."""
+        # Les modifications faites depuis l'onglet des paramètres sont déjà appliquées
+        changes = {key: value for key, value in changes.items() if self.config.get(key) != value}
+        if not changes:
+            return
+        self.config.update(changes)
+        if changes.keys() & {'quota_max_total_mb', 'quota_max_files', 'retention_max_age_days',
+                             'retention_keep_versions', 'retention_sweep_interval'}:
+            self.apply_storage_settings()
+        if changes.keys() & {'optimize_uploads', 'jpeg_quality'}:
+            self.apply_optimizer_settings()
+        if 'advertise_interface' in changes:
+            self.network_state.set_advertise_interface(self.config['advertise_interface'])
+        self.ban_manager.enabled = self.config['auto_ban_enabled']
+        self.ban_manager.ban_duration = self.config['auto_ban_duration']
+        self.ban_manager.rules = {event: tuple(rule) for event, rule in self.config['auto_ban_rules'].items()}
+        self.user_manager.sessions.ttl = self.config['session_ttl']
+        self.lease_renewer.lease = self.config['upnp_lease_duration']
+        self.lease_renewer.check_interval = self.config['upnp_check_interval']
+        self.lease_renewer.description = self.config['upnp_description']
+        if 'theme' in changes:
+            self.apply_theme(self.config['theme'])
+        self.load_settings()
+        self.status_text.set(f"Configuration reloaded ({', '.join(sorted(changes))})")
+
+    def apply_port_change(self, port, error):
+        """Suivre le résultat d'un changement de port du serveur web."""
+        if not self.server_running:
+            return
+        if error:
+            self.port_var.set(str(port))
+            self.status_text.set(f"Server still on port {port}")
+            messagebox.showwarning("Port change failed",
+                                   f"Could not move the server to port {self.config['port']}: {error}\n"
+                                   f"The server keeps listening on port {port}.")
+            return
+        self.follow_server_port()
+
+    def follow_server_port(self):
+        """Déplacer la redirection de port après un changement de port du serveur en cours d'exécution."""
+        port = self.web_server.port
+        self.port_var.set(str(port))
+        if not self.port_forwarding_active or self.forwarded_port in (None, port):
+            self.update_connection_info()
+            return
+        old_port = self.forwarded_port
+
+        def run():
+            # Nouvelle règle d'abord : l'ancienne n'est retirée qu'une fois la nouvelle en place
+            try:
+                result = self.lease_renewer.add([(port, 'TCP')])[0]
+                error = None if result['ok'] else result['error'] or "rejected by gateway"
+                if error is None:
+                    self.lease_renewer.remove([(old_port, 'TCP')])
+            except Exception as e:
+                error = str(e)
+            self.forwarding_events.put((port, error))
+
+        self.status_text.set(f"Moving port forwarding to port {port}...")
+        threading.Thread(target=run, daemon=True).start()
+
+    def apply_forwarding_move(self, port, error):
+        """Afficher le résultat du déplacement de la redirection de port."""
+        if not self.server_running:
+            return
+        if error is None:
+            self.forwarded_port = port
+            self.status_text.set(f"Server and port forwarding moved to port {port}")
+        else:
+            logging.warning(f"Failed to forward new port {port}: {error}")
+            self.status_text.set(f"Server moved to port {port} (UPnP failed)")
+        self.update_connection_info()
+
+    def upnp_backends(self):
+        """Clients de redirection de port à essayer, selon la configuration."""
+        # None : NAT-PMP/PCP d'abord, puis UPnP
+        return None if self.config['natpmp_enabled'] else [default_upnp_factory()]
 
     def toggle_server(self):
         """Basculer le serveur web."""
@@ -539,44 +959,108 @@ class PortForwardingGUI:
             self.stop_server()
 
     def start_server(self):
-        """Démarrer le serveur web."""
+        """Démarrer le serveur web ; recherche de port et redirection UPnP se font hors du thread de l'interface."""
         try:
-            port = int(self.port_var.get())
-            if not self.network_scanner.is_port_available(port):
-                messagebox.showerror("Error", f"Port {port} is already in use!")
-                return
-
-            # Vérifiez que le dossier uploaded_files existe
-            if not os.path.exists(self.file_manager.upload_dir):
-                os.makedirs(self.file_manager.upload_dir)
-
-            if self.web_server.start_server(port, self.ip_manager):
-                self.server_running = True
-                self.server_status_var.set("Running")
-                self.server_status_label.config(foreground='green')
-                self.toggle_button.config(text="Stop Server")
-
-                if self.upnp_var.get() and UPNP_AVAILABLE:
-                    if self.upnp_manager.add_port_mapping(port):
-                        self.port_forwarding_active = True
-                        self.port_status_var.set("Active")
-                        self.port_status_label.config(foreground='green')
-                        self.status_text.set(f"Server started with port forwarding on port {port}")
-                    else:
-                        messagebox.showwarning("UPnP Warning", "Server started but UPnP port forwarding failed")
-                        self.status_text.set(f"Server started on port {port} (UPnP failed)")
-                else:
-                    self.status_text.set(f"Server started on port {port}")
-
-                self.update_connection_info()
-                logging.info(f"Server started successfully on port {port}")
-            else:
-                messagebox.showerror("Error", "Failed to start server!")
+            requested_port = int(self.port_var.get())
         except ValueError:
             messagebox.showerror("Error", "Invalid port number!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to start server: {e}")
-            logging.error(f"Failed to start server: {e}")
+            return
+        if getattr(self, 'start_thread', None) and self.start_thread.is_alive():
+            return
+        use_upnp = self.upnp_var.get()
+        self.start_result = None
+
+        def run():
+            try:
+                self.start_result = self.launch_server(requested_port, use_upnp)
+            except Exception as e:
+                logging.error(f"Failed to start server: {e}")
+                self.start_result = e
+
+        self.toggle_button.config(state='disabled')
+        self.status_text.set("Starting server...")
+        self.start_thread = threading.Thread(target=run, daemon=True)
+        self.start_thread.start()
+        self.root.after(100, self.poll_server_start)
+
+    def launch_server(self, requested_port, use_upnp):
+        """Réserver un port, démarrer le serveur et rediriger les ports (thread de travail)."""
+        # Les règles de l'arrêt précédent sont supprimées avant que les nouvelles soient créées
+        if self.release_thread:
+            self.release_thread.join()
+        last_port = min(requested_port + self.config['port_search_range'], 65535)
+        candidates = range(requested_port + 1, last_port + 1)
+        if use_upnp:
+            # Éviter les ports externes déjà redirigés vers une autre machine
+            local_ip = self.network_state.advertise_address()
+            mapped = {mapping['external_port'] for mapping in self.upnp_manager.list_port_mappings()
+                      if mapping['internal_ip'] != local_ip}
+            candidates = [port for port in candidates if port not in mapped]
+
+        # Le socket réservé est transmis tel quel au serveur : aucun autre processus ne peut prendre le port entre-temps
+        sock, port = self.network_scanner.reserve_port(requested_port, candidates)
+        if sock is None:
+            if self.config['port_search_range']:
+                return {'error': f"No free port between {requested_port} and {last_port}!"}
+            return {'error': f"Port {requested_port} is already in use!"}
+        if port != requested_port:
+            logging.warning(f"Port {requested_port} is in use, using port {port} instead")
+
+        # Vérifiez que le dossier uploaded_files existe
+        if not os.path.exists(self.file_manager.upload_dir):
+            os.makedirs(self.file_manager.upload_dir)
+
+        if not self.web_server.start_server(port, self.ip_manager, sock=sock):
+            return {'error': "Failed to start server!"}
+        results = None
+        if use_upnp:
+            specs = [(port, 'TCP')] + [parse_mapping(spec) for spec in self.config['upnp_extra_ports']]
+            self.lease_renewer.description = self.config['upnp_description']
+            results = self.lease_renewer.add(specs)
+        return {'port': port, 'results': results}
+
+    def poll_server_start(self):
+        """Afficher le résultat du démarrage du serveur une fois le thread de travail terminé."""
+        if self.start_thread.is_alive():
+            self.root.after(100, self.poll_server_start)
+            return
+        self.toggle_button.config(state='normal')
+        result = self.start_result
+        if isinstance(result, Exception) or result is None:
+            self.status_text.set("Server not started")
+            messagebox.showerror("Error", f"Failed to start server: {result}")
+            return
+        if 'error' in result:
+            self.status_text.set("Server not started")
+            messagebox.showerror("Error", result['error'])
+            return
+
+        port = result['port']
+        self.port_var.set(str(port))
+        self.server_running = True
+        self.server_status_var.set("Running")
+        self.server_status_label.config(foreground='green')
+        self.toggle_button.config(text="Stop Server")
+
+        results = result['results']
+        if results is not None:
+            failed = [f"{r['port']}/{r['protocol']}: {r['error']}" for r in results if not r['ok']]
+            if results[0]['ok']:
+                self.port_forwarding_active = True
+                self.forwarded_port = port
+                self.port_status_var.set(f"Active ({self.upnp_manager.backend})")
+                self.port_status_label.config(foreground='green')
+                self.status_text.set(f"Server started with port forwarding on port {port}")
+                if failed:
+                    messagebox.showwarning("UPnP Warning", "Some port mappings failed:\n" + '\n'.join(failed))
+            else:
+                messagebox.showwarning("UPnP Warning", "Server started but UPnP port forwarding failed:\n" + '\n'.join(failed))
+                self.status_text.set(f"Server started on port {port} (UPnP failed)")
+        else:
+            self.status_text.set(f"Server started on port {port}")
+
+        self.update_connection_info()
+        logging.info(f"Server started successfully on port {port}")
 
     def stop_server(self):
         """Arrêter le serveur web."""
@@ -587,10 +1071,12 @@ class PortForwardingGUI:
             self.server_status_label.config(foreground='red')
             self.toggle_button.config(text="Start Server")
 
+            # Allers-retours avec la passerelle sur un thread : une passerelle lente ne fige pas l'interface
+            self.release_thread = threading.Thread(target=self.release_port_mappings, daemon=True)
+            self.release_thread.start()
             if self.port_forwarding_active:
-                port = int(self.port_var.get())
-                self.upnp_manager.delete_port_mapping(port)
                 self.port_forwarding_active = False
+                self.forwarded_port = None
                 self.port_status_var.set("Not Active")
                 self.port_status_label.config(foreground='red')
 
@@ -601,14 +1087,25 @@ class PortForwardingGUI:
             messagebox.showerror("Error", f"Failed to stop server: {e}")
             logging.error(f"Failed to stop server: {e}")
 
+    def release_port_mappings(self):
+        """Supprimer les règles de redirection du serveur arrêté (thread de travail)."""
+        try:
+            self.lease_renewer.remove()
+        except Exception as e:
+            logging.error(f"Failed to remove port mappings: {e}")
+
     def check_port(self):
         """Vérifier si le port sélectionné est disponible."""
         try:
             port = int(self.port_var.get())
-            if self.network_scanner.is_port_available(port):
-                messagebox.showinfo("Port Check", f"Port {port} is available!")
+            candidates = range(port, min(port + max(self.config['port_search_range'], 1), 65535) + 1)
+            availability = self.network_scanner.probe_ports(candidates, protocols=('tcp', 'udp'))
+            if availability[port]:
+                messagebox.showinfo("Port Check", f"Port {port} is available (TCP and UDP)!")
             else:
-                messagebox.showwarning("Port Check", f"Port {port} is already in use!")
+                free_ports = [p for p, available in availability.items() if available]
+                suggestion = f"\nNext free port: {free_ports[0]}" if free_ports else ""
+                messagebox.showwarning("Port Check", f"Port {port} is already in use!{suggestion}")
         except ValueError:
             messagebox.showerror("Error", "Invalid port number!")
 
@@ -619,6 +1116,7 @@ class PortForwardingGUI:
             initialdir=self.config['last_directory'],
             filetypes=[
                 ("Web files", "*.html *.css *.js *.png *.jpg *.jpeg *.gif *.ico"),
+                ("Archives", "*.zip *.tar *.tar.gz *.tgz *.tar.bz2 *.tar.xz"),
                 ("All files", "*.*")
             ]
         )
@@ -627,14 +1125,17 @@ class PortForwardingGUI:
             self.config['last_directory'] = os.path.dirname(file_paths[0])
             uploaded_count = 0
             failed_count = 0
+            archive_rates = []
 
             for file_path in file_paths:
                 try:
-                    self.file_manager.upload_file(
-                        file_path,
-                        self.config['max_file_size'],
-                        self.config['allowed_extensions']
-                    )
+                    if self.file_manager.is_archive(file_path):
+                        stats = self.file_manager.upload_archive(file_path)
+                        uploaded_count += stats['files']
+                        failed_count += stats['failed']
+                        archive_rates.append(f"{stats['files_per_s']:.1f} files/s, {stats['mb_per_s']:.2f} MB/s")
+                        continue
+                    self.file_manager.upload_file(file_path)
                     uploaded_count += 1
                 except Exception as e:
                     failed_count += 1
@@ -643,6 +1144,8 @@ class PortForwardingGUI:
             message = f"Uploaded {uploaded_count} files successfully"
             if failed_count > 0:
                 message += f", {failed_count} files failed"
+            if archive_rates:
+                message += f" (archives: {'; '.join(archive_rates)})"
 
             messagebox.showinfo("Upload Complete", message)
             self.refresh_files_list()
@@ -664,11 +1167,7 @@ class PortForwardingGUI:
                 for file in files:
                     file_path = os.path.join(root, file)
                     try:
-                        self.file_manager.upload_file(
-                            file_path,
-                            self.config['max_file_size'],
-                            self.config['allowed_extensions']
-                        )
+                        self.file_manager.upload_file(file_path)
                         uploaded_count += 1
                     except Exception as e:
                         failed_count += 1
@@ -684,8 +1183,8 @@ class PortForwardingGUI:
 
     def refresh_files_list(self):
         """Rafraîchir la liste des fichiers."""
-        for item in self.files_tree.get_children():
-            self.files_tree.delete(item)
+        self.files_index_version = self.file_manager.index_version
+        self.files_tree.delete(*self.files_tree.get_children())
 
         files_info = self.file_manager.list_files()
 
@@ -701,6 +1200,29 @@ class PortForwardingGUI:
                 file_type
             ))
 
+        self.update_storage_usage()
+
+    def rescan_files(self):
+        """Réindexer le répertoire de téléchargement puis rafraîchir la liste."""
+        self.file_manager.rescan()
+        self.refresh_files_list()
+
+    def update_storage_usage(self):
+        """Mettre à jour l'affichage de l'utilisation du stockage."""
+        usage = self.file_manager.get_usage()
+        used_mb = usage['bytes'] / (1024 * 1024)
+        text = f"Usage: {used_mb:.2f} MB"
+        ratios = []
+        if usage['max_bytes']:
+            text += f" / {usage['max_bytes'] / (1024 * 1024):.0f} MB"
+            ratios.append(usage['bytes'] / usage['max_bytes'])
+        text += f" | {usage['files']} files"
+        if usage['max_files']:
+            text += f" / {usage['max_files']}"
+            ratios.append(usage['files'] / usage['max_files'])
+        self.storage_usage_var.set(text)
+        self.storage_usage_label.config(foreground='red' if ratios and max(ratios) >= 0.9 else 'black')
+
     def show_files_context_menu(self, event):
         """Afficher le menu contextuel pour les fichiers."""
         selection = self.files_tree.selection()
@@ -740,19 +1262,49 @@ class PortForwardingGUI:
                 else:
                     messagebox.showerror("Error", "Failed to rename file!")
 
-    def delete_selected_file(self):
-        """Supprimer le fichier sélectionné."""
-        selection = self.files_tree.selection()
-        if selection:
-            item = self.files_tree.item(selection[0])
-            file_name = item['values'][0]
+    def selected_file_names(self):
+        """Obtenir les noms des fichiers sélectionnés dans la liste."""
+        return [str(self.files_tree.item(item)['values'][0]) for item in self.files_tree.selection()]
 
-            if messagebox.askyesno("Delete File", f"Delete '{file_name}'?"):
-                if self.file_manager.delete_file(file_name):
-                    messagebox.showinfo("Success", "File deleted successfully!")
-                    self.refresh_files_list()
-                else:
-                    messagebox.showerror("Error", "Failed to delete file!")
+    def show_batch_result(self, action, done, failed):
+        """Afficher le résultat d'une opération par lot et rafraîchir la liste une seule fois."""
+        self.refresh_files_list()
+        message = f"{done} files {action}"
+        if failed:
+            message += f", {len(failed)} failed"
+            messagebox.showwarning("Batch Operation", message)
+        else:
+            messagebox.showinfo("Success", message)
+        self.status_text.set(message)
+
+    def delete_selected_file(self):
+        """Supprimer les fichiers sélectionnés."""
+        file_names = self.selected_file_names()
+        if file_names:
+            prompt = f"Delete '{file_names[0]}'?" if len(file_names) == 1 else f"Delete {len(file_names)} files?"
+            if messagebox.askyesno("Delete Files", prompt):
+                result = self.file_manager.delete_files(file_names)
+                self.show_batch_result("deleted", len(result['deleted']), result['failed'])
+
+    def delete_matching_files(self):
+        """Supprimer les fichiers correspondant à un motif glob."""
+        pattern = simpledialog.askstring("Delete Matching Files", "Glob pattern (e.g. 2023*_*.html):")
+        if pattern:
+            matches = self.file_manager.select_files(pattern)
+            if not matches:
+                messagebox.showinfo("Delete Matching Files", "No files match this pattern.")
+            elif messagebox.askyesno("Delete Matching Files", f"Delete {len(matches)} files matching '{pattern}'?"):
+                result = self.file_manager.delete_files(matches)
+                self.show_batch_result("deleted", len(result['deleted']), result['failed'])
+
+    def move_selected_files(self):
+        """Déplacer les fichiers sélectionnés dans un sous-dossier."""
+        file_names = self.selected_file_names()
+        if file_names:
+            destination = simpledialog.askstring("Move Files", "Destination folder (relative to upload directory):")
+            if destination is not None:
+                result = self.file_manager.move_files(destination, file_names)
+                self.show_batch_result("moved", len(result['renamed']), result['failed'])
 
     def show_in_explorer(self):
         """Afficher le fichier sélectionné dans l'explorateur de fichiers."""
@@ -787,12 +1339,15 @@ class PortForwardingGUI:
     def update_connection_info(self):
         """Mettre à jour les informations de connexion."""
         port = int(self.port_var.get()) if self.port_var.get().isdigit() else 8080
-        local_ip = self.network_scanner.get_local_ip()
+        state = self.network_state.snapshot()
+        local_ip = self.network_state.advertise_address(state)
         self.local_url_var.set(f"http://{local_ip}:{port}")
 
-        if self.upnp_var.get() and UPNP_AVAILABLE:
-            public_ip = self.upnp_manager.get_public_ip()
-            if public_ip:
+        if self.upnp_var.get():
+            public_ip = state['public_ip'] if state else None
+            if state is None or self.upnp_manager.state == STATE_DISCOVERING:
+                self.public_url_var.set("Detecting...")
+            elif public_ip:
                 self.public_url_var.set(f"http://{public_ip}:{port}")
             else:
                 self.public_url_var.set("UPnP not available")
@@ -830,7 +1385,7 @@ class PortForwardingGUI:
             if self.port_forwarding_active and self.public_url_var.get() != "UPnP disabled":
                 url = self.public_url_var.get()
 
-            if url and url not in ["UPnP disabled", "UPnP not available"]:
+            if url and url not in ["UPnP disabled", "UPnP not available", "Detecting..."]:
                 qr_image = QRCodeGenerator.generate_qr_code(url, 150)
                 self.qr_label.config(image=qr_image)
                 self.qr_label.image = qr_image
@@ -840,29 +1395,71 @@ class PortForwardingGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to generate QR code: {e}")
 
+    def poll_upnp_state(self):
+        """Suivre la découverte UPnP en arrière-plan et activer les contrôles une fois la passerelle trouvée."""
+        state = self.upnp_manager.state
+        # La découverte peut être relancée après un changement de réseau : on continue à surveiller l'état
+        self.root.after(200 if state == STATE_DISCOVERING else 1000, self.poll_upnp_state)
+        if state == self.upnp_shown_state:
+            return
+        self.upnp_shown_state = state
+
+        if state == STATE_DISCOVERING:
+            self.upnp_state_var.set("Discovering gateway…")
+            self.upnp_state_label.config(foreground='gray')
+            self.upnp_check.config(state='disabled')
+            return
+
+        if state == STATE_READY:
+            self.upnp_state_var.set(f"Gateway found ({self.upnp_manager.backend})")
+            self.upnp_state_label.config(foreground='green')
+            self.upnp_check.config(state='normal')
+            self.refresh_upnp_mappings()
+            # L'IP publique n'était pas disponible avant la découverte
+            threading.Thread(target=self.network_state.refresh, kwargs={'force': True}, daemon=True).start()
+        else:
+            self.upnp_state_var.set(f"No gateway found ({self.upnp_manager.error or 'unknown error'})")
+            self.upnp_state_label.config(foreground='red')
+        self.update_connection_info()
+
+    def force_network_refresh(self):
+        """Relire immédiatement l'état réseau en arrière-plan."""
+        threading.Thread(target=self.network_state.refresh, kwargs={'force': True}, daemon=True).start()
+        self.refresh_network_info()
+
+    def poll_network_state(self):
+        """Appliquer les changements d'état réseau signalés par NetworkState."""
+        changed = False
+        while not self.network_events.empty():
+            self.network_events.get_nowait()
+            changed = True
+        if changed:
+            self.update_connection_info()
+            self.refresh_network_info()
+            self.advertise_interface_combo.config(values=['auto'] + self.network_state.interface_names())
+        self.root.after(500, self.poll_network_state)
+
     def refresh_network_info(self):
         """Rafraîchir les informations réseau."""
         try:
             info_lines = []
             info_lines.append("=== Network Information ===\n")
 
-            local_ip = self.network_scanner.get_local_ip()
-            info_lines.append(f"Local IP Address: {local_ip}")
+            state = self.network_state.snapshot()
+            if state is None:
+                info_lines.append("Detecting network configuration...")
+                state = {'interfaces': {}, 'default_ip': None, 'public_ip': None}
 
-            if UPNP_AVAILABLE:
-                public_ip = self.upnp_manager.get_public_ip()
-                info_lines.append(f"Public IP Address: {public_ip or 'Not available'}")
-            else:
-                info_lines.append("Public IP Address: UPnP not available")
+            info_lines.append(f"Local IP Address: {self.network_state.advertise_address(state)}")
+            info_lines.append(f"Default Route Address: {state['default_ip'] or 'No route'}")
+
+            info_lines.append(f"Public IP Address: {state['public_ip'] or 'Not available'}")
 
             info_lines.append("\n=== Network Interfaces ===")
-            for interface, addrs in psutil.net_if_addrs().items():
+            for interface, entries in state['interfaces'].items():
                 info_lines.append(f"\n{interface}:")
-                for addr in addrs:
-                    if addr.family == socket.AF_INET:
-                        info_lines.append(f"  IPv4: {addr.address}")
-                    elif addr.family == socket.AF_INET6:
-                        info_lines.append(f"  IPv6: {addr.address}")
+                for entry in entries:
+                    info_lines.append(f"  {entry['family']}: {entry['address']}")
 
             info_lines.append("\n=== Network Statistics ===")
             net_stats = psutil.net_io_counters()
@@ -876,24 +1473,81 @@ class PortForwardingGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to refresh network info: {e}")
 
-    def refresh_upnp_mappings(self):
-        """Rafraîchir la liste des règles de transfert de port UPnP."""
+    def refresh_upnp_mappings(self, force=False):
+        """Rafraîchir la liste des règles de transfert de port UPnP (force : relire la table du routeur)."""
         for item in self.upnp_tree.get_children():
             self.upnp_tree.delete(item)
 
-        if UPNP_AVAILABLE:
+        try:
+            mappings = self.upnp_manager.list_port_mappings(refresh=force)
+            for mapping in mappings:
+                self.upnp_tree.insert('', 'end', values=(
+                    mapping['external_port'],
+                    mapping['protocol'],
+                    mapping['internal_ip'],
+                    mapping['internal_port'],
+                    mapping['description']
+                ))
+        except Exception as e:
+            logging.error(f"Failed to refresh UPnP mappings: {e}")
+
+    def start_host_sweep(self):
+        """Lancer la découverte des hôtes sur la plage CIDR sélectionnée."""
+        cidr = self.sweep_cidr_var.get().strip()
+        try:
+            network = ipaddress.ip_network(cidr, strict=False)
+        except ValueError:
+            messagebox.showerror("Error", f"Invalid network: {cidr}")
+            return
+
+        self.hosts_tree.delete(*self.hosts_tree.get_children())
+        self.sweep_stop_event = threading.Event()
+        self.sweep_total = network.num_addresses - 2 if network.num_addresses > 2 else network.num_addresses
+        self.sweep_done = 0
+        self.sweep_up = 0
+        self.sweep_button.config(state='disabled')
+        self.sweep_cancel_button.config(state='normal')
+
+        def run():
             try:
-                mappings = self.upnp_manager.list_port_mappings()
-                for mapping in mappings:
-                    self.upnp_tree.insert('', 'end', values=(
-                        mapping['external_port'],
-                        mapping['protocol'],
-                        mapping['internal_ip'],
-                        mapping['internal_port'],
-                        mapping['description']
-                    ))
+                self.network_scanner.sweep_hosts(cidr, self.sweep_queue.put, self.sweep_stop_event)
             except Exception as e:
-                logging.error(f"Failed to refresh UPnP mappings: {e}")
+                self.sweep_queue.put(e)
+            self.sweep_queue.put(None)
+
+        self.sweep_thread = threading.Thread(target=run, daemon=True)
+        self.sweep_thread.start()
+        self.root.after(100, self.poll_host_sweep)
+
+    def poll_host_sweep(self):
+        """Afficher les résultats de la découverte au fil de l'eau."""
+        finished = False
+        while True:
+            try:
+                result = self.sweep_queue.get_nowait()
+            except queue.Empty:
+                break
+            if result is None:
+                finished = True
+            elif isinstance(result, Exception):
+                messagebox.showerror("Error", f"Host discovery failed: {result}")
+            else:
+                self.sweep_done += 1
+                if result['up']:
+                    self.sweep_up += 1
+                    self.hosts_tree.insert('', 'end', values=(
+                        result['host'],
+                        "Up",
+                        f"{result['rtt_ms']:.1f} ms",
+                        result['port']
+                    ))
+
+        self.sweep_status_var.set(f"{self.sweep_done}/{self.sweep_total} scanned, {self.sweep_up} up")
+        if finished:
+            self.sweep_button.config(state='normal')
+            self.sweep_cancel_button.config(state='disabled')
+        else:
+            self.root.after(100, self.poll_host_sweep)
 
     def open_port_scanner(self):
         """Ouvrir la fenêtre de scanner de ports."""
@@ -912,7 +1566,7 @@ class PortForwardingGUI:
         input_frame.pack(fill='x', padx=10, pady=5)
 
         ttk.Label(input_frame, text="Host:").grid(row=0, column=0, sticky='w', padx=(0, 5))
-        host_var = tk.StringVar(value=self.network_scanner.get_local_ip())
+        host_var = tk.StringVar(value=self.network_state.advertise_address())
         ttk.Entry(input_frame, textvariable=host_var, width=20).grid(row=0, column=1, padx=5)
 
         ttk.Label(input_frame, text="Port Range:").grid(row=1, column=0, sticky='w', padx=(0, 5))
@@ -926,36 +1580,227 @@ class PortForwardingGUI:
         ttk.Label(port_frame, text=" - ").pack(side='left')
         ttk.Entry(port_frame, textvariable=end_port_var, width=8).pack(side='left')
 
+        scan_modes = {
+            "Full range": 'full',
+            "Previously open ports": 'open',
+            "Changed ports": 'changed'
+        }
+        ttk.Label(input_frame, text="Scan Mode:").grid(row=2, column=0, sticky='w', padx=(0, 5))
+        mode_var = tk.StringVar(value="Full range")
+        ttk.Combobox(input_frame, textvariable=mode_var, values=list(scan_modes), state='readonly', width=22).grid(row=2, column=1, padx=5)
+
         results_frame = ttk.LabelFrame(scanner_window, text="Scan Results", padding=10)
         results_frame.pack(fill='both', expand=True, padx=10, pady=5)
 
         results_text = scrolledtext.ScrolledText(results_frame, wrap=tk.WORD)
         results_text.pack(fill='both', expand=True)
 
+        progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(results_frame, variable=progress_var, maximum=100).pack(fill='x', pady=(5, 0))
+
+        stop_event = threading.Event()
+        results_queue = queue.Queue()
+        scan_state = {'thread': None, 'total': 0, 'done': 0, 'open': 0, 'failed': False}
+
+        def report_scan():
+            # Enregistrer le scan et afficher les différences avec le précédent
+            self.scan_store.record_scan(scan_state['host'], scan_state['ports'], scan_state['open_ports'], scan_state['started'])
+            diff = self.scan_store.diff_last(scan_state['host'])
+            if diff['previous'] is None:
+                results_text.insert(tk.END, "No previous scan to compare with.\n")
+                return
+            previous = datetime.fromtimestamp(diff['previous']['started']).strftime("%Y-%m-%d %H:%M:%S")
+            results_text.insert(tk.END, f"Changes since {previous}:\n")
+            results_text.insert(tk.END, f"  Newly opened: {', '.join(map(str, diff['opened'])) or 'none'}\n")
+            results_text.insert(tk.END, f"  Newly closed: {', '.join(map(str, diff['closed'])) or 'none'}\n")
+            results_text.see(tk.END)
+
+        def poll_results():
+            # Les résultats arrivent du thread de scan ; l'interface est mise à jour ici
+            if not scanner_window.winfo_exists():
+                return
+            while True:
+                try:
+                    item = results_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] == 'port':
+                    scan_state['done'] += 1
+                    if item[2]:
+                        scan_state['open'] += 1
+                        scan_state['open_ports'].append(item[1])
+                        results_text.insert(tk.END, f"Port {item[1]} is open\n")
+                        results_text.see(tk.END)
+                elif item[0] == 'service':
+                    result = item[1]
+                    if result['error']:
+                        description = f"no answer ({result['error']})"
+                    else:
+                        description = result['service']
+                        if result['server'] or result['banner']:
+                            description += f" - {result['server'] or result['banner']}"
+                        if result['tls'] and result['tls'].get('subject'):
+                            description += f" [TLS: {result['tls']['subject'].get('commonName', '?')}]"
+                    results_text.insert(tk.END, f"Port {result['port']}: {description}\n")
+                    results_text.see(tk.END)
+                elif item[0] == 'services_done':
+                    identify_button.config(state='normal')
+                    scan_button.config(state='normal')
+                elif item[0] == 'error':
+                    scan_state['failed'] = True
+                    messagebox.showerror("Error", f"Scan failed: {item[1]}", parent=scanner_window)
+                elif item[0] == 'done':
+                    status = "Scan cancelled" if stop_event.is_set() else "Scan complete"
+                    if scan_state['open']:
+                        results_text.insert(tk.END, f"\n{status}: found {scan_state['open']} open ports.\n")
+                    else:
+                        results_text.insert(tk.END, f"\n{status}: no open ports found in the specified range.\n")
+                    if not stop_event.is_set() and not scan_state['failed']:
+                        report_scan()
+                    scan_button.config(state='normal')
+                    identify_button.config(state='normal' if scan_state['open_ports'] else 'disabled')
+                    cancel_button.config(state='disabled')
+            if scan_state['total']:
+                progress_var.set(100 * scan_state['done'] / scan_state['total'])
+            if scan_state['thread'] and (scan_state['thread'].is_alive() or not results_queue.empty()):
+                scanner_window.after(100, poll_results)
+
+        def run_scan(host, ports):
+            try:
+                self.network_scanner.scan_port_list(
+                    host, ports,
+                    lambda port, is_open: results_queue.put(('port', port, is_open)),
+                    stop_event
+                )
+            except Exception as e:
+                results_queue.put(('error', e))
+            results_queue.put(('done',))
+
         def scan_ports():
             try:
                 host = host_var.get()
                 start_port = int(start_port_var.get())
                 end_port = int(end_port_var.get())
+                if not 1 <= start_port <= end_port <= 65535:
+                    raise ValueError
 
                 results_text.delete('1.0', tk.END)
-                results_text.insert(tk.END, f"Scanning {host} from port {start_port} to {end_port}...\n\n")
-                scanner_window.update()
-
-                open_ports = self.network_scanner.scan_ports(host, start_port, end_port)
-
-                if open_ports:
-                    results_text.insert(tk.END, f"Found {len(open_ports)} open ports:\n")
-                    for port in open_ports:
-                        results_text.insert(tk.END, f"Port {port} is open\n")
+                mode = scan_modes[mode_var.get()]
+                if mode == 'full':
+                    ports = list(range(start_port, end_port + 1))
+                    results_text.insert(tk.END, f"Scanning {host} from port {start_port} to {end_port}...\n\n")
                 else:
-                    results_text.insert(tk.END, "No open ports found in the specified range.\n")
+                    ports = self.scan_store.rescan_candidates(host, mode)
+                    if ports is None:
+                        results_text.insert(tk.END, f"No previous results for {host}; run a full range scan first.\n")
+                        return
+                    if not ports:
+                        results_text.insert(tk.END, f"The last scan of {host} found no ports to rescan; "
+                                                    f"run a full range scan to look for new ones.\n")
+                        return
+                    results_text.insert(tk.END, f"Rescanning {len(ports)} ports on {host}...\n\n")
+
+                stop_event.clear()
+                scan_state.update(total=len(ports), done=0, open=0, failed=False,
+                                  host=host, ports=ports, open_ports=[], started=time.time())
+                progress_var.set(0)
+                scan_button.config(state='disabled')
+                cancel_button.config(state='normal')
+                identify_button.config(state='disabled')
+
+                scan_state['thread'] = threading.Thread(target=run_scan, args=(host, ports), daemon=True)
+                scan_state['thread'].start()
+                scanner_window.after(100, poll_results)
             except ValueError:
                 messagebox.showerror("Error", "Invalid port numbers!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Scan failed: {e}")
 
-        ttk.Button(input_frame, text="Start Scan", command=scan_ports).grid(row=2, column=1, pady=10)
+        def run_identify(host, ports):
+            try:
+                BannerGrabber().grab_banners(host, ports, lambda result: results_queue.put(('service', result)))
+            except Exception as e:
+                results_queue.put(('error', e))
+            results_queue.put(('services_done',))
+
+        def identify_services():
+            # Lire les bannières des ports ouverts trouvés par le dernier scan
+            ports = sorted(scan_state['open_ports'])
+            results_text.insert(tk.END, f"\nIdentifying services on {len(ports)} open ports...\n")
+            identify_button.config(state='disabled')
+            scan_button.config(state='disabled')
+            scan_state['thread'] = threading.Thread(target=run_identify, args=(scan_state['host'], ports), daemon=True)
+            scan_state['thread'].start()
+            scanner_window.after(100, poll_results)
+
+        def close_window():
+            stop_event.set()
+            scanner_window.destroy()
+
+        button_frame = ttk.Frame(input_frame)
+        button_frame.grid(row=3, column=1, pady=10)
+        scan_button = ttk.Button(button_frame, text="Start Scan", command=scan_ports)
+        scan_button.pack(side='left', padx=5)
+        cancel_button = ttk.Button(button_frame, text="Cancel", command=stop_event.set, state='disabled')
+        cancel_button.pack(side='left', padx=5)
+        identify_button = ttk.Button(button_frame, text="Identify Services", command=identify_services, state='disabled')
+        identify_button.pack(side='left', padx=5)
+        scanner_window.protocol("WM_DELETE_WINDOW", close_window)
+
+    def verify_file_integrity(self):
+        """Vérifier l'intégrité des fichiers hébergés en arrière-plan."""
+        if getattr(self, 'scrub_thread', None) and self.scrub_thread.is_alive():
+            messagebox.showinfo("Integrity Check", "An integrity check is already running.")
+            return
+
+        self.scrub_progress = (0, 0)
+        self.scrub_result = None
+
+        def progress(done, total):
+            self.scrub_progress = (done, total)
+
+        def run():
+            try:
+                self.scrub_result = self.file_manager.scrub(
+                    max_bytes_per_s=self.config['scrub_max_mb_per_s'] * 1024 * 1024,
+                    progress=progress
+                )
+            except Exception as e:
+                logging.error(f"Integrity check failed: {e}")
+                self.scrub_result = e
+
+        self.scrub_thread = threading.Thread(target=run, daemon=True)
+        self.scrub_thread.start()
+        self.root.after(200, self.poll_integrity_check)
+
+    def poll_integrity_check(self):
+        """Suivre la progression de la vérification d'intégrité."""
+        if self.scrub_thread.is_alive():
+            done, total = self.scrub_progress
+            self.status_text.set(f"Verifying file integrity... {done}/{total}")
+            self.root.after(200, self.poll_integrity_check)
+            return
+
+        result = self.scrub_result
+        if isinstance(result, Exception) or result is None:
+            messagebox.showerror("Error", f"Integrity check failed: {result}")
+            return
+
+        lines = [
+            f"{result['ok']} files verified ({result['mb_per_s']:.1f} MB/s)",
+            f"{len(result['unrecorded'])} files not in the manifest"
+        ]
+        if result['mismatched']:
+            lines.append("\nModified files:\n" + '\n'.join(result['mismatched'][:20]))
+        if result['missing']:
+            lines.append("\nMissing files:\n" + '\n'.join(result['missing'][:20]))
+        if result['unrecorded']:
+            # Fichiers ajoutés hors de l'application : à contrôler, jamais adoptés automatiquement
+            lines.append("\nUnrecorded files:\n" + '\n'.join(result['unrecorded'][:20]))
+        self.status_text.set(f"Integrity check: {len(result['mismatched'])} mismatched, {len(result['missing'])} missing, "
+                             f"{len(result['unrecorded'])} unrecorded")
+        if result['mismatched'] or result['missing'] or result['unrecorded']:
+            messagebox.showwarning("Integrity Check", '\n'.join(lines))
+        else:
+            messagebox.showinfo("Integrity Check", '\n'.join(lines))
 
     def show_network_info(self):
         """Afficher les informations réseau détaillées."""
@@ -1065,12 +1910,38 @@ class PortForwardingGUI:
         except:
             self.system_info.set("System info unavailable")
 
+    def update_mapping_status(self):
+        """Afficher la durée de fonctionnement de la redirection du port du serveur."""
+        # Port réellement redirigé : le champ de saisie peut contenir une valeur en cours de modification
+        port = self.forwarded_port
+        if not self.port_forwarding_active or port is None:
+            self.mapping_uptime_var.set("-")
+            return
+        mapping = next((item for item in self.lease_renewer.status()
+                        if item['port'] == port and item['protocol'] == 'TCP'), None)
+        if mapping is None:
+            self.mapping_uptime_var.set("-")
+        elif mapping['uptime'] is None:
+            self.mapping_uptime_var.set(f"Reconnecting ({mapping['error'] or 'mapping lost'})")
+            self.port_status_label.config(foreground='orange')
+        else:
+            minutes, seconds = divmod(int(mapping['uptime']), 60)
+            hours, minutes = divmod(minutes, 60)
+            self.mapping_uptime_var.set(f"{hours}h {minutes:02d}m {seconds:02d}s")
+            self.port_status_label.config(foreground='green')
+
     def start_refresh_timer(self):
         """Démarrer le timer de rafraîchissement automatique."""
         if self.refresh_timer:
             self.root.after_cancel(self.refresh_timer)
 
         self.update_system_info()
+        self.update_mapping_status()
+        self.refresh_auto_bans()
+
+        # Rafraîchir la liste si l'index a changé en arrière-plan (nettoyage, optimisation)
+        if self.file_manager.index_version != self.files_index_version:
+            self.refresh_files_list()
 
         if hasattr(self, 'auto_refresh_logs_var') and self.auto_refresh_logs_var.get():
             if self.notebook.index(self.notebook.select()) == 3:
@@ -1121,10 +1992,25 @@ Features:
     def on_closing(self):
         """Gérer la fermeture de l'application."""
         self.config['window_geometry'] = self.root.geometry()
-        self.config_manager.save_config(self.config)
+        self.config_manager.stop_watching()
+        try:
+            self.config_manager.save_config(self.config)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to save config: {e}")
 
         if self.server_running:
             self.stop_server()
+        if self.release_thread:
+            # Laisser aux règles le temps d'être supprimées avant de quitter
+            self.release_thread.join(5)
+
+        self.retention_manager.stop()
+        self.lease_renewer.stop()
+        self.network_state.stop()
+        self.sweep_stop_event.set()
+        self.file_manager.integrity.flush()
+        if self.file_manager.optimizer:
+            self.file_manager.optimizer.shutdown()
 
         if self.refresh_timer:
             self.root.after_cancel(self.refresh_timer)
@@ -1140,7 +2026,7 @@ Features:
                 self.refresh_ip_lists()
                 self.new_ip_var.set("")
             else:
-                messagebox.showerror("Error", f"Failed to add IP {ip_address}.")
+                messagebox.showerror("Error", f"Failed to add IP {ip_address} (invalid or already listed).")
 
     def remove_selected_ip(self):
         """Supprimer une adresse IP autorisée."""
@@ -1164,7 +2050,7 @@ Features:
                 self.refresh_ip_lists()
                 self.new_blocked_ip_var.set("")
             else:
-                messagebox.showerror("Error", f"Failed to block IP {ip_address}.")
+                messagebox.showerror("Error", f"Failed to block IP {ip_address} (invalid or already listed).")
 
     def unblock_selected_ip(self):
         """Débloquer une adresse IP."""
@@ -1192,20 +2078,97 @@ Features:
             self.blocked_ip_context_menu.post(event.x_root, event.y_root)
 
     def refresh_ip_lists(self):
-        """Rafraîchir les listes des adresses IP autorisées et bloquées."""
-        for item in self.allowed_ip_tree.get_children():
-            self.allowed_ip_tree.delete(item)
+        """Rafraîchir la page affichée des listes d'adresses IP autorisées et bloquées."""
+        for list_name, tree, status in (('allowed', self.allowed_ip_tree, "Allowed"),
+                                        ('blocked', self.blocked_ip_tree, "Blocked")):
+            filter_text = self.ip_filter_vars[list_name].get().strip()
+            offset = self.ip_list_offsets[list_name]
+            entries, total = self.ip_manager.page_ips(list_name, filter_text, offset, self.ip_page_size)
+            if offset and offset >= total:
+                # Page devenue vide (suppression ou filtre) : revenir à la dernière page
+                offset = max(0, (total - 1) // self.ip_page_size * self.ip_page_size)
+                self.ip_list_offsets[list_name] = offset
+                entries, total = self.ip_manager.page_ips(list_name, filter_text, offset, self.ip_page_size)
+
+            tree.delete(*tree.get_children())
+            for entry in entries:
+                tree.insert('', 'end', values=(entry, f"{status} (network)" if '/' in entry else status))
+            if total:
+                self.ip_page_vars[list_name].set(f"{offset + 1}-{offset + len(entries)} of {total:,}")
+            else:
+                self.ip_page_vars[list_name].set("No entries")
+
+    def refresh_auto_bans(self):
+        """Rafraîchir la liste des adresses bannies automatiquement."""
+        bans = self.ban_manager.get_bans()
+        self.auto_ban_tree.delete(*self.auto_ban_tree.get_children())
+        for ban in bans:
+            minutes, seconds = divmod(int(ban['remaining']), 60)
+            self.auto_ban_tree.insert('', 'end', values=(ban['ip'], ban['reason'], f"{minutes}m {seconds:02d}s", ban['count']))
+
+    def show_auto_ban_context_menu(self, event):
+        """Afficher le menu contextuel pour les adresses bannies."""
+        if self.auto_ban_tree.selection():
+            self.auto_ban_context_menu.post(event.x_root, event.y_root)
+
+    def unban_selected_ip(self):
+        """Lever le bannissement de l'adresse sélectionnée."""
+        selection = self.auto_ban_tree.selection()
+        if selection:
+            ip_address = self.auto_ban_tree.item(selection[0])['values'][0]
+            self.ban_manager.unban(ip_address)
+            self.refresh_auto_bans()
+            self.status_text.set(f"Ban lifted for {ip_address}")
+
+    def block_banned_ip(self):
+        """Bloquer définitivement l'adresse bannie sélectionnée."""
+        selection = self.auto_ban_tree.selection()
+        if selection:
+            ip_address = self.auto_ban_tree.item(selection[0])['values'][0]
+            self.ip_manager.add_blocked_ip(ip_address)
+            self.ban_manager.unban(ip_address)
+            self.refresh_ip_lists()
+            self.refresh_auto_bans()
+            self.status_text.set(f"IP {ip_address} added to blocked list")
+
+    def import_blocklist(self):
+        """Importer une liste d'adresses à bloquer (texte, CSV ou CIDR) en arrière-plan."""
+        file_path = filedialog.askopenfilename(
+            title="Import Blocklist",
+            filetypes=[("Blocklists", "*.txt *.csv *.list *.netset"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        self.import_blocklist_button.config(state='disabled')
+        self.status_text.set(f"Importing {os.path.basename(file_path)}...")
 
-        for item in self.blocked_ip_tree.get_children():
-            self.blocked_ip_tree.delete(item)
+        def run():
+            try:
+                self.ip_import_queue.put(('done', self.ip_manager.import_ips(file_path, 'blocked')))
+            except Exception as e:
+                self.ip_import_queue.put(('error', e))
 
-        allowed_ips = self.ip_manager.get_allowed_ips()
-        for ip in allowed_ips:
-            self.allowed_ip_tree.insert('', 'end', values=(ip, "Allowed"))
+        threading.Thread(target=run, daemon=True).start()
+        self.root.after(200, self.poll_ip_import)
 
-        blocked_ips = self.ip_manager.get_blocked_ips()
-        for ip in blocked_ips:
-            self.blocked_ip_tree.insert('', 'end', values=(ip, "Blocked"))
+    def poll_ip_import(self):
+        """Afficher le résultat de l'import d'une liste de blocage."""
+        try:
+            kind, result = self.ip_import_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(200, self.poll_ip_import)
+            return
+        self.import_blocklist_button.config(state='normal')
+        if kind == 'error':
+            messagebox.showerror("Error", f"Failed to import blocklist: {result}")
+            self.status_text.set("Blocklist import failed")
+            logging.error(f"Failed to import blocklist: {result}")
+            return
+        self.refresh_ip_lists()
+        self.status_text.set(f"Blocklist imported: {result['added']:,} addresses added")
+        messagebox.showinfo("Import Blocklist", f"{result['added']:,} addresses added\n"
+                                                f"{result['duplicates']:,} already blocked\n"
+                                                f"{result['invalid']:,} invalid lines skipped")
 
 def main():
     """Point d'entrée principal de l'application."""
@@ -0,0 +1,293 @@
+"""Passerelle IGD simulée pour les tests (réponses SSDP, description et point de contrôle SOAP)."""
+import time
+import random
+import socket
+import threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+from igd_client import WANIP_V1, WANIP_V2
+
+CONTROL_PATH = '/ctl/IPConn'
+DESCRIPTION_PATH = '/rootDesc.xml'
+PROTOCOLS = ('TCP', 'UDP')
+FAULTS = {
+    501: 'ActionFailed', 606: 'Action not authorized', 714: 'NoSuchEntryInArray', 718: 'ConflictInMappingEntry',
+    725: 'OnlyPermanentLeasesSupported', 728: 'NoPortMapsAvailable'
+}
+
+
+def _soap_response(service_type, action, values):
+    arguments = ''.join(f"<{name}>{escape(str(value))}</{name}>" for name, value in values)
+    return (
+        '<?xml version="1.0"?>'
+        '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+        's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+        f'<s:Body><u:{action}Response xmlns:u="{service_type}">{arguments}</u:{action}Response></s:Body>'
+        '</s:Envelope>'
+    )
+
+
+def _soap_fault(code, description):
+    return (
+        '<?xml version="1.0"?>'
+        '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+        's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/"><s:Body><s:Fault>'
+        '<faultcode>s:Client</faultcode><faultstring>UPnPError</faultstring><detail>'
+        '<UPnPError xmlns="urn:schemas-upnp-org:control-1-0">'
+        f'<errorCode>{code}</errorCode><errorDescription>{escape(description)}</errorDescription>'
+        '</UPnPError></detail></s:Fault></s:Body></s:Envelope>'
+    )
+
+
+class IGDError(Exception):
+    def __init__(self, code, description):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+
+
+class MockIGD:
+    """Passerelle simulée : table de règles en mémoire et actions SOAP principales.
+
+    latency : délai (s) ajouté à chaque réponse SSDP et SOAP ; table_size : nombre de règles préexistantes ;
+    fail_rate : proportion d'actions qui échouent (ActionFailed) ; failures : {action: code d'erreur UPnP} ;
+    max_entries : taille maximale de la table (NoPortMapsAvailable au-delà).
+    """
+
+    def __init__(self, host='127.0.0.1', version=2, external_ip='203.0.113.1', latency=0.0, table_size=0,
+                 fail_rate=0.0, failures=None, max_entries=None, seed=None):
+        self.host = host
+        self.version = version
+        self.service_type = WANIP_V2 if version >= 2 else WANIP_V1
+        self.external_ip = external_ip
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.failures = dict(failures or {})
+        self.max_entries = max_entries
+        self.mappings = {}
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = None
+        self.ssdp_socket = None
+        self._threads = []
+        self.populate(table_size)
+
+    @property
+    def control_url(self):
+        return f"http://{self.host}:{self.httpd.server_address[1]}{CONTROL_PATH}"
+
+    @property
+    def location(self):
+        return f"http://{self.host}:{self.httpd.server_address[1]}{DESCRIPTION_PATH}"
+
+    @property
+    def ssdp_address(self):
+        """Adresse à utiliser à la place du groupe multicast SSDP."""
+        return self.ssdp_socket.getsockname()
+
+    def description(self):
+        """Description de périphérique InternetGatewayDevice."""
+        version = 2 if self.version >= 2 else 1
+        return (
+            '<?xml version="1.0"?><root xmlns="urn:schemas-upnp-org:device-1-0">'
+            '<specVersion><major>1</major><minor>0</minor></specVersion><device>'
+            f'<deviceType>urn:schemas-upnp-org:device:InternetGatewayDevice:{version}</deviceType>'
+            '<friendlyName>Mock IGD</friendlyName><deviceList><device>'
+            f'<deviceType>urn:schemas-upnp-org:device:WANDevice:{version}</deviceType><deviceList><device>'
+            f'<deviceType>urn:schemas-upnp-org:device:WANConnectionDevice:{version}</deviceType><serviceList><service>'
+            f'<serviceType>{self.service_type}</serviceType>'
+            f'<serviceId>urn:upnp-org:serviceId:WANIPConn1</serviceId><controlURL>{CONTROL_PATH}</controlURL>'
+            '</service></serviceList></device></deviceList></device></deviceList></device></root>'
+        )
+
+    def _answer_ssdp(self):
+        while True:
+            try:
+                data, addr = self.ssdp_socket.recvfrom(2048)
+            except OSError:
+                return
+            if not data.startswith(b'M-SEARCH'):
+                continue
+            target = ''
+            for line in data.decode('latin-1').split('\r\n'):
+                key, _, value = line.partition(':')
+                if key.strip().lower() == 'st':
+                    target = value.strip()
+            if 'InternetGatewayDevice' not in target and target != 'ssdp:all':
+                continue
+            response = (
+                'HTTP/1.1 200 OK\r\nCACHE-CONTROL: max-age=120\r\n'
+                f'ST: {target}\r\nUSN: uuid:mock-igd::{target}\r\nEXT:\r\n'
+                f'SERVER: Mock/1.0 UPnP/1.1 MockIGD/1.0\r\nLOCATION: {self.location}\r\n\r\n'
+            )
+            time.sleep(self.latency)
+            try:
+                self.ssdp_socket.sendto(response.encode('ascii'), addr)
+            except OSError:
+                return
+
+    def add_mapping(self, port, protocol='TCP', internal_ip='192.168.1.2', internal_port=None,
+                    description='', lease=0, enabled=True):
+        """Ajouter directement une règle dans la table."""
+        with self._lock:
+            self.mappings[(port, protocol)] = {
+                'external_port': port, 'protocol': protocol, 'internal_ip': internal_ip,
+                'internal_port': internal_port or port, 'description': description,
+                'lease': lease, 'enabled': enabled
+            }
+
+    def populate(self, count, start_port=20000, internal_ip='192.168.1.50'):
+        """Remplir la table avec des règles TCP et UDP alternées, comme sur un routeur chargé."""
+        for i in range(count):
+            self.add_mapping(start_port + i // 2, PROTOCOLS[i % 2], internal_ip, description=f"rule{i}")
+
+    def _injected_failure(self, action):
+        code = self.failures.get(action)
+        if code is None and self.fail_rate and self._random.random() < self.fail_rate:
+            code = 501
+        if code is not None:
+            raise IGDError(code, FAULTS.get(code, 'ActionFailed'))
+
+    def _entry_values(self, entry):
+        return [
+            ('NewRemoteHost', ''), ('NewExternalPort', entry['external_port']),
+            ('NewProtocol', entry['protocol']), ('NewInternalPort', entry['internal_port']),
+            ('NewInternalClient', entry['internal_ip']), ('NewEnabled', int(entry['enabled'])),
+            ('NewPortMappingDescription', entry['description']), ('NewLeaseDuration', entry['lease'])
+        ]
+
+    def _listing(self, entries):
+        items = ''.join(
+            '<p:PortMappingEntry>'
+            f"<p:NewRemoteHost></p:NewRemoteHost><p:NewExternalPort>{e['external_port']}</p:NewExternalPort>"
+            f"<p:NewProtocol>{e['protocol']}</p:NewProtocol><p:NewInternalPort>{e['internal_port']}</p:NewInternalPort>"
+            f"<p:NewInternalClient>{e['internal_ip']}</p:NewInternalClient><p:NewEnabled>{int(e['enabled'])}</p:NewEnabled>"
+            f"<p:NewDescription>{escape(e['description'])}</p:NewDescription><p:NewLeaseTime>{e['lease']}</p:NewLeaseTime>"
+            '</p:PortMappingEntry>'
+            for e in entries
+        )
+        return f'<?xml version="1.0"?><p:PortMappingList xmlns:p="urn:schemas-upnp-org:gw:WANIPConnection">{items}</p:PortMappingList>'
+
+    def handle_action(self, action, args):
+        """Exécuter une action SOAP ; retourne la liste des valeurs de sortie ou lève IGDError."""
+        with self._lock:
+            self.requests.append(action)
+            self._injected_failure(action)
+            if action == 'GetExternalIPAddress':
+                return [('NewExternalIPAddress', self.external_ip)]
+            if action == 'AddPortMapping':
+                port, protocol = int(args['NewExternalPort']), args['NewProtocol'].upper()
+                existing = self.mappings.get((port, protocol))
+                if existing and existing['internal_ip'] != args['NewInternalClient']:
+                    raise IGDError(718, 'ConflictInMappingEntry')
+                if not existing and self.max_entries is not None and len(self.mappings) >= self.max_entries:
+                    raise IGDError(728, 'NoPortMapsAvailable')
+                self.mappings[(port, protocol)] = {
+                    'external_port': port, 'protocol': protocol,
+                    'internal_ip': args['NewInternalClient'], 'internal_port': int(args['NewInternalPort']),
+                    'description': args.get('NewPortMappingDescription', ''),
+                    'lease': int(args.get('NewLeaseDuration') or 0),
+                    'enabled': args.get('NewEnabled', '1') in ('1', 'true')
+                }
+                return []
+            if action == 'DeletePortMapping':
+                if self.mappings.pop((int(args['NewExternalPort']), args['NewProtocol'].upper()), None) is None:
+                    raise IGDError(714, 'NoSuchEntryInArray')
+                return []
+            if action == 'GetSpecificPortMappingEntry':
+                entry = self.mappings.get((int(args['NewExternalPort']), args['NewProtocol'].upper()))
+                if entry is None:
+                    raise IGDError(714, 'NoSuchEntryInArray')
+                return [value for value in self._entry_values(entry)
+                        if value[0] not in ('NewRemoteHost', 'NewExternalPort', 'NewProtocol')]
+            if action == 'GetGenericPortMappingEntry':
+                index = int(args['NewPortMappingIndex'])
+                entries = list(self.mappings.values())
+                if index >= len(entries):
+                    raise IGDError(713, 'SpecifiedArrayIndexInvalid')
+                return self._entry_values(entries[index])
+            if action == 'GetListOfPortMappings' and self.version >= 2:
+                start, end = int(args['NewStartPort']), int(args['NewEndPort'])
+                protocol, count = args['NewProtocol'].upper(), int(args['NewNumberOfPorts'])
+                entries = sorted((e for e in self.mappings.values()
+                                  if e['protocol'] == protocol and start <= e['external_port'] <= end),
+                                 key=lambda e: e['external_port'])[:count]
+                if not entries:
+                    raise IGDError(714, 'NoSuchEntryInArray')
+                return [('NewPortListing', self._listing(entries))]
+        raise IGDError(401, 'Invalid Action')
+
+    def _handler(self):
+        igd = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # En-têtes et corps sont écrits séparément : sans TCP_NODELAY, Nagle et l'ACK retardé ajoutent ~40 ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body):
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/xml; charset="utf-8"')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == DESCRIPTION_PATH:
+                    self._send(200, igd.description())
+                else:
+                    self._send(404, '')
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                action = (self.headers.get('SOAPAction') or '').strip('"').rsplit('#', 1)[-1]
+                if self.path != CONTROL_PATH:
+                    self._send(404, '')
+                    return
+                args = {}
+                for element in ET.fromstring(body).iter():
+                    if element.tag.rsplit('}', 1)[-1] == action:
+                        args = {child.tag.rsplit('}', 1)[-1]: (child.text or '') for child in element}
+                time.sleep(igd.latency)
+                try:
+                    values = igd.handle_action(action, args)
+                    self._send(200, _soap_response(igd.service_type, action, values))
+                except IGDError as e:
+                    self._send(500, _soap_fault(e.code, e.description))
+
+        return Handler
+
+    def start(self):
+        """Démarrer le répondeur SSDP et le serveur HTTP sur des ports libres."""
+        self.httpd = ThreadingHTTPServer((self.host, 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.ssdp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.ssdp_socket.bind((self.host, 0))
+        self._threads = [threading.Thread(target=self.httpd.serve_forever, daemon=True),
+                         threading.Thread(target=self._answer_ssdp, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Arrêter le serveur."""
+        if self.ssdp_socket:
+            self.ssdp_socket.close()
+            self.ssdp_socket = None
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,122 @@
+"""Passerelle NAT-PMP/PCP simulée pour les tests (serveur UDP local)."""
+import time
+import socket
+import struct
+import threading
+
+from natpmp_client import NATPMP_VERSION, PCP_VERSION, PROTOCOL_NUMBERS, PROTOCOL_OPCODES, _mapped_ipv6
+
+OPCODE_PROTOCOLS = {opcode: protocol for protocol, opcode in PROTOCOL_OPCODES.items()}
+NUMBER_PROTOCOLS = {number: protocol for protocol, number in PROTOCOL_NUMBERS.items()}
+
+
+class MockNatPmp:
+    """Passerelle simulée : répond en PCP (si pcp=True) et en NAT-PMP, table de redirections en mémoire."""
+
+    def __init__(self, host='127.0.0.1', pcp=True, external_ip='203.0.113.1', latency=0.0):
+        self.host = host
+        self.pcp = pcp
+        self.external_ip = external_ip
+        # Délai (s) avant chaque réponse
+        self.latency = latency
+        self.mappings = {}
+        self.requests = []
+        # Ports externes déjà pris : la passerelle propose alors le port suivant
+        self.busy_ports = set()
+        self.socket = None
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    def _epoch(self):
+        return int(time.monotonic() - self._started)
+
+    def _assign(self, protocol, internal_ip, internal_port, external_port, lifetime):
+        """Créer, renouveler ou supprimer une redirection ; retourne le port externe attribué."""
+        if lifetime == 0:
+            for key in [key for key, m in self.mappings.items()
+                        if key[1] == protocol and m['internal_port'] == internal_port]:
+                del self.mappings[key]
+            return 0
+        for key, mapping in self.mappings.items():
+            if key[1] == protocol and (mapping['internal_ip'], mapping['internal_port']) == (internal_ip, internal_port):
+                mapping['lifetime'] = lifetime
+                return key[0]
+        port = external_port or internal_port
+        while port in self.busy_ports or (port, protocol) in self.mappings:
+            port += 1
+        self.mappings[(port, protocol)] = {'internal_ip': internal_ip, 'internal_port': internal_port,
+                                           'lifetime': lifetime}
+        return port
+
+    def handle(self, data, client_ip):
+        """Traiter un datagramme ; retourne la réponse ou None."""
+        if len(data) < 2:
+            return None
+        version, opcode = data[0], data[1]
+        with self._lock:
+            self.requests.append((version, opcode))
+            if version == PCP_VERSION and self.pcp:
+                if opcode == 0:
+                    return struct.pack('!BBBBII12x', PCP_VERSION, 0x80, 0, 0, 0, self._epoch())
+                if opcode == 1 and len(data) >= 60:
+                    lifetime = struct.unpack('!I', data[4:8])[0]
+                    nonce, number, internal_port, external_port, _ = struct.unpack('!12sB3xHH16s', data[24:60])
+                    protocol = NUMBER_PROTOCOLS.get(number)
+                    if protocol is None:
+                        return struct.pack('!BBBBII12x', PCP_VERSION, 0x81, 0, 9, 0, self._epoch()) + data[24:60]
+                    port = self._assign(protocol, client_ip, internal_port, external_port, lifetime)
+                    header = struct.pack('!BBBBII12x', PCP_VERSION, 0x81, 0, 0, lifetime, self._epoch())
+                    return header + struct.pack('!12sB3xHH16s', nonce, number, internal_port, port,
+                                                _mapped_ipv6(self.external_ip))
+                return struct.pack('!BBBBII12x', PCP_VERSION, 0x80 | opcode, 0, 4, 0, self._epoch())
+            if version != NATPMP_VERSION:
+                # Version non prise en charge (code 1), réponse au format NAT-PMP
+                return struct.pack('!BBHI', NATPMP_VERSION, 0x80 | opcode, 1, self._epoch())
+            if opcode == 0:
+                return struct.pack('!BBHI4s', NATPMP_VERSION, 0x80, 0, self._epoch(),
+                                   socket.inet_aton(self.external_ip))
+            if opcode in OPCODE_PROTOCOLS and len(data) >= 12:
+                internal_port, external_port, lifetime = struct.unpack('!HHI', data[4:12])
+                port = self._assign(OPCODE_PROTOCOLS[opcode], client_ip, internal_port, external_port, lifetime)
+                return struct.pack('!BBHIHHI', NATPMP_VERSION, 0x80 | opcode, 0, self._epoch(), internal_port,
+                                   port, lifetime)
+            return struct.pack('!BBHI', NATPMP_VERSION, 0x80 | opcode, 5, self._epoch())
+
+    def _serve(self):
+        while True:
+            try:
+                data, addr = self.socket.recvfrom(1100)
+            except OSError:
+                return
+            response = self.handle(data, addr[0])
+            if response:
+                time.sleep(self.latency)
+                try:
+                    self.socket.sendto(response, addr)
+                except OSError:
+                    return
+
+    def start(self):
+        """Démarrer le serveur UDP sur un port libre."""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((self.host, 0))
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Arrêter le serveur."""
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,250 @@
+import os
+import time
+import socket
+import struct
+import logging
+import threading
+import ipaddress
+
+NATPMP_PORT = 5351
+NATPMP_VERSION = 0
+PCP_VERSION = 2
+# RFC 6886 : durée recommandée pour une redirection ; une durée nulle supprime la redirection
+DEFAULT_LIFETIME = 7200
+PROTOCOL_OPCODES = {'UDP': 1, 'TCP': 2}
+PROTOCOL_NUMBERS = {'TCP': 6, 'UDP': 17}
+
+NATPMP_ERRORS = {
+    1: 'UnsupportedVersion', 2: 'NotAuthorized', 3: 'NetworkFailure', 4: 'OutOfResources', 5: 'UnsupportedOpcode'
+}
+PCP_ERRORS = {
+    1: 'UNSUPP_VERSION', 2: 'NOT_AUTHORIZED', 3: 'MALFORMED_REQUEST', 4: 'UNSUPP_OPCODE', 5: 'UNSUPP_OPTION',
+    6: 'MALFORMED_OPTION', 7: 'NETWORK_FAILURE', 8: 'NO_RESOURCES', 9: 'UNSUPP_PROTOCOL', 10: 'USER_EX_QUOTA',
+    11: 'CANNOT_PROVIDE_EXTERNAL', 12: 'ADDRESS_MISMATCH', 13: 'EXCESSIVE_REMOTE_PEERS'
+}
+
+
+class NatPmpError(Exception):
+    """Erreur renvoyée par la passerelle NAT-PMP/PCP."""
+
+    def __init__(self, code, description):
+        super().__init__(f"{code} {description}")
+        self.code = code
+        self.description = description
+
+
+def default_gateway():
+    """Adresse IPv4 de la passerelle par défaut (table de routage Linux, sinon adresse .1 du réseau local)."""
+    try:
+        with open('/proc/net/route') as f:
+            for line in f.readlines()[1:]:
+                fields = line.split()
+                if len(fields) > 3 and fields[1] == '00000000' and int(fields[3], 16) & 2:
+                    return socket.inet_ntoa(struct.pack('<L', int(fields[2], 16)))
+    except (OSError, ValueError):
+        pass
+    # Hypothèse courante des box : la passerelle est la première adresse du /24
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect(('8.8.8.8', 80))
+        local_ip = sock.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    return str(ipaddress.ip_network(f"{local_ip}/24", strict=False)[1])
+
+
+def _mapped_ipv6(address):
+    """Adresse IPv4 au format IPv6 (::ffff:a.b.c.d) sur 16 octets, comme l'exige PCP."""
+    return ipaddress.IPv6Address(f"::ffff:{address}").packed
+
+
+def _unmapped(packed):
+    address = ipaddress.IPv6Address(packed)
+    return str(address.ipv4_mapped or address)
+
+
+class NatPmpClient:
+    """Client PCP (RFC 6887) avec repli NAT-PMP (RFC 6886), exposant l'interface de miniupnpc.UPnP."""
+
+    # Les échanges UDP sont protégés par un verrou : les appels peuvent venir de plusieurs threads
+    thread_safe = True
+
+    def __init__(self, gateway=None, initial_timeout=0.25, retries=3):
+        self.discoverdelay = 0
+        self.gateway = gateway
+        self.initial_timeout = initial_timeout
+        self.retries = retries
+        self.version = None
+        self.lanaddr = None
+        self.epoch = None
+        # Les redirections NAT-PMP/PCP ne peuvent pas être listées : on garde celles que l'on a créées
+        self.mappings = {}
+        self._nonces = {}
+        self._lock = threading.Lock()
+
+    def _request(self, packet, expected_length):
+        """Envoyer une requête UDP avec retransmission (délai doublé à chaque tentative)."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.connect(self.gateway)
+            self.lanaddr = sock.getsockname()[0]
+            timeout = self.initial_timeout
+            for _ in range(self.retries):
+                sock.send(packet)
+                deadline = time.monotonic() + timeout
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    sock.settimeout(remaining)
+                    try:
+                        data = sock.recv(1100)
+                    except socket.timeout:
+                        break
+                    except ConnectionRefusedError:
+                        raise NatPmpError(0, "Gateway does not support NAT-PMP/PCP")
+                    if len(data) >= expected_length and data[:2] == bytes([packet[0], packet[1] | 0x80]):
+                        return data
+                    if len(data) >= 4 and data[0] != packet[0]:
+                        # Réponse dans une autre version du protocole (passerelle NAT-PMP interrogée en PCP)
+                        return data
+                timeout *= 2
+            raise NatPmpError(0, "No response from gateway")
+        finally:
+            sock.close()
+
+    def _natpmp_result(self, data):
+        result = struct.unpack('!H', data[2:4])[0]
+        if result:
+            raise NatPmpError(result, NATPMP_ERRORS.get(result, 'Unknown'))
+        self.epoch = struct.unpack('!I', data[4:8])[0]
+
+    def _natpmp_external_address(self):
+        data = self._request(struct.pack('!BB', NATPMP_VERSION, 0), 12)
+        self._natpmp_result(data)
+        return socket.inet_ntoa(data[8:12])
+
+    def _pcp_map(self, protocol, internal_port, external_port, lifetime, external_ip='0.0.0.0'):
+        key = (internal_port, protocol)
+        nonce = self._nonces.setdefault(key, os.urandom(12))
+        packet = struct.pack('!BBHI16s', PCP_VERSION, 1, 0, lifetime, _mapped_ipv6(self.lanaddr))
+        packet += struct.pack('!12sB3xHH16s', nonce, PROTOCOL_NUMBERS[protocol], internal_port, external_port,
+                              _mapped_ipv6(external_ip))
+        data = self._request(packet, 60)
+        if data[0] != PCP_VERSION:
+            raise NatPmpError(1, 'UNSUPP_VERSION')
+        result = data[3]
+        if result:
+            raise NatPmpError(result, PCP_ERRORS.get(result, 'Unknown'))
+        lifetime, self.epoch = struct.unpack('!II', data[4:12])
+        _, _, _, assigned_port, assigned_ip = struct.unpack('!12sB3xHH16s', data[24:60])
+        return assigned_port, _unmapped(assigned_ip), lifetime
+
+    def _natpmp_map(self, protocol, internal_port, external_port, lifetime):
+        packet = struct.pack('!BBHHHI', NATPMP_VERSION, PROTOCOL_OPCODES[protocol], 0, internal_port,
+                             external_port, lifetime)
+        data = self._request(packet, 16)
+        self._natpmp_result(data)
+        _, assigned_port, lifetime = struct.unpack('!HHI', data[8:16])
+        return assigned_port, None, lifetime
+
+    def _map(self, protocol, internal_port, external_port, lifetime):
+        if self.version == PCP_VERSION:
+            return self._pcp_map(protocol, internal_port, external_port, lifetime)
+        return self._natpmp_map(protocol, internal_port, external_port, lifetime)
+
+    def discover(self):
+        """Détecter si la passerelle répond en PCP ou en NAT-PMP ; retourne 1 si oui, 0 sinon."""
+        self.gateway = self.gateway or (default_gateway(), NATPMP_PORT)
+        if not self.gateway[0]:
+            return 0
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.connect(self.gateway)
+                self.lanaddr = sock.getsockname()[0]
+            finally:
+                sock.close()
+            # Une requête PCP ANNOUNCE indique si PCP est disponible ; sinon on essaie NAT-PMP
+            data = self._request(struct.pack('!BBHI16s', PCP_VERSION, 0, 0, 0, _mapped_ipv6(self.lanaddr)), 24)
+            if data[0] == PCP_VERSION and data[3] == 0:
+                self.version = PCP_VERSION
+                self.epoch = struct.unpack('!I', data[8:12])[0]
+                return 1
+            self.version = NATPMP_VERSION
+            self._natpmp_external_address()
+            return 1
+        except (NatPmpError, OSError) as e:
+            logging.info(f"NAT-PMP/PCP not available on {self.gateway[0]}: {e}")
+            return 0
+
+    def selectigd(self):
+        if self.version is None:
+            raise Exception("No NAT-PMP/PCP gateway found")
+        return f"{'pcp' if self.version == PCP_VERSION else 'natpmp'}://{self.gateway[0]}:{self.gateway[1]}"
+
+    @property
+    def protocol_name(self):
+        return 'PCP' if self.version == PCP_VERSION else 'NAT-PMP'
+
+    def externalipaddress(self):
+        if self.version != PCP_VERSION:
+            return self._natpmp_external_address()
+        with self._lock:
+            for mapping in self.mappings.values():
+                if mapping['external_ip']:
+                    return mapping['external_ip']
+        # PCP n'a pas de requête d'adresse externe : une requête MAP de durée nulle (port discard) la renvoie
+        _, external_ip, _ = self._pcp_map('UDP', 9, 0, 0)
+        return external_ip if external_ip != '0.0.0.0' else None
+
+    def addportmapping(self, external_port, protocol, internal_client, internal_port, description, remote_host,
+                       lease=0):
+        protocol = protocol.upper()
+        lifetime = lease or DEFAULT_LIFETIME
+        assigned_port, external_ip, lifetime = self._map(protocol, internal_port, external_port, lifetime)
+        if assigned_port != external_port:
+            # La passerelle a attribué un autre port : on ne garde pas une redirection différente de la demande
+            self._map(protocol, internal_port, 0, 0)
+            raise NatPmpError(718, f"ConflictInMappingEntry (gateway offered port {assigned_port})")
+        with self._lock:
+            self.mappings[(external_port, protocol)] = {
+                'internal_client': internal_client, 'internal_port': internal_port, 'description': description,
+                'external_ip': external_ip, 'expires': time.monotonic() + lifetime, 'lifetime': lifetime
+            }
+        return True
+
+    def deleteportmapping(self, external_port, protocol, remote_host=''):
+        protocol = protocol.upper()
+        with self._lock:
+            mapping = self.mappings.pop((external_port, protocol), None)
+        internal_port = mapping['internal_port'] if mapping else external_port
+        self._map(protocol, internal_port, 0, 0)
+        return True
+
+    def _live_mappings(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, mapping in self.mappings.items() if mapping['expires'] <= now]:
+                del self.mappings[key]
+            return sorted(self.mappings.items())
+
+    def getspecificportmapping(self, external_port, protocol, remote_host=''):
+        for (port, proto), mapping in self._live_mappings():
+            if (port, proto) == (external_port, protocol.upper()):
+                remaining = int(mapping['expires'] - time.monotonic())
+                return (mapping['internal_client'], mapping['internal_port'], mapping['description'], True, remaining)
+        return None
+
+    def getgenericportmapping(self, index):
+        mappings = self._live_mappings()
+        if index >= len(mappings):
+            return None
+        (port, protocol), mapping = mappings[index]
+        return (port, protocol, (mapping['internal_client'], mapping['internal_port']), mapping['description'],
+                '1', '', int(mapping['expires'] - time.monotonic()))
+
+    def getportmappingnumberofentries(self):
+        return len(self._live_mappings())
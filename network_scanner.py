@@ -1,5 +1,61 @@
+import os
 import socket
 import logging
+import asyncio
+import ipaddress
+import time
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+DEFAULT_CONCURRENCY = 500
+DEFAULT_SWEEP_CONCURRENCY = 64
+# Délai minimal du balayage : l'estimation est partagée entre hôtes, et un hôte lent (Wi-Fi en veille,
+# pare-feu qui ralentit les réponses) ne doit pas être déclaré absent parce que les autres répondent vite
+SWEEP_MIN_TIMEOUT = 0.5
+MAX_SWEEP_HOSTS = 65536
+# Ports TCP courants utilisés pour détecter la présence d'un hôte
+DISCOVERY_PORTS = (80, 443, 22, 445, 139, 3389, 8080)
+PROTOCOL_TYPES = {'tcp': socket.SOCK_STREAM, 'udp': socket.SOCK_DGRAM}
+
+def _bind_socket(family, protocol, port, host=''):
+    """Créer un socket lié à un port ; lève OSError si le port est occupé."""
+    sock = socket.socket(family, PROTOCOL_TYPES[protocol])
+    try:
+        if protocol == 'tcp' and os.name != 'nt':
+            # Même comportement que HTTPServer (allow_reuse_address) pour les ports en TIME_WAIT
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if family == socket.AF_INET6:
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            host = host or '::'
+        sock.bind((host, port))
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+class AdaptiveTimeout:
+    """Délai d'attente adaptatif calculé à partir des temps de réponse (RFC 6298)."""
+
+    def __init__(self, initial=0.5, minimum=0.05, maximum=3.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = initial
+        self.srtt = None
+        self.rttvar = None
+
+    def sample(self, rtt):
+        """Intégrer un temps de réponse mesuré."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.value = min(self.maximum, max(self.minimum, self.srtt + 4 * self.rttvar))
 
 class NetworkScanner:
     @staticmethod
@@ -15,26 +71,227 @@ class NetworkScanner:
             logging.error(f"Failed to get local IP: {e}")
             return "127.0.0.1"
 
+    @staticmethod
+    def resolve_host(host):
+        """Résoudre un nom d'hôte une seule fois avant un scan."""
+        return socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)[0][4][0]
+
+    @staticmethod
+    async def probe_port(host, port, timeout):
+        """Tester un port TCP ; retourne (ouvert, temps de réponse ou None)."""
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (host, port)), timeout)
+            return True, time.monotonic() - start
+        except ConnectionRefusedError:
+            return False, time.monotonic() - start
+        except (asyncio.TimeoutError, OSError):
+            return False, None
+        finally:
+            sock.close()
+
+    @staticmethod
+    async def iter_scan(host, ports, concurrency=DEFAULT_CONCURRENCY, timeout=None, stop_event=None):
+        """Scanner des ports en parallèle et produire (port, ouvert) au fil des réponses."""
+        host = NetworkScanner.resolve_host(host)
+        timeout = timeout or AdaptiveTimeout()
+        ports = iter(ports)
+        results = asyncio.Queue()
+
+        async def worker():
+            for port in ports:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                is_open, rtt = await NetworkScanner.probe_port(host, port, timeout.value)
+                if rtt is not None:
+                    timeout.sample(rtt)
+                await results.put((port, is_open))
+            await results.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            remaining = len(workers)
+            while remaining:
+                result = await results.get()
+                if result is None:
+                    remaining -= 1
+                else:
+                    yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    @staticmethod
+    def scan_port_list(host, ports, on_result=None, stop_event=None,
+                       concurrency=DEFAULT_CONCURRENCY, timeout=None):
+        """Scanner une liste de ports en appelant on_result(port, ouvert) pour chaque réponse."""
+        async def run():
+            open_ports = []
+            async for port, is_open in NetworkScanner.iter_scan(host, ports, concurrency, timeout, stop_event):
+                if is_open:
+                    open_ports.append(port)
+                if on_result:
+                    on_result(port, is_open)
+            return sorted(open_ports)
+        return asyncio.run(run())
+
+    @staticmethod
+    def scan_ports_stream(host, start_port, end_port, on_result=None, stop_event=None,
+                          concurrency=DEFAULT_CONCURRENCY, timeout=None):
+        """Scanner une plage de ports en appelant on_result(port, ouvert) pour chaque réponse."""
+        return NetworkScanner.scan_port_list(
+            host, range(start_port, end_port + 1), on_result, stop_event, concurrency, timeout)
+
+    @staticmethod
+    def get_local_networks(include_loopback=False):
+        """Lister les réseaux IPv4 des interfaces locales (psutil.net_if_addrs)."""
+        networks = []
+        if not PSUTIL_AVAILABLE:
+            return networks
+        for interface, addrs in psutil.net_if_addrs().items():
+            for addr in addrs:
+                if addr.family != socket.AF_INET or not addr.netmask:
+                    continue
+                try:
+                    network = ipaddress.ip_interface(f"{addr.address}/{addr.netmask}").network
+                except ValueError:
+                    continue
+                if network.is_loopback and not include_loopback:
+                    continue
+                networks.append({
+                    'interface': interface,
+                    'address': addr.address,
+                    'network': str(network)
+                })
+        return networks
+
+    @staticmethod
+    async def probe_host(host, ports, timeout):
+        """Tester plusieurs ports d'un hôte en parallèle ; la première réponse suffit."""
+        async def probe(port):
+            is_open, rtt = await NetworkScanner.probe_port(host, port, timeout.value)
+            return port, is_open, rtt
+
+        tasks = [asyncio.create_task(probe(port)) for port in ports]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                port, is_open, rtt = await next_done
+                if rtt is not None:
+                    # Connexion acceptée ou refusée : l'hôte a répondu
+                    timeout.sample(rtt)
+                    return {'host': host, 'up': True, 'rtt_ms': rtt * 1000, 'port': port, 'open': is_open}
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return {'host': host, 'up': False, 'rtt_ms': None, 'port': None, 'open': False}
+
+    @staticmethod
+    async def iter_sweep(cidr, ports=DISCOVERY_PORTS, concurrency=DEFAULT_SWEEP_CONCURRENCY,
+                         timeout=None, stop_event=None):
+        """Balayer une plage CIDR et produire l'état de chaque hôte au fil des réponses."""
+        network = ipaddress.ip_network(cidr, strict=False)
+        if network.num_addresses > MAX_SWEEP_HOSTS:
+            raise ValueError(f"Network too large: {network} (maximum {MAX_SWEEP_HOSTS} addresses)")
+        hosts = iter(list(network.hosts()) or [network.network_address])
+        timeout = timeout or AdaptiveTimeout(initial=1.0, minimum=SWEEP_MIN_TIMEOUT)
+        results = asyncio.Queue()
+
+        async def worker():
+            for address in hosts:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                await results.put(await NetworkScanner.probe_host(str(address), ports, timeout))
+            await results.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            remaining = len(workers)
+            while remaining:
+                result = await results.get()
+                if result is None:
+                    remaining -= 1
+                else:
+                    yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    @staticmethod
+    def sweep_hosts(cidr, on_result=None, stop_event=None, ports=DISCOVERY_PORTS,
+                    concurrency=DEFAULT_SWEEP_CONCURRENCY, timeout=None):
+        """Balayer une plage CIDR en appelant on_result(résultat) pour chaque hôte."""
+        async def run():
+            up_hosts = []
+            async for result in NetworkScanner.iter_sweep(cidr, ports, concurrency, timeout, stop_event):
+                if result['up']:
+                    up_hosts.append(result)
+                if on_result:
+                    on_result(result)
+            return sorted(up_hosts, key=lambda result: ipaddress.ip_address(result['host']))
+        return asyncio.run(run())
+
     @staticmethod
     def scan_ports(host, start_port, end_port):
         """Scanner les ports ouverts sur un hôte donné."""
-        open_ports = []
-        for port in range(start_port, end_port + 1):
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(0.1)
-            result = sock.connect_ex((host, port))
-            if result == 0:
-                open_ports.append(port)
-            sock.close()
-        return open_ports
+        return NetworkScanner.scan_ports_stream(host, start_port, end_port)
+
+    @staticmethod
+    def available_families():
+        """Familles d'adresses utilisables sur cette machine."""
+        families = [socket.AF_INET]
+        if socket.has_ipv6:
+            try:
+                socket.socket(socket.AF_INET6, socket.SOCK_STREAM).close()
+                families.append(socket.AF_INET6)
+            except OSError:
+                pass
+        return families
+
+    @staticmethod
+    def probe_ports(ports, protocols=('tcp',), families=None):
+        """Vérifier en une passe la disponibilité de plusieurs ports ; retourne {port: disponible}."""
+        families = families or NetworkScanner.available_families()
+        results = {}
+        for port in ports:
+            sockets = []
+            try:
+                # Tous les sockets d'un port restent ouverts pendant le test pour détecter les conflits
+                for family in families:
+                    for protocol in protocols:
+                        sockets.append(_bind_socket(family, protocol, port))
+                results[port] = True
+            except OSError:
+                results[port] = False
+            finally:
+                for sock in sockets:
+                    sock.close()
+        return results
+
+    @staticmethod
+    def reserve_port(preferred=None, candidates=(), host='', backlog=128):
+        """Réserver un port TCP libre ; retourne le socket en écoute et son port, ou (None, None).
+
+        Le socket reste ouvert et doit être transmis au serveur, ce qui évite qu'un
+        autre processus prenne le port entre la vérification et le démarrage.
+        """
+        ports = ([preferred] if preferred is not None else []) + [port for port in candidates if port != preferred]
+        for port in ports:
+            try:
+                sock = _bind_socket(socket.AF_INET, 'tcp', port, host)
+            except OSError:
+                continue
+            sock.listen(backlog)
+            return sock, sock.getsockname()[1]
+        return None, None
 
     @staticmethod
     def is_port_available(port):
         """Vérifier si un port est disponible."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        try:
-            sock.bind(('', port))
-            sock.close()
-            return True
-        except:
-            return False
+        return NetworkScanner.probe_ports([port])[port]
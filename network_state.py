@@ -0,0 +1,189 @@
+import socket
+import logging
+import threading
+import time
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Adresse utilisée uniquement pour choisir la route par défaut (aucun paquet n'est envoyé)
+ROUTE_PROBE_ADDRESS = ("8.8.8.8", 80)
+
+
+class NetworkState:
+    def __init__(self, public_ip_provider=None, ttl=300, poll_interval=5, advertise_interface='', retry_interval=30):
+        # Seul cache de l'IP publique : le fournisseur (UPnPManager.get_public_ip) interroge la passerelle à chaque appel
+        self.public_ip_provider = public_ip_provider
+        self.ttl = ttl
+        # IP publique encore inconnue (passerelle en cours de découverte, échec) : redemandée plus tôt
+        self.retry_interval = retry_interval
+        self.poll_interval = poll_interval
+        self.advertise_interface = advertise_interface
+        self._state = None
+        self._fingerprint = None
+        self._refreshed = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def read_interfaces():
+        """Lister les adresses IPv4/IPv6 des interfaces actives."""
+        interfaces = {}
+        if not PSUTIL_AVAILABLE:
+            return interfaces
+        stats = psutil.net_if_stats()
+        for name, addrs in psutil.net_if_addrs().items():
+            if name in stats and not stats[name].isup:
+                continue
+            entries = []
+            for addr in addrs:
+                if addr.family == socket.AF_INET:
+                    entries.append({'family': 'IPv4', 'address': addr.address, 'netmask': addr.netmask})
+                elif addr.family == socket.AF_INET6:
+                    entries.append({'family': 'IPv6', 'address': addr.address.split('%')[0], 'netmask': addr.netmask})
+            if entries:
+                interfaces[name] = entries
+        return interfaces
+
+    @staticmethod
+    def default_route_ip():
+        """Obtenir l'adresse source de la route par défaut ; None s'il n'y a pas de route."""
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect(ROUTE_PROBE_ADDRESS)
+            return s.getsockname()[0]
+        except OSError:
+            return None
+        finally:
+            s.close()
+
+    @staticmethod
+    def _fingerprint_of(interfaces, default_ip):
+        addresses = sorted((name, entry['address']) for name, entries in interfaces.items() for entry in entries)
+        return tuple(addresses), default_ip
+
+    def refresh(self, force=False):
+        """Relire l'état réseau ; l'IP publique n'est redemandée qu'après un changement ou l'expiration du TTL."""
+        with self._refresh_lock:
+            interfaces = self.read_interfaces()
+            default_ip = self.default_route_ip()
+            fingerprint = self._fingerprint_of(interfaces, default_ip)
+            changed = fingerprint != self._fingerprint
+            age = time.monotonic() - self._refreshed
+            missing = self.public_ip_provider is not None and self._state is not None and not self._state['public_ip']
+            expired = age >= (self.retry_interval if missing else self.ttl)
+            if self._state is not None and not (changed or expired or force):
+                return self._state
+
+            public_ip = None
+            if self.public_ip_provider:
+                try:
+                    public_ip = self.public_ip_provider()
+                except Exception as e:
+                    logging.error(f"Failed to get public IP: {e}")
+
+            state = {
+                'interfaces': interfaces,
+                'default_ip': default_ip,
+                'public_ip': public_ip,
+                'updated': time.time()
+            }
+            with self._lock:
+                previous, self._state = self._state, state
+                self._fingerprint = fingerprint
+                self._refreshed = time.monotonic()
+
+            if previous is None or any(previous[key] != state[key] for key in ('interfaces', 'default_ip', 'public_ip')):
+                if previous is not None:
+                    logging.info(f"Network state changed (local IP {default_ip}, public IP {public_ip})")
+                self._notify(state)
+            return state
+
+    def snapshot(self):
+        """Obtenir le dernier état connu sans interroger le réseau (None avant la première lecture)."""
+        with self._lock:
+            return self._state
+
+    def get_state(self):
+        """Obtenir l'état réseau, en le lisant s'il n'est pas encore connu."""
+        return self.snapshot() or self.refresh()
+
+    def interface_names(self):
+        """Lister les interfaces ayant une adresse IPv4."""
+        state = self.snapshot() or {'interfaces': {}}
+        return sorted(name for name, entries in state['interfaces'].items()
+                      if any(entry['family'] == 'IPv4' for entry in entries))
+
+    def advertise_address(self, state=None):
+        """Choisir l'adresse locale à annoncer : interface configurée, route par défaut, puis première adresse non locale."""
+        state = state or self.snapshot()
+        if state is None:
+            return "127.0.0.1"
+        ipv4 = {name: [entry['address'] for entry in entries if entry['family'] == 'IPv4']
+                for name, entries in state['interfaces'].items()}
+        if ipv4.get(self.advertise_interface):
+            return ipv4[self.advertise_interface][0]
+        if state['default_ip']:
+            return state['default_ip']
+        for addresses in ipv4.values():
+            for address in addresses:
+                if not address.startswith('127.'):
+                    return address
+        return "127.0.0.1"
+
+    def set_advertise_interface(self, name):
+        """Changer l'interface dont l'adresse est annoncée."""
+        self.advertise_interface = name or ''
+        state = self.snapshot()
+        if state:
+            self._notify(state)
+
+    def subscribe(self, callback):
+        """Appeler callback(state) à chaque changement de l'état réseau."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Ne plus notifier callback."""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _notify(self, state):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(state)
+            except Exception as e:
+                logging.error(f"Network state subscriber failed: {e}")
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Network state refresh failed: {e}")
+            if self._stop_event.wait(self.poll_interval):
+                break
+
+    def start(self):
+        """Surveiller les interfaces en arrière-plan."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrêter la surveillance."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
@@ -0,0 +1,85 @@
+import os
+import re
+import logging
+import threading
+from datetime import datetime, timedelta
+
+# Préfixe horodaté ajouté par FileManager.upload_file
+TIMESTAMP_PREFIX = re.compile(r'^\d{8}_\d{6}_')
+
+class RetentionManager:
+    def __init__(self, file_manager, max_age_days=0, keep_versions=0, interval=300):
+        self.file_manager = file_manager
+        self.max_age_days = max_age_days
+        self.keep_versions = keep_versions
+        self.interval = interval
+        self.deleted_count = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def base_name(file_name):
+        """Obtenir le nom de base d'un fichier sans son préfixe horodaté."""
+        directory, name = os.path.split(file_name)
+        return os.path.join(directory, TIMESTAMP_PREFIX.sub('', name))
+
+    def configure(self, max_age_days=0, keep_versions=0, interval=None):
+        """Mettre à jour les politiques de rétention."""
+        self.max_age_days = max_age_days
+        self.keep_versions = keep_versions
+        if interval:
+            self.interval = interval
+
+    def expired_files(self, now=None):
+        """Lister les fichiers à supprimer selon les politiques de rétention."""
+        now = now or datetime.now()
+        files = self.file_manager.list_files()
+        expired = set()
+
+        if self.max_age_days:
+            limit = now - timedelta(days=self.max_age_days)
+            expired.update(info['name'] for info in files if info['modified'] < limit)
+
+        if self.keep_versions:
+            versions = {}
+            for info in files:
+                versions.setdefault(self.base_name(info['name']), []).append(info)
+            for infos in versions.values():
+                if len(infos) > self.keep_versions:
+                    infos.sort(key=lambda info: (info['modified'], info['name']), reverse=True)
+                    expired.update(info['name'] for info in infos[self.keep_versions:])
+
+        return sorted(expired)
+
+    def sweep(self):
+        """Appliquer les politiques de rétention."""
+        expired = self.expired_files()
+        if not expired:
+            return []
+        deleted = self.file_manager.delete_files(expired)['deleted']
+        if deleted:
+            self.deleted_count += len(deleted)
+            logging.info(f"Retention sweep removed {len(deleted)} files")
+        return deleted
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Retention sweep failed: {e}")
+
+    def start(self):
+        """Démarrer le nettoyage périodique en arrière-plan."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrêter le nettoyage périodique."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
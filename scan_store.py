@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+import time
+
+
+def encode_ports(ports):
+    """Encoder une liste de ports sous forme de plages compactes (ex. '1-1024,8080')."""
+    ranges = []
+    for port in sorted(set(ports)):
+        if ranges and port == ranges[-1][1] + 1:
+            ranges[-1][1] = port
+        else:
+            ranges.append([port, port])
+    return ','.join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def decode_ports(text):
+    """Décoder une liste de ports encodée par encode_ports."""
+    ports = set()
+    for part in filter(None, (text or '').split(',')):
+        if '-' in part:
+            a, b = part.split('-')
+            ports.update(range(int(a), int(b) + 1))
+        else:
+            ports.add(int(part))
+    return ports
+
+
+class ScanStore:
+    def __init__(self, db_file='scan_results.db'):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS scans (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    host TEXT NOT NULL,
+                    started REAL NOT NULL,
+                    finished REAL NOT NULL,
+                    ports TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS scans_host_time ON scans (host, started);
+                -- Seuls les ports ouverts sont stockés ; les autres ports scannés sont fermés
+                CREATE TABLE IF NOT EXISTS open_ports (
+                    scan_id INTEGER NOT NULL REFERENCES scans (id),
+                    host TEXT NOT NULL,
+                    port INTEGER NOT NULL,
+                    scanned_at REAL NOT NULL,
+                    PRIMARY KEY (scan_id, port)
+                );
+                CREATE INDEX IF NOT EXISTS open_ports_host_port ON open_ports (host, port, scanned_at);
+            ''')
+
+    def close(self):
+        """Fermer la base de données."""
+        self.conn.close()
+
+    def record_scan(self, host, ports, open_ports, started, finished=None):
+        """Enregistrer le résultat d'un scan."""
+        finished = finished or time.time()
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO scans (host, started, finished, ports) VALUES (?, ?, ?, ?)',
+                (host, started, finished, encode_ports(ports))
+            )
+            scan_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT INTO open_ports (scan_id, host, port, scanned_at) VALUES (?, ?, ?, ?)',
+                [(scan_id, host, port, finished) for port in sorted(set(open_ports))]
+            )
+        return scan_id
+
+    def last_scans(self, host, limit=2):
+        """Obtenir les derniers scans d'un hôte, du plus récent au plus ancien."""
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT * FROM scans WHERE host = ? ORDER BY started DESC, id DESC LIMIT ?',
+                (host, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_open_ports(self, scan_id):
+        """Obtenir les ports ouverts d'un scan."""
+        with self._lock:
+            rows = self.conn.execute('SELECT port FROM open_ports WHERE scan_id = ?', (scan_id,)).fetchall()
+        return {row['port'] for row in rows}
+
+    def _states(self, scan):
+        return decode_ports(scan['ports']), self.get_open_ports(scan['id'])
+
+    def diff_last(self, host):
+        """Comparer les deux derniers scans d'un hôte (ports nouvellement ouverts ou fermés)."""
+        scans = self.last_scans(host, 2)
+        if len(scans) < 2:
+            return {'opened': [], 'closed': [], 'previous': None}
+        current_ports, current_open = self._states(scans[0])
+        previous_ports, previous_open = self._states(scans[1])
+        # Seuls les ports couverts par les deux scans sont comparables
+        common = current_ports & previous_ports
+        return {
+            'opened': sorted((current_open - previous_open) & common),
+            'closed': sorted((previous_open - current_open) & common),
+            'previous': scans[1]
+        }
+
+    def rescan_candidates(self, host, mode='open', depth=5):
+        """Ports à revérifier : ouverts au dernier scan ('open') ou ayant changé d'état ('changed') ;
+        None si l'hôte n'a jamais été scanné (une liste vide signifie que le dernier scan n'a rien trouvé)."""
+        scans = self.last_scans(host, depth if mode == 'changed' else 1)
+        if not scans:
+            return None
+        latest_open = self.get_open_ports(scans[0]['id'])
+        if mode == 'open':
+            return sorted(latest_open)
+
+        candidates = set(latest_open)
+        states = [self._states(scan) for scan in scans]
+        for (ports_a, open_a), (ports_b, open_b) in zip(states, states[1:]):
+            candidates |= (open_a ^ open_b) & ports_a & ports_b
+        return sorted(candidates)
@@ -0,0 +1,44 @@
+import pytest
+
+flask = pytest.importorskip('flask')
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # api crée ses gestionnaires à l'import, dans le répertoire courant
+    monkeypatch.chdir(tmp_path)
+    import api
+    from file_manager import FileManager
+    from user_manager import UserManager
+    monkeypatch.setattr(api, 'file_manager', FileManager(str(tmp_path / "uploads")))
+    monkeypatch.setattr(api, 'user_manager', UserManager(str(tmp_path / "users.db"), iterations=1000))
+    api.user_manager.add_user('alice', 'secret')
+    client = api.app.test_client()
+    token = client.post('/login', json={'username': 'alice', 'password': 'secret'}).get_json()['token']
+    client.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+    return client
+
+def test_batch_requests_are_validated(client):
+    for path, body in [
+        ('/files/delete', {'names': "index.html"}),
+        ('/files/delete', {'pattern': 5}),
+        ('/files/delete', ["index.html"]),
+        ('/files/move', {'names': ["index.html"]}),
+        ('/files/move', {'names': ["index.html"], 'destination': 3}),
+        ('/files/rename', {'renames': ["index.html"]}),
+        ('/files/rename', {'renames': {'index.html': None}}),
+    ]:
+        response = client.post(path, json=body)
+        assert response.status_code == 400, (path, body)
+        assert 'error' in response.get_json()
+
+def test_batch_results(client, tmp_path):
+    # Fichiers créés hors de l'API après la construction de l'index : retrouvés sans nouveau parcours complet
+    for name in ("a.html", "b.html", "style.css"):
+        (tmp_path / "uploads" / name).write_text("x")
+    result = client.post('/files/move', json={'pattern': "*.html", 'destination': "site"}).get_json()
+    assert result == {'renamed': {'a.html': "site/a.html", 'b.html': "site/b.html"}, 'failed': []}
+    result = client.post('/files/rename', json={'renames': {'style.css': "main.css", 'missing.css': "x.css"}}).get_json()
+    assert result == {'renamed': {'style.css': "main.css"}, 'failed': ["missing.css"]}
+    result = client.post('/files/delete', json={'names': ["main.css"], 'pattern': "site/*"}).get_json()
+    assert sorted(result['deleted']) == ["main.css", "site/a.html", "site/b.html"]
+    assert result['failed'] == []
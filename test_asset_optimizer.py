@@ -0,0 +1,41 @@
+import os
+from asset_optimizer import best_variant, is_variant, minify_css, minify_js, optimize_asset, original_path
+
+def test_minify_css_preserves_strings():
+    css = "/* header */\nbody {\n    color : red;\n}\na::after { content: \"  ; { \"; }\n"
+    assert minify_css(css) == 'body{color : red;}a::after{content: "  ; { ";}'
+
+def test_minify_js_drops_comments_and_indentation():
+    js = "// comment\nfunction f() {\n    return 1;\n}\n\n"
+    assert minify_js(js) == "function f() {\nreturn 1;\n}"
+
+def test_optimize_asset_creates_smaller_variant(tmp_path):
+    style = tmp_path / "style.css"
+    style.write_text("body {\n    margin: 0;\n}\n")
+    created = optimize_asset(str(style))
+    assert created == [str(tmp_path / "style.min.css")]
+    assert is_variant(created[0])
+    assert original_path(created[0]) == str(style)
+    assert original_path('/img/photo.w320.JPG') == '/img/photo.JPG'
+    assert best_variant(str(style), {created[0]: str(style)}.get) == created[0]
+    assert optimize_asset(created[0]) == []
+
+def test_user_min_files_are_left_alone(tmp_path):
+    style = tmp_path / "style.css"
+    style.write_text("body {\n    margin: 0;\n}\n")
+    own = tmp_path / "style.min.css"
+    own.write_text("/* mine */")
+    # Le fichier de l'utilisateur n'est ni écrasé ni servi à la place de l'original
+    assert optimize_asset(str(style)) == []
+    assert own.read_text() == "/* mine */"
+    assert best_variant(str(style), lambda path: None) == str(style)
+
+def test_best_variant_ignores_stale_variant(tmp_path):
+    style = tmp_path / "style.css"
+    style.write_text("body {\n    margin: 0;\n}\n")
+    variant = optimize_asset(str(style))[0]
+    original_of = {variant: str(style)}.get
+    assert best_variant(str(style), original_of) == variant
+    # L'original est remplacé après la génération de la variante
+    os.utime(variant, (1, 1))
+    assert best_variant(str(style), original_of) == str(style)
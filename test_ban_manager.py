@@ -0,0 +1,44 @@
+from ban_manager import BanManager
+
+def test_sliding_window_and_expiry():
+    bans = BanManager(rules={'not_found': (3, 10)}, ban_duration=60, max_ban_duration=100)
+    assert not bans.record('10.0.0.1', 'not_found', now=100)
+    assert not bans.record('10.0.0.1', 'not_found', now=105)
+    # Le premier événement est sorti de la fenêtre
+    assert not bans.record('10.0.0.1', 'not_found', now=111)
+    assert bans.record('10.0.0.1', 'not_found', now=112)
+    assert bans.is_banned('10.0.0.1', now=150)
+    assert not bans.is_banned('10.0.0.2', now=150)
+    assert bans.get_bans(now=150)[0]['remaining'] == 22
+    assert not bans.is_banned('10.0.0.1', now=172)
+
+    # Récidive : durée doublée, plafonnée
+    for now in (200, 201, 202):
+        bans.record('10.0.0.1', 'not_found', now=now)
+    assert bans.get_bans(now=202)[0]['expires'] == 302
+    assert bans.get_bans(now=202)[0]['count'] == 2
+
+def test_unban_exempt_and_stale_heap_entries():
+    bans = BanManager(rules={'request': (1, 10)}, exempt=lambda ip: ip == '127.0.0.1')
+    assert not bans.record('127.0.0.1', 'request', now=1)
+    assert not bans.record('10.0.0.1', 'unknown', now=1)
+    bans.ban('10.0.0.1', duration=10, now=1)
+    assert bans.unban('10.0.0.1')
+    bans.ban('10.0.0.1', duration=100, now=2)
+    # L'ancienne expiration (t=11) ne lève pas le nouveau bannissement
+    assert bans.is_banned('10.0.0.1', now=50)
+    assert not bans.is_banned('10.0.0.1', now=102)
+    assert bans.get_bans(now=102) == []
+
+def test_strikes_are_forgotten_and_zero_is_a_time():
+    bans = BanManager(rules={'not_found': (1, 10)}, ban_duration=10, max_ban_duration=100)
+    # now=0 est une date comme une autre, pas « maintenant »
+    assert bans.record('10.0.0.1', 'not_found', now=0)
+    assert bans.get_bans(now=0)[0]['expires'] == 10
+    assert bans.record('10.0.0.1', 'not_found', now=20)
+    assert bans.get_bans(now=20)[0]['count'] == 2
+    # Aucun nouveau bannissement pendant max_ban_duration après la fin du dernier : la récidive est oubliée
+    assert not bans.is_banned('10.0.0.1', now=200)
+    assert bans.get_bans(now=200) == [] and bans.strikes == {}
+    assert bans.record('10.0.0.1', 'not_found', now=200)
+    assert bans.get_bans(now=200)[0]['count'] == 1
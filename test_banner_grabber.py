@@ -0,0 +1,96 @@
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import pytest
+from banner_grabber import BannerGrabber, classify_banner, parse_certificate
+
+def _serve(handler, wrap=None):
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(8)
+
+    def loop():
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return
+            try:
+                if wrap:
+                    conn = wrap(conn)
+                handler(conn)
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    threading.Thread(target=loop, daemon=True).start()
+    return sock
+
+def _greeting(text):
+    return lambda conn: conn.sendall(text)
+
+def _http(conn):
+    conn.recv(1024)
+    conn.sendall(b"HTTP/1.0 200 OK\r\nServer: TestServer/1.0\r\n\r\n")
+
+def test_classify_banner():
+    assert classify_banner("SSH-2.0-OpenSSH_9.6") == 'ssh'
+    assert classify_banner("220 mail.example.com ESMTP Postfix") == 'smtp'
+    assert classify_banner("220 (vsFTPd 3.0.5)") == 'ftp'
+
+def test_grab_banners_against_local_listeners():
+    listeners = [
+        _serve(_greeting(b"SSH-2.0-TestSSH\r\n")),
+        _serve(_greeting(b"220 test FTP server ready\r\n")),
+        _serve(_http),
+        _serve(lambda conn: conn.recv(1024)),
+    ]
+    ports = [sock.getsockname()[1] for sock in listeners]
+    grabber = BannerGrabber(timeout=2.0, greeting_timeout=0.3, concurrency=2)
+    try:
+        results = {r['port']: r for r in grabber.grab_banners('127.0.0.1', ports)}
+    finally:
+        for sock in listeners:
+            sock.close()
+    assert results[ports[0]]['service'] == 'ssh'
+    assert results[ports[1]]['service'] == 'ftp'
+    assert results[ports[2]]['service'] == 'http'
+    assert results[ports[2]]['server'] == 'TestServer/1.0'
+    assert results[ports[3]]['service'] == 'unknown'
+
+def test_grab_timeout_is_reported():
+    listener = _serve(lambda conn: threading.Event().wait(2))
+    grabber = BannerGrabber(timeout=0.3, greeting_timeout=0.1)
+    try:
+        result = grabber.grab_banners('127.0.0.1', [listener.getsockname()[1]])[0]
+    finally:
+        listener.close()
+    assert result['error'] == 'timeout'
+
+@pytest.mark.skipif(shutil.which('openssl') is None, reason="openssl not available")
+def test_tls_certificate_subject(tmp_path):
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=test.local/O=Test Org', '-keyout', str(key), '-out', str(cert)
+    ], check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(str(cert), str(key))
+
+    der = ssl.PEM_cert_to_DER_cert(cert.read_text())
+    assert parse_certificate(der)['subject'] == {'commonName': 'test.local', 'organizationName': 'Test Org'}
+
+    import banner_grabber
+    listener = _serve(_http, wrap=lambda conn: context.wrap_socket(conn, server_side=True))
+    port = listener.getsockname()[1]
+    banner_grabber.TLS_PORTS.add(port)
+    try:
+        result = BannerGrabber(timeout=3.0).grab_banners('127.0.0.1', [port])[0]
+    finally:
+        banner_grabber.TLS_PORTS.discard(port)
+        listener.close()
+    assert result['tls']['subject']['commonName'] == 'test.local'
+    assert result['service'] == 'https'
@@ -0,0 +1,22 @@
+import socket
+from bench_network_scanner import ListenerFixtures, format_results, run_benchmark
+
+def test_fixtures_and_benchmark():
+    with ListenerFixtures(open_count=3, closed_count=20, tarpit_count=2) as fixtures:
+        assert len(fixtures.ports) == 25
+        # Un port « tarpit » n'accepte jamais la connexion
+        probe = socket.socket()
+        probe.settimeout(0.2)
+        try:
+            probe.connect(('127.0.0.1', fixtures.tarpit_ports[0]))
+            assert False, "tarpit port accepted a connection"
+        except socket.timeout:
+            pass
+        finally:
+            probe.close()
+
+        result = run_benchmark(fixtures, concurrency=8, timeout=0.2)
+    assert result['correct']
+    assert result['ports'] == 25
+    assert result['ports_per_s'] > 0
+    assert 'concurrency' in format_results([result])
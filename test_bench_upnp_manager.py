@@ -0,0 +1,12 @@
+from bench_upnp_manager import format_results, run_benchmark
+
+def test_benchmark_backends():
+    results = [run_benchmark('upnp-v2', table_size=6, mappings=3), run_benchmark('natpmp', mappings=3)]
+    assert [r['listed'] for r in results] == [12, 6]
+    assert results[0]['bulk_listing'] is True
+    assert all(r['errors'] == 0 for r in results)
+    assert 'batch add' in format_results(results)
+
+def test_benchmark_counts_injected_failures():
+    result = run_benchmark('upnp-v1', mappings=4, fail_rate=1.0)
+    assert result['errors'] == 16
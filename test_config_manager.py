@@ -0,0 +1,61 @@
+import json
+import os
+import pytest
+from config_manager import ConfigManager, validate_config
+
+def test_validate_config():
+    assert validate_config({'port': 8080, 'allowed_extensions': ['.html'], 'custom': object()}) == {}
+    errors = validate_config({'port': True, 'theme': 'blue', 'max_file_size': '50', 'auto_ban_rules': {'request': [0, 10]}})
+    assert set(errors) == {'port', 'theme', 'max_file_size', 'auto_ban_rules'}
+
+def test_save_is_atomic_and_notifies_changes(tmp_path):
+    manager = ConfigManager(str(tmp_path / "config.json"))
+    config = manager.load_config()
+    events = []
+    manager.subscribe(events.append)
+    manager.subscribe(lambda changes: events.append(('files', changes)), keys=('max_file_size',))
+
+    config['port'] = 9090
+    manager.save_config(config)
+    assert events == [{'port': 9090}]
+    assert json.loads((tmp_path / "config.json").read_text())['port'] == 9090
+    assert not os.path.exists(str(tmp_path / "config.json.tmp"))
+    # Notre propre écriture n'est pas relue comme une modification externe
+    assert manager.check_for_changes() == {}
+
+    config['max_file_size'] = 0
+    with pytest.raises(ValueError):
+        manager.save_config(config)
+    assert json.loads((tmp_path / "config.json").read_text())['max_file_size'] == 50
+
+def test_failed_save_is_not_applied(tmp_path):
+    # Répertoire absent : l'écriture échoue
+    manager = ConfigManager(str(tmp_path / "missing" / "config.json"))
+    config = manager.load_config()
+    events = []
+    manager.subscribe(events.append)
+    config['port'] = 9090
+    with pytest.raises(OSError):
+        manager.save_config(config)
+    assert events == [] and manager.current['port'] != 9090
+
+def test_external_edits_are_validated_and_pushed(tmp_path):
+    path = tmp_path / "config.json"
+    manager = ConfigManager(str(path))
+    manager.save_config(manager.load_config())
+    events = []
+    manager.subscribe(events.append)
+
+    config = json.loads(path.read_text())
+    config.update(max_file_size=10, allowed_extensions=['.html', '.txt'], port=70000)
+    path.write_text(json.dumps(config))
+    os.utime(path, ns=(1, 1))
+    # Le port invalide est ignoré, les autres modifications sont appliquées
+    assert events == [] and manager.check_for_changes() == {'max_file_size': 10, 'allowed_extensions': ['.html', '.txt']}
+    assert events == [{'max_file_size': 10, 'allowed_extensions': ['.html', '.txt']}]
+    assert manager.current['port'] == 8080
+
+    # Fichier tronqué (écriture en cours) : la configuration courante est conservée
+    path.write_text('{"port": 90')
+    assert manager.check_for_changes() == {}
+    assert manager.current['max_file_size'] == 10
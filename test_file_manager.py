@@ -1,6 +1,29 @@
+import os
+import zipfile
 import pytest
+from asset_optimizer import optimize_asset, variant_path
 from file_manager import FileManager
 
+CSS = "body {\n    margin: 0;\n}\n"
+
+class InlineOptimizer:
+    """Optimiseur synchrone ; les images reçoivent des variantes factices (PIL n'est pas requis)."""
+    def submit(self, file_path, callback=None):
+        created = optimize_asset(file_path)
+        if file_path.endswith('.png'):
+            for tag in ('opt', 'w320'):
+                with open(variant_path(file_path, tag), 'xb') as f:
+                    f.write(b"x")
+                created.append(variant_path(file_path, tag))
+        callback(created)
+
+def _upload_zip(fm, tmp_path, files):
+    archive = tmp_path / "site.zip"
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for name, text in files.items():
+            zf.writestr(name, text)
+    return fm.upload_archive(str(archive))
+
 def test_upload_file_valid(tmp_path):
     fm = FileManager(str(tmp_path))
     file_path = tmp_path / "test.html"
@@ -14,3 +37,187 @@ def test_upload_file_invalid_extension(tmp_path):
     file_path.write_text("plain text")
     with pytest.raises(ValueError):
         fm.upload_file(str(file_path))
+
+def test_upload_file_quota_exceeded(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.set_quota(max_files=1)
+    file_path = tmp_path / "test.html"
+    file_path.write_text("<html></html>")
+    fm.upload_file(str(file_path))
+    with pytest.raises(ValueError):
+        fm.upload_file(str(file_path))
+
+def test_index_tracks_delete_and_rename(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    file_path = tmp_path / "test.html"
+    file_path.write_text("<html></html>")
+    uploaded = fm.upload_file(str(file_path))
+    assert fm.rename_file(uploaded, "index.html")
+    assert [info['name'] for info in fm.list_files()] == ["index.html"]
+    assert fm.delete_file("index.html")
+    assert fm.get_usage()['files'] == 0
+
+def test_upload_archive_zip(tmp_path):
+    import zipfile
+    fm = FileManager(str(tmp_path / "uploads"))
+    archive = tmp_path / "site.zip"
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr("index.html", "<html></html>")
+        zf.writestr("css/style.css", "body {}")
+        zf.writestr("notes.txt", "not allowed")
+        zf.writestr("../evil.html", "<html></html>")
+    stats = fm.upload_archive(str(archive))
+    assert sorted(stats['names']) == ["css/style.css", "index.html"]
+    assert stats['failed'] == 2
+    assert (tmp_path / "uploads" / "css" / "style.css").read_text() == "body {}"
+    assert not (tmp_path / "evil.html").exists()
+
+def test_upload_archive_tar_stream(tmp_path, monkeypatch):
+    import io
+    import tarfile
+    import file_manager
+    # Membres plus grands qu'un morceau : copiés en flux au lieu d'être lus en mémoire
+    monkeypatch.setattr(file_manager, 'COPY_CHUNK_SIZE', 4)
+    fm = FileManager(str(tmp_path / "uploads"))
+    archive = tmp_path / "site.tar.gz"
+    with tarfile.open(archive, 'w:gz') as tf:
+        for name, data in [("index.html", b"<html></html>"), ("app.js", b"var")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo("link.html")
+        link.type = tarfile.SYMTYPE
+        link.linkname = "/etc/passwd"
+        tf.addfile(link)
+    stats = fm.upload_archive(str(archive), workers=2)
+    assert stats['files'] == 2
+    assert stats['failed'] == 1
+    assert stats['files_per_s'] > 0
+    assert fm.get_usage()['files'] == 2
+    assert (tmp_path / "uploads" / "index.html").read_bytes() == b"<html></html>"
+    assert fm._reserved == {'bytes': 0, 'files': 0}
+
+def test_unreadable_members_fail_alone(tmp_path):
+    import io
+    import tarfile
+    fm = FileManager(str(tmp_path / "uploads"))
+    archive = tmp_path / "site.zip"
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr("secret.html", "<html></html>")
+        zf.writestr("good.html", "<html></html>")
+    # Premier membre marqué comme chiffré dans le répertoire central : illisible sans mot de passe
+    data = bytearray(archive.read_bytes())
+    data[data.index(b"PK\x01\x02") + 8] |= 0x1
+    archive.write_bytes(bytes(data))
+    stats = fm.upload_archive(str(archive), workers=1)
+    assert stats['names'] == ["good.html"] and stats['failed'] == 1
+    assert fm._reserved == {'bytes': 0, 'files': 0}
+
+    # Archive tronquée : les membres lus avant la coupure sont gardés, l'erreur est comptée
+    archive = tmp_path / "site.tar.gz"
+    with tarfile.open(archive, 'w:gz') as tf:
+        for name in ("a.html", "b.html"):
+            data = os.urandom(4096)
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    archive.write_bytes(archive.read_bytes()[:-3000])
+    stats = fm.upload_archive(str(archive), workers=1)
+    assert stats['files'] == 1 and stats['failed'] >= 1
+    assert fm._reserved == {'bytes': 0, 'files': 0}
+    assert not [name for name in os.listdir(tmp_path / "uploads") if name.endswith(".part")]
+
+def test_batch_delete_and_move(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    for name in ["a.html", "b.html", "c.css"]:
+        (tmp_path / "uploads" / name).write_text("x")
+    fm.rescan()
+    version = fm.index_version
+    result = fm.move_files("site", pattern="*.html")
+    assert sorted(result['renamed'].values()) == ["site/a.html", "site/b.html"]
+    assert fm.index_version == version + 1
+    result = fm.delete_files(["c.css", "../outside.html"], pattern="site/*")
+    assert sorted(result['deleted']) == ["c.css", "site/a.html", "site/b.html"]
+    assert result['failed'] == ["../outside.html"]
+    assert fm.list_files() == []
+
+def test_limits_follow_config_changes(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    file_path = tmp_path / "page.htm"
+    file_path.write_text("x" * 2048)
+    with pytest.raises(ValueError):
+        fm.upload_file(str(file_path))
+    fm.on_config_change({'allowed_extensions': ['.htm'], 'max_file_size': 0.001})
+    with pytest.raises(ValueError, match="exceeds"):
+        fm.upload_file(str(file_path))
+    fm.on_config_change({'max_file_size': 1})
+    assert fm.upload_file(str(file_path)).endswith("page.htm")
+
+def test_variants_follow_their_original(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.optimizer = InlineOptimizer()
+    _upload_zip(fm, tmp_path, {"app.css": CSS, "logo.png": "png", "other.css": "a{}"})
+    # Le manifeste des variantes survit au redémarrage
+    fm = FileManager(str(tmp_path / "uploads"))
+    result = fm.move_files("site", pattern="*.css")
+    assert sorted(result['renamed'].values()) == ["site/app.css", "site/other.css"]
+    assert fm.rename_file("logo.png", "brand.png")
+    assert sorted(fm.select_files("*")) == [
+        "brand.opt.png", "brand.png", "brand.w320.png", "site/app.css", "site/app.min.css", "site/other.css"]
+    result = fm.delete_files(pattern="site/app*")
+    assert result['deleted'] == ["site/app.css"]
+    assert fm.delete_file("brand.png")
+    assert fm.select_files("*") == ["site/other.css"]
+    assert sorted(os.listdir(tmp_path / "uploads" / "site")) == ["other.css"]
+    assert not [name for name in os.listdir(tmp_path / "uploads") if name.endswith(".png")]
+
+def test_user_min_files_are_not_variants(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.optimizer = InlineOptimizer()
+    js = "function f() {\n    return 1;\n}\n"
+    stats = _upload_zip(fm, tmp_path, {"js/jquery.min.js": "/* mine */", "js/jquery.js": js})
+    assert stats['files'] == 2
+    own = tmp_path / "uploads" / "js" / "jquery.min.js"
+    # Renommer, remplacer ou supprimer jquery.js laisse le jquery.min.js de l'utilisateur en place
+    assert fm.rename_file("js/jquery.js", "js/app.js")
+    _upload_zip(fm, tmp_path, {"js/jquery.js": js})
+    assert fm.delete_files(pattern="js/jquery.js")['deleted'] == ["js/jquery.js"]
+    assert own.read_text() == "/* mine */"
+    assert fm.select_files("js/*") == ["js/app.js", "js/jquery.min.js"]
+
+def test_variants_count_in_quota(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.optimizer = InlineOptimizer()
+    fm.set_quota(max_files=1)
+    # La variante dépasserait le quota : elle est abandonnée, l'original reste
+    _upload_zip(fm, tmp_path, {"app.css": CSS})
+    assert not (tmp_path / "uploads" / "app.min.css").exists()
+    fm.set_quota(max_files=2)
+    _upload_zip(fm, tmp_path, {"app.css": CSS})
+    variant = tmp_path / "uploads" / "app.min.css"
+    assert fm.get_usage() == {'files': 2, 'bytes': len(CSS) + variant.stat().st_size, 'max_files': 2, 'max_bytes': 0}
+
+def test_list_files_sees_outside_changes(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    assert fm.list_files() == []
+    (tmp_path / "uploads" / "site").mkdir()
+    (tmp_path / "uploads" / "site" / "index.html").write_text("x")
+    assert [info['name'] for info in fm.list_files()] == ["site/index.html"]
+    (tmp_path / "uploads" / "site" / "index.html").unlink()
+    assert fm.list_files() == []
+    version = fm.index_version
+    fm.list_files()
+    assert fm.index_version == version
+
+def test_upload_counts_copies_in_progress(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.set_quota(max_files=1)
+    file_path = tmp_path / "test.html"
+    file_path.write_text("<html></html>")
+    # Copie concurrente en cours : sa place est déjà réservée
+    reserved = fm._reserve(None, 10)
+    with pytest.raises(ValueError):
+        fm.upload_file(str(file_path))
+    fm._release(reserved)
+    fm.upload_file(str(file_path))
+    assert fm._reserved == {'bytes': 0, 'files': 0}
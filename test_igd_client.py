@@ -0,0 +1,70 @@
+import time
+from igd_client import WANIP_V2, IGDClient, SoapClient, UPnPError, parse_port_listing
+from mock_igd import MockIGD
+from upnp_manager import UPnPManager
+
+def test_soap_calls_and_bulk_listing():
+    with MockIGD() as igd:
+        for port in range(1000, 1025):
+            igd.add_mapping(port, 'TCP', description=f"svc{port}")
+        igd.add_mapping(5353, 'UDP')
+        client = SoapClient(igd.control_url, WANIP_V2)
+        try:
+            assert client.call('GetExternalIPAddress')['NewExternalIPAddress'] == '203.0.113.1'
+            mappings = client.get_list_of_port_mappings('TCP', chunk=10)
+            assert [m['external_port'] for m in mappings] == list(range(1000, 1025))
+            assert mappings[0]['description'] == 'svc1000'
+            assert [m['external_port'] for m in client.get_list_of_port_mappings('UDP')] == [5353]
+            # Les appels réutilisent la même connexion HTTP
+            assert len(client._connections) == 1
+            try:
+                client.call('DeletePortMapping', [('NewRemoteHost', ''), ('NewExternalPort', 1), ('NewProtocol', 'TCP')])
+                assert False
+            except UPnPError as e:
+                assert e.code == 714
+        finally:
+            client.close()
+
+def test_parse_empty_listing():
+    assert parse_port_listing('') == []
+
+def test_builtin_client_discovers_and_maps():
+    with MockIGD(version=1) as igd:
+        client = IGDClient(interfaces=['127.0.0.1'], ssdp_address=igd.ssdp_address)
+        client.discoverdelay = 2000
+        start = time.monotonic()
+        assert client.discover() == 1
+        # La découverte s'arrête peu après la première réponse
+        assert time.monotonic() - start < 1.5
+        assert client.selectigd() == igd.control_url
+        assert client.lanaddr == '127.0.0.1'
+
+        assert client.externalipaddress() == '203.0.113.1'
+        assert client.addportmapping(8080, 'TCP', client.lanaddr, 8080, 'test', '')
+        assert client.getspecificportmapping(8080, 'TCP')[:3] == ('127.0.0.1', 8080, 'test')
+        assert client.getgenericportmapping(0)[:3] == (8080, 'TCP', ('127.0.0.1', 8080))
+        assert client.getgenericportmapping(1) is None
+        assert client.deleteportmapping(8080, 'TCP')
+        assert client.getspecificportmapping(8080, 'TCP') is None
+        client.soap.close()
+
+def test_manager_uses_builtin_client():
+    with MockIGD(version=2) as igd:
+        igd.add_mapping(443)
+        manager = UPnPManager(upnp_factory=lambda: IGDClient(['127.0.0.1'], igd.ssdp_address), background=False)
+        assert manager.ready
+        assert manager.get_public_ip() == '203.0.113.1'
+        assert [r['ok'] for r in manager.add_port_mappings([8080, '8081/udp'])] == [True, True]
+        assert {m['external_port'] for m in manager.list_port_mappings(refresh=True)} == {443, 8080, 8081}
+        assert manager.bulk_listing is True
+
+def test_mock_failure_injection():
+    with MockIGD(table_size=4, failures={'AddPortMapping': 725}, max_entries=5) as igd:
+        assert len(igd.mappings) == 4
+        manager = UPnPManager(upnp_factory=lambda: IGDClient(['127.0.0.1'], igd.ssdp_address), background=False)
+        results = manager.add_port_mappings([8080])
+        assert '725' in results[0]['error']
+        igd.failures.clear()
+        assert manager.add_port_mapping(8080)
+        assert not manager.add_port_mapping(8081)
+        assert len(igd.mappings) == 5
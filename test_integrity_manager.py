@@ -0,0 +1,45 @@
+import json
+from file_manager import FileManager
+from integrity_manager import IntegrityManager
+
+def test_scrub_reports_mismatch_and_missing(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.integrity = IntegrityManager(fm.upload_dir, str(tmp_path / "manifest.json"))
+    source = tmp_path / "page.html"
+    source.write_text("<html></html>")
+    tampered = fm.upload_file(str(source))
+    other = tmp_path / "other.html"
+    other.write_text("<html>2</html>")
+    fm.rename_file(fm.upload_file(str(other)), "kept.html")
+    (tmp_path / "uploads" / "extra.css").write_text("body{}")
+    # Copie interrompue : ni indexée ni signalée
+    (tmp_path / "uploads" / "upload.html.part").write_text("<ht")
+    fm.rescan()
+    assert "upload.html.part" not in fm.select_files("*")
+
+    (tmp_path / "uploads" / tampered).write_text("<html>evil</html>")
+    report = fm.scrub(workers=2)
+    assert report['mismatched'] == [tampered]
+    # Un fichier déposé hors de l'application est signalé, pas adopté
+    assert report['unrecorded'] == ["extra.css"]
+    assert report['adopted'] == []
+    assert report['ok'] == 1
+
+    (tmp_path / "uploads" / "kept.html").unlink()
+    report = fm.scrub(workers=1, max_bytes_per_s=1024 * 1024, adopt_unrecorded=True)
+    assert report['missing'] == ["kept.html"]
+    assert report['adopted'] == ["extra.css"]
+    assert "extra.css" in json.loads((tmp_path / "manifest.json").read_text())
+
+def test_variants_are_recorded(tmp_path):
+    fm = FileManager(str(tmp_path / "uploads"))
+    fm.integrity = IntegrityManager(fm.upload_dir, str(tmp_path / "manifest.json"))
+    source = tmp_path / "app.css"
+    source.write_text("body {\n    margin: 0;\n}\n")
+    name = fm.upload_file(str(source))
+    variant = tmp_path / "uploads" / name.replace(".css", ".min.css")
+    variant.write_text("body{margin:0;}")
+    fm._index_variants(str(tmp_path / "uploads" / name), [str(variant)])
+    assert fm.rename_file(name, "site.css")
+    report = fm.scrub(workers=1)
+    assert report['unrecorded'] == [] and report['ok'] == 2
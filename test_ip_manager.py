@@ -0,0 +1,67 @@
+import json
+import time
+import ip_manager
+from ip_manager import IPManager, read_entries
+
+def _manager(tmp_path):
+    return IPManager(str(tmp_path / 'allowed.json'), str(tmp_path / 'blocked.json'))
+
+def test_journal_replay_and_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(ip_manager, 'COMPACT_MIN_OPERATIONS', 4)
+    (tmp_path / 'blocked.json').write_text(json.dumps(['10.0.0.1', 'not an ip']))
+    manager = _manager(tmp_path)
+    assert manager.get_blocked_ips() == ['10.0.0.1']
+    assert manager.add_blocked_ip('10.0.0.2')
+    assert not manager.add_blocked_ip('10.0.0.2')
+    assert not manager.add_blocked_ip('bogus')
+    assert manager.remove_blocked_ip('10.0.0.1')
+    # Le fichier principal n'est pas réécrit à chaque ajout : les opérations sont journalisées
+    assert json.loads((tmp_path / 'blocked.json').read_text()) == ['10.0.0.1', 'not an ip']
+    assert _manager(tmp_path).get_blocked_ips() == ['10.0.0.2']
+
+    # Une ligne incomplète en fin de journal est ignorée
+    with open(tmp_path / 'blocked.json.journal', 'a') as f:
+        f.write('+10.0.0.')
+    assert _manager(tmp_path).get_blocked_ips() == ['10.0.0.2']
+
+    manager.add_blocked_ip('10.0.0.3')
+    manager.add_blocked_ip('10.0.0.4')
+    assert json.loads((tmp_path / 'blocked.json').read_text()) == ['10.0.0.2', '10.0.0.3', '10.0.0.4']
+    assert (tmp_path / 'blocked.json.journal').read_text() == ''
+    assert _manager(tmp_path).get_blocked_ips() == ['10.0.0.2', '10.0.0.3', '10.0.0.4']
+
+def test_networks_and_precedence(tmp_path):
+    manager = _manager(tmp_path)
+    manager.add_blocked_ip('192.168.1.77/24')
+    manager.add_blocked_ip('2001:db8::/32')
+    manager.add_allowed_ip('192.168.1.10')
+    assert manager.get_blocked_ips() == ['192.168.1.0/24', '2001:db8::/32']
+    assert not manager.is_ip_allowed('192.168.1.200')
+    assert not manager.is_ip_allowed('::ffff:192.168.1.200')
+    assert not manager.is_ip_allowed('2001:db8:1::5')
+    assert manager.is_ip_allowed('192.168.1.10')
+    assert manager.is_ip_allowed('192.168.2.1')
+    assert manager.remove_blocked_ip('192.168.1.0/24')
+    assert manager.is_ip_allowed('192.168.1.200')
+
+def test_read_entries_formats():
+    text = ['# Blocklist\n', '1.2.3.4\n', '5.6.7.0/24 ; SBL123\n', '\n', 'garbage\n', '9.9.9.9 # scanner\n']
+    assert read_entries(text) == (['1.2.3.4', '5.6.7.0/24', '9.9.9.9'], 1)
+    csv_text = ['first_seen,ip,reason\n', '2024-01-01,"8.8.4.4",ssh\n', '2024-01-02,::ffff:1.1.1.1,http\n']
+    assert read_entries(csv_text, 'csv') == (['8.8.4.4', '1.1.1.1'], 1)
+
+def test_bulk_import_and_paging(tmp_path):
+    path = tmp_path / 'list.txt'
+    path.write_text(''.join(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}\n" for i in range(100000)) + '10.0.0.1\n')
+    manager = _manager(tmp_path)
+    start = time.monotonic()
+    result = manager.import_ips(str(path))
+    assert time.monotonic() - start < 5
+    assert result == {'added': 100000, 'duplicates': 1, 'invalid': 0}
+    assert not manager.is_ip_allowed('10.1.134.159')
+    assert len(_manager(tmp_path).blocked_ips) == 100000
+
+    entries, total = manager.page_ips('blocked', offset=500, limit=500)
+    assert total == 100000 and entries[0] == '10.0.1.244'
+    entries, total = manager.page_ips('blocked', '10.1.134.', limit=10)
+    assert total == 160 and len(entries) == 10
@@ -0,0 +1,80 @@
+import threading
+from lease_renewer import LeaseRenewer
+from test_upnp_manager import FakeUPnP
+from upnp_manager import UPnPManager
+
+class RouterUPnP(FakeUPnP):
+    def getspecificportmapping(self, port, protocol):
+        entry = self.mappings.get((port, protocol))
+        return entry and (entry[0], entry[1], entry[2], 1, 3600)
+
+def _manager():
+    FakeUPnP.gate = threading.Event()
+    FakeUPnP.gate.set()
+    return UPnPManager(upnp_factory=RouterUPnP, background=False)
+
+def test_recreates_disappeared_mapping():
+    manager = _manager()
+    renewer = LeaseRenewer(manager, lease=3600, check_interval=60)
+    assert renewer.add([8080])[0]['ok']
+    assert renewer.uptime(8080, now=renewer.mappings[(8080, 'TCP')]['since'] + 30) == 30
+    assert renewer.check() == []
+
+    # Redémarrage du routeur : la règle a disparu
+    RouterUPnP.instance.mappings.clear()
+    assert renewer.check(now=renewer.mappings[(8080, 'TCP')]['next_check']) == [(8080, 'TCP')]
+    assert (8080, 'TCP') in RouterUPnP.instance.mappings
+
+    # Changement d'adresse locale : la règle est recréée vers la nouvelle adresse
+    manager.cache.set('lan_address', '192.168.1.20')
+    renewer.check(now=renewer.mappings[(8080, 'TCP')]['next_check'])
+    assert RouterUPnP.instance.mappings[(8080, 'TCP')][0] == '192.168.1.20'
+
+    renewer.remove()
+    assert RouterUPnP.instance.mappings == {}
+
+def test_failures_back_off_exponentially():
+    manager = _manager()
+    renewer = LeaseRenewer(manager, retry_delay=5, max_backoff=60)
+    result = renewer.add([1])[0]
+    assert not result['ok']
+    mapping = renewer.mappings[(1, 'TCP')]
+    delays = []
+    for _ in range(6):
+        now = mapping['next_check']
+        renewer.check(now=now)
+        delays.append(round(mapping['next_check'] - now, 6))
+    assert delays == [10, 20, 40, 60, 60, 60]
+    assert renewer.uptime(1) is None
+
+def test_check_does_not_recreate_removed_mapping():
+    manager = _manager()
+    renewer = LeaseRenewer(manager, lease=3600, check_interval=60)
+    assert renewer.add([8080])[0]['ok']
+
+    def removed_during_check(mapping, lan_address, now):
+        # Retrait pendant la vérification, avant la recréation
+        RouterUPnP.instance.mappings.clear()
+        renewer.remove([mapping['port']])
+        return "mapping disappeared"
+
+    renewer._needs_mapping = removed_during_check
+    assert renewer.check(now=renewer.mappings[(8080, 'TCP')]['next_check']) == []
+    assert RouterUPnP.instance.mappings == {}
+
+def test_permanent_only_fallback_matches_error_code():
+    class PermanentOnly(RouterUPnP):
+        def addportmapping(self, port, protocol, host, internal_port, description, remote, lease=0):
+            if port == 7250:
+                raise Exception("Port 7250 rejected")
+            if lease:
+                raise Exception("OnlyPermanentLeasesSupported")
+            return super().addportmapping(port, protocol, host, internal_port, description, remote, lease)
+
+    FakeUPnP.gate = threading.Event()
+    FakeUPnP.gate.set()
+    renewer = LeaseRenewer(UPnPManager(upnp_factory=PermanentOnly, background=False), lease=3600)
+    assert not renewer.add([7250])[0]['ok']
+    assert renewer.lease == 3600
+    assert renewer.add([8080])[0]['ok']
+    assert renewer.lease == 0
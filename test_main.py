@@ -0,0 +1,42 @@
+import ast
+import os
+import pytest
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+def _gui_class():
+    with open(MAIN, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return next(node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == 'PortForwardingGUI')
+
+def test_gui_commands_have_handlers():
+    gui = _gui_class()
+    defined = {node.name for node in gui.body if isinstance(node, ast.FunctionDef)}
+    handlers = {
+        (keyword.value.attr, keyword.value.lineno) for keyword in ast.walk(gui)
+        if isinstance(keyword, ast.keyword) and keyword.arg == 'command'
+        and isinstance(keyword.value, ast.Attribute) and isinstance(keyword.value.value, ast.Name)
+        and keyword.value.value.id == 'self'
+    }
+    assert handlers
+    missing = sorted((name, line) for name, line in handlers if name not in defined)
+    assert not missing, f"menu or button commands without a handler: {missing}"
+
+def test_create_menu():
+    for module in ('psutil', 'qrcode', 'PIL'):
+        pytest.importorskip(module)
+    import tkinter as tk
+    from main import PortForwardingGUI
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display available")
+    try:
+        gui = PortForwardingGUI.__new__(PortForwardingGUI)
+        gui.root = root
+        gui.create_menu()
+        labels = [menu.entrycget(i, 'label') for menu in root.nametowidget(root['menu']).winfo_children()
+                  for i in range(menu.index('end') + 1) if menu.type(i) == 'command']
+        assert "Verify File Integrity" in labels
+    finally:
+        root.destroy()
@@ -0,0 +1,70 @@
+import socket
+from mock_igd import MockIGD
+from mock_natpmp import MockNatPmp
+from natpmp_client import NatPmpClient, NatPmpError
+from upnp_manager import STATE_READY, UPnPManager
+from igd_client import IGDClient
+
+def _client(gateway):
+    return NatPmpClient(gateway=gateway.address, initial_timeout=0.1, retries=2)
+
+def test_pcp_mapping():
+    with MockNatPmp(pcp=True) as gateway:
+        client = _client(gateway)
+        assert client.discover() == 1
+        assert client.protocol_name == 'PCP'
+        assert client.addportmapping(8080, 'TCP', client.lanaddr, 8080, 'Site', '')
+        assert gateway.mappings[(8080, 'TCP')]['internal_ip'] == '127.0.0.1'
+        assert client.externalipaddress() == '203.0.113.1'
+        assert client.getspecificportmapping(8080, 'TCP')[:3] == ('127.0.0.1', 8080, 'Site')
+        assert client.getportmappingnumberofentries() == 1
+        assert client.deleteportmapping(8080, 'TCP')
+        assert gateway.mappings == {}
+        assert client.getspecificportmapping(8080, 'TCP') is None
+
+def test_natpmp_fallback_and_port_conflict():
+    with MockNatPmp(pcp=False) as gateway:
+        gateway.busy_ports.add(5000)
+        client = _client(gateway)
+        assert client.discover() == 1
+        assert client.protocol_name == 'NAT-PMP'
+        assert client.externalipaddress() == '203.0.113.1'
+        assert client.addportmapping(6000, 'UDP', client.lanaddr, 6000, 'Game', '')
+        assert (6000, 'UDP') in gateway.mappings
+        # Le port demandé est pris : la redirection proposée à la place est retirée
+        try:
+            client.addportmapping(5000, 'TCP', client.lanaddr, 5000, 'Site', '')
+            assert False
+        except NatPmpError as e:
+            assert e.code == 718
+        assert not any(protocol == 'TCP' for _, protocol in gateway.mappings)
+
+def test_no_gateway():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    client = NatPmpClient(gateway=sock.getsockname(), initial_timeout=0.05, retries=2)
+    assert client.discover() == 0
+    sock.close()
+
+def test_manager_prefers_natpmp_then_falls_back_to_upnp():
+    with MockNatPmp(pcp=False) as gateway, MockIGD() as igd:
+        upnp = lambda: IGDClient(['127.0.0.1'], igd.ssdp_address)
+        manager = UPnPManager(backends=[lambda: _client(gateway), upnp], background=False)
+        assert manager.state == STATE_READY
+        assert manager.backend == 'NAT-PMP'
+        assert manager.get_gateway_info()['backend'] == 'NAT-PMP'
+        assert manager.add_port_mapping(8080)
+        assert igd.mappings == {}
+        assert [m['external_port'] for m in manager.list_port_mappings(refresh=True)] == [8080]
+
+    with MockIGD() as igd:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        silent = lambda: NatPmpClient(gateway=sock.getsockname(), initial_timeout=0.05, retries=1)
+        upnp = lambda: IGDClient(['127.0.0.1'], igd.ssdp_address)
+        manager = UPnPManager(backends=[silent, upnp], background=False)
+        sock.close()
+        assert manager.state == STATE_READY
+        assert manager.backend == 'UPnP/built-in'
+        assert manager.add_port_mapping(8080)
+        assert (8080, 'TCP') in igd.mappings
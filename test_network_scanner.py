@@ -0,0 +1,83 @@
+import socket
+import threading
+from network_scanner import SWEEP_MIN_TIMEOUT, AdaptiveTimeout, NetworkScanner
+
+def _listener():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(16)
+    return sock
+
+def test_scan_ports_finds_listeners():
+    listener = _listener()
+    try:
+        port = listener.getsockname()[1]
+        assert port in NetworkScanner.scan_ports('127.0.0.1', max(1, port - 10), port + 10)
+    finally:
+        listener.close()
+
+def test_scan_ports_stream_reports_every_port_and_cancels():
+    listener = _listener()
+    port = listener.getsockname()[1]
+    results = []
+    try:
+        open_ports = NetworkScanner.scan_ports_stream(
+            '127.0.0.1', port, port + 9, lambda p, is_open: results.append((p, is_open)), concurrency=4)
+        assert port in open_ports
+        assert sorted(p for p, _ in results) == list(range(port, port + 10))
+
+        stop_event = threading.Event()
+        stop_event.set()
+        assert NetworkScanner.scan_ports_stream('127.0.0.1', 1, 65535, stop_event=stop_event) == []
+    finally:
+        listener.close()
+
+def test_adaptive_timeout_converges():
+    timeout = AdaptiveTimeout(initial=1.0, minimum=0.01)
+    for _ in range(50):
+        timeout.sample(0.002)
+    assert timeout.value == 0.01
+
+def test_sweep_timeout_keeps_a_floor(monkeypatch):
+    timeouts = []
+
+    async def probe_host(host, ports, timeout):
+        timeouts.append(timeout)
+        timeout.sample(0.001)
+        return {'host': host, 'up': True, 'rtt_ms': 1, 'port': ports[0], 'open': True}
+
+    monkeypatch.setattr(NetworkScanner, 'probe_host', probe_host)
+    NetworkScanner.sweep_hosts('10.0.0.0/26', ports=(80,))
+    # Des hôtes rapides ne font pas tomber le délai sous un seuil réaliste pour les hôtes plus lents
+    assert timeouts[-1].value == SWEEP_MIN_TIMEOUT
+
+def test_sweep_hosts_on_loopback():
+    listener = _listener()
+    try:
+        port = listener.getsockname()[1]
+        results = []
+        up_hosts = NetworkScanner.sweep_hosts('127.0.0.0/30', results.append, ports=(port,))
+        assert [result['host'] for result in up_hosts] == ['127.0.0.1', '127.0.0.2']
+        assert up_hosts[0]['open'] and up_hosts[0]['rtt_ms'] is not None
+        assert len(results) == 2
+    finally:
+        listener.close()
+
+def test_probe_ports_and_reserve_port():
+    busy = socket.socket()
+    busy.bind(('', 0))
+    busy.listen(1)
+    busy_port = busy.getsockname()[1]
+    try:
+        assert NetworkScanner.probe_ports([busy_port], families=[socket.AF_INET])[busy_port] is False
+        assert NetworkScanner.is_port_available(busy_port) is False
+
+        # Le port demandé est occupé : le suivant disponible est réservé et reste en écoute
+        sock, port = NetworkScanner.reserve_port(busy_port, [0])
+        try:
+            assert port != busy_port
+            assert NetworkScanner.probe_ports([port], families=[socket.AF_INET])[port] is False
+        finally:
+            sock.close()
+    finally:
+        busy.close()
@@ -0,0 +1,63 @@
+from network_state import NetworkState
+
+class FakeNetworkState(NetworkState):
+    def __init__(self, **kwargs):
+        self.interfaces = {
+            'lo': [{'family': 'IPv4', 'address': '127.0.0.1', 'netmask': '255.0.0.0'}],
+            'eth0': [{'family': 'IPv4', 'address': '192.168.1.10', 'netmask': '255.255.255.0'}],
+        }
+        self.route = '192.168.1.10'
+        super().__init__(**kwargs)
+
+    def read_interfaces(self):
+        return {name: list(entries) for name, entries in self.interfaces.items()}
+
+    def default_route_ip(self):
+        return self.route
+
+def test_public_ip_cached_until_interfaces_change():
+    lookups = []
+    state = FakeNetworkState(public_ip_provider=lambda: lookups.append(1) or '203.0.113.5')
+    events = []
+    state.subscribe(events.append)
+
+    assert state.refresh()['public_ip'] == '203.0.113.5'
+    state.refresh()
+    state.refresh()
+    assert len(lookups) == 1
+    assert len(events) == 1
+
+    state.interfaces['wlan0'] = [{'family': 'IPv4', 'address': '10.0.0.7', 'netmask': '255.255.255.0'}]
+    state.refresh()
+    assert len(lookups) == 2
+    assert len(events) == 2
+    assert 'wlan0' in state.interface_names()
+
+def test_ttl_expiry_refreshes_public_ip():
+    lookups = []
+    state = FakeNetworkState(public_ip_provider=lambda: lookups.append(1) or '203.0.113.5', ttl=0)
+    state.refresh()
+    state.refresh()
+    assert len(lookups) == 2
+
+def test_missing_public_ip_is_retried_sooner():
+    answers = [None, '203.0.113.5']
+    state = FakeNetworkState(public_ip_provider=lambda: answers.pop(0), ttl=300, retry_interval=0)
+    assert state.refresh()['public_ip'] is None
+    assert state.refresh()['public_ip'] == '203.0.113.5'
+    # Une fois connue, l'IP publique est gardée jusqu'à l'expiration du TTL
+    assert state.refresh()['public_ip'] == '203.0.113.5'
+
+def test_advertise_address_selection():
+    state = FakeNetworkState()
+    state.interfaces['wlan0'] = [{'family': 'IPv4', 'address': '10.0.0.7', 'netmask': '255.255.255.0'}]
+    state.refresh()
+    assert state.advertise_address() == '192.168.1.10'
+    state.set_advertise_interface('wlan0')
+    assert state.advertise_address() == '10.0.0.7'
+
+    # Sans route par défaut, on annonce la première adresse non locale plutôt que 127.0.0.1
+    state.set_advertise_interface('')
+    state.route = None
+    state.refresh()
+    assert state.advertise_address() in ('192.168.1.10', '10.0.0.7')
@@ -0,0 +1,31 @@
+import os
+import time
+from datetime import datetime, timedelta
+from file_manager import FileManager
+from retention_manager import RetentionManager
+
+def _make_upload(fm, name, age_days=0):
+    path = os.path.join(fm.upload_dir, name)
+    with open(path, 'w') as f:
+        f.write("x")
+    mtime = time.time() - age_days * 86400
+    os.utime(path, (mtime, mtime))
+
+def test_keep_latest_versions(tmp_path):
+    fm = FileManager(str(tmp_path))
+    _make_upload(fm, "20240101_000000_index.html", age_days=3)
+    _make_upload(fm, "20240102_000000_index.html", age_days=2)
+    _make_upload(fm, "20240103_000000_index.html", age_days=1)
+    _make_upload(fm, "20240101_000000_style.css", age_days=3)
+    fm.rescan()
+    retention = RetentionManager(fm, keep_versions=2)
+    assert retention.sweep() == ["20240101_000000_index.html"]
+    assert len(fm.list_files()) == 3
+
+def test_max_age(tmp_path):
+    fm = FileManager(str(tmp_path))
+    _make_upload(fm, "old.html", age_days=10)
+    _make_upload(fm, "new.html")
+    fm.rescan()
+    retention = RetentionManager(fm, max_age_days=7)
+    assert retention.expired_files(datetime.now() + timedelta(minutes=1)) == ["old.html"]
@@ -0,0 +1,28 @@
+from scan_store import ScanStore, decode_ports, encode_ports
+
+def test_encode_ports_roundtrip():
+    assert encode_ports([5, 1, 2, 3, 80]) == "1-3,5,80"
+    assert decode_ports("1-3,5,80") == {1, 2, 3, 5, 80}
+
+def test_diff_and_rescan_candidates(tmp_path):
+    store = ScanStore(str(tmp_path / "scans.db"))
+    assert store.rescan_candidates("host", 'open') is None
+    store.record_scan("quiet", range(1, 1025), [], started=1)
+    store.record_scan("quiet", range(1, 1025), [], started=2)
+    # Aucun port ouvert au scan précédent : il existe bien, rien n'a changé
+    assert store.rescan_candidates("quiet", 'open') == []
+    assert store.diff_last("quiet")['previous']['started'] == 1
+    store.record_scan("host", range(1, 1025), [22, 80], started=1)
+    assert store.diff_last("host")['previous'] is None
+    store.record_scan("host", range(1, 1025), [80, 443], started=2)
+    diff = store.diff_last("host")
+    assert diff['opened'] == [443]
+    assert diff['closed'] == [22]
+    assert store.rescan_candidates("host", 'open') == [80, 443]
+    assert store.rescan_candidates("host", 'changed') == [22, 80, 443]
+
+    # Un rescan partiel ne signale pas comme fermés les ports qu'il n'a pas couverts
+    store.record_scan("host", [80, 443], [80], started=3)
+    assert store.diff_last("host")['closed'] == [443]
+    assert store.diff_last("host")['opened'] == []
+    store.close()
@@ -0,0 +1,43 @@
+import threading
+import time
+from ttl_cache import TTLCache
+
+def test_fresh_values_are_cached():
+    calls = []
+    cache = TTLCache(ttl=60)
+    loader = lambda: calls.append(1) or len(calls)
+    assert cache.get('ip', loader) == 1
+    assert cache.get('ip', loader) == 1
+    cache.invalidate('ip')
+    assert cache.get('ip', loader) == 2
+
+def test_stale_value_served_while_revalidating():
+    cache = TTLCache(ttl=0, stale_ttl=60)
+    cache.set('ip', 'old')
+    refreshed = threading.Event()
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(2)
+        refreshed.set()
+        return 'new'
+
+    start = time.monotonic()
+    assert cache.get('ip', slow_loader) == 'old'
+    assert time.monotonic() - start < 0.5
+    release.set()
+    assert refreshed.wait(2)
+    time.sleep(0.05)
+    assert cache.peek('ip') == 'new'
+
+def test_failures_are_not_retried_immediately():
+    calls = []
+
+    def failing_loader():
+        calls.append(1)
+        raise OSError("router busy")
+
+    cache = TTLCache(ttl=60, error_ttl=60)
+    assert cache.get('ip', failing_loader, default='none') == 'none'
+    assert cache.get('ip', failing_loader, default='none') == 'none'
+    assert len(calls) == 1
@@ -0,0 +1,211 @@
+import threading
+import time
+from mock_igd import MockIGD
+from natpmp_client import NatPmpClient
+from upnp_manager import STATE_FAILED, STATE_READY, UPnPManager, parse_mapping
+
+class FakeUPnP:
+    devices = 1
+
+    def __init__(self):
+        self.discoverdelay = 0
+        self.lanaddr = '192.168.1.10'
+        self.mappings = {}
+        FakeUPnP.instance = self
+
+    def discover(self):
+        FakeUPnP.gate.wait(2)
+        return self.devices
+
+    def selectigd(self):
+        pass
+
+    def externalipaddress(self):
+        self.ip_requests = getattr(self, 'ip_requests', 0) + 1
+        return '203.0.113.5'
+
+    def addportmapping(self, port, protocol, host, internal_port, description, remote, lease=0):
+        time.sleep(getattr(self, 'latency', 0))
+        if port == 1:
+            raise Exception("ConflictInMappingEntry")
+        self.mappings[(port, protocol)] = (host, internal_port, description)
+        return True
+
+    def deleteportmapping(self, port, protocol):
+        return self.mappings.pop((port, protocol), None) is not None
+
+def test_discovery_runs_in_background():
+    FakeUPnP.gate = threading.Event()
+    manager = UPnPManager(upnp_factory=FakeUPnP)
+    # Le constructeur ne bloque pas pendant la découverte
+    assert not manager.ready
+    assert manager.get_public_ip() is None
+    FakeUPnP.gate.set()
+    assert manager.wait_ready(2)
+    assert manager.state == STATE_READY
+    assert manager.get_public_ip() == '203.0.113.5'
+    # Pas de second cache : NetworkState décide quand redemander l'IP publique
+    assert manager.get_public_ip() == '203.0.113.5'
+    assert FakeUPnP.instance.ip_requests == 2
+    assert manager.add_port_mapping(8080)
+    assert FakeUPnP.instance.mappings[(8080, 'TCP')][0] == '192.168.1.10'
+
+    # Adresse locale disparue : la passerelle est recherchée à nouveau
+    previous = FakeUPnP.instance
+    manager.on_network_change({'interfaces': {'eth0': [{'family': 'IPv4', 'address': '10.0.0.7'}]},
+                               'default_ip': '10.0.0.7'})
+    assert manager.wait_ready(2)
+    assert FakeUPnP.instance is not previous
+
+def test_discovery_failure():
+    class NoGateway(FakeUPnP):
+        def discover(self):
+            return 0
+
+    manager = UPnPManager(upnp_factory=NoGateway, background=False)
+    assert manager.state == STATE_FAILED
+    assert not manager.available
+    assert manager.add_port_mapping(8080) is False
+
+class ThreadSafeUPnP(FakeUPnP):
+    thread_safe = True
+
+def test_batch_mappings_run_concurrently():
+    FakeUPnP.gate = threading.Event()
+    FakeUPnP.gate.set()
+    manager = UPnPManager(upnp_factory=ThreadSafeUPnP, background=False)
+    FakeUPnP.instance.latency = 0.2
+    start = time.monotonic()
+    results = manager.add_port_mappings([8080, '8443/tcp', (5000, 'udp'), 1], description='Site')
+    assert time.monotonic() - start < 0.6
+    assert [(r['port'], r['protocol'], r['ok']) for r in results] == [
+        (8080, 'TCP', True), (8443, 'TCP', True), (5000, 'UDP', True), (1, 'TCP', False)]
+    assert results[3]['error'] == 'ConflictInMappingEntry'
+    assert FakeUPnP.instance.mappings[(5000, 'UDP')][2] == 'Site'
+
+    results = manager.delete_port_mappings([(8080, 'TCP'), (5000, 'UDP')])
+    assert all(r['ok'] for r in results)
+    assert list(FakeUPnP.instance.mappings) == [(8443, 'TCP')]
+
+def test_unsafe_client_calls_are_serialized():
+    class CountingUPnP(FakeUPnP):
+        active = peak = 0
+
+        def addportmapping(self, *args):
+            CountingUPnP.active += 1
+            CountingUPnP.peak = max(CountingUPnP.peak, CountingUPnP.active)
+            try:
+                return super().addportmapping(*args)
+            finally:
+                CountingUPnP.active -= 1
+
+    FakeUPnP.gate = threading.Event()
+    FakeUPnP.gate.set()
+    # Comme miniupnpc : pas d'attribut thread_safe
+    manager = UPnPManager(upnp_factory=CountingUPnP, background=False)
+    FakeUPnP.instance.latency = 0.05
+    results = manager.add_port_mappings(list(range(8080, 8086)))
+    assert all(r['ok'] for r in results)
+    assert CountingUPnP.peak == 1
+
+def test_parse_mapping():
+    assert parse_mapping('5000/udp') == (5000, 'UDP')
+    assert parse_mapping(80) == (80, 'TCP')
+    try:
+        parse_mapping('70000')
+        assert False
+    except ValueError:
+        pass
+
+class SoapBackedUPnP(FakeUPnP):
+    """Simule miniupnpc : selectigd retourne l'URL de contrôle, les entrées sont lues une par une."""
+    igd = None
+
+    def selectigd(self):
+        return self.igd.control_url
+
+    def getportmappingnumberofentries(self):
+        raise Exception("not supported")
+
+    def getgenericportmapping(self, index):
+        entries = list(self.igd.mappings.values())
+        if index >= len(entries):
+            return None
+        e = entries[index]
+        return (e['external_port'], e['protocol'], (e['internal_ip'], e['internal_port']), e['description'], '1', '', 0)
+
+def _soap_manager(igd):
+    FakeUPnP.gate = threading.Event()
+    FakeUPnP.gate.set()
+    SoapBackedUPnP.igd = igd
+    return UPnPManager(upnp_factory=SoapBackedUPnP, background=False)
+
+def test_list_mappings_bulk_and_cached():
+    with MockIGD(version=2) as igd:
+        for port in range(2000, 2050):
+            igd.add_mapping(port)
+        manager = _soap_manager(igd)
+        assert len(manager.list_port_mappings()) == 50
+        assert manager.bulk_listing is True
+        requests = len(igd.requests)
+        assert len(manager.list_port_mappings()) == 50
+        assert len(igd.requests) == requests
+
+        # Nos propres ajouts sont reportés dans la table sans la relire
+        manager.add_port_mappings([9000])
+        assert 9000 in [m['external_port'] for m in manager.list_port_mappings()]
+
+def test_list_mappings_indexed_fallback():
+    with MockIGD(version=1) as igd:
+        for port in range(3000, 3021):
+            igd.add_mapping(port, internal_ip='192.168.1.5')
+        manager = _soap_manager(igd)
+        mappings = manager.list_port_mappings()
+        assert manager.bulk_listing is False
+        assert [m['external_port'] for m in mappings] == list(range(3000, 3021))
+        assert mappings[0]['internal_ip'] == '192.168.1.5'
+
+def test_list_mappings_malformed_listing_falls_back():
+    with MockIGD(version=2) as igd:
+        for port in range(3000, 3005):
+            igd.add_mapping(port)
+        igd._listing = lambda entries: '<p:PortMappingList'
+        manager = _soap_manager(igd)
+        assert [m['external_port'] for m in manager.list_port_mappings()] == list(range(3000, 3005))
+
+class FlakyIndexUPnP(SoapBackedUPnP):
+    def getgenericportmapping(self, index):
+        if index == 5:
+            raise Exception("ActionFailed")
+        return super().getgenericportmapping(index)
+
+def test_list_mappings_index_error_is_not_end_of_table():
+    with MockIGD(version=1) as igd:
+        for port in range(3000, 3021):
+            igd.add_mapping(port)
+        FakeUPnP.gate = threading.Event()
+        FakeUPnP.gate.set()
+        FlakyIndexUPnP.igd = igd
+        manager = UPnPManager(upnp_factory=FlakyIndexUPnP, background=False)
+        # Une erreur de lecture ne doit pas mettre en cache une table tronquée
+        assert manager.list_port_mappings() == []
+        assert manager.cache.peek('mappings') is None
+
+def test_failed_delete_keeps_cached_mapping():
+    with MockIGD(version=2) as igd:
+        igd.add_mapping(2000)
+        manager = _soap_manager(igd)
+        assert [m['external_port'] for m in manager.list_port_mappings()] == [2000]
+        # Le routeur refuse la suppression : la règle reste dans la table en cache
+        SoapBackedUPnP.instance.deleteportmapping = lambda port, protocol: False
+        assert not manager.delete_port_mapping(2000)
+        assert [m['external_port'] for m in manager.list_port_mappings()] == [2000]
+
+def test_config_change_switches_backends_in_place():
+    FakeUPnP.gate = threading.Event()
+    FakeUPnP.gate.set()
+    manager = UPnPManager(upnp_factory=FakeUPnP, background=False)
+    manager.backends = [NatPmpClient, FakeUPnP]
+    manager.on_config_change({'natpmp_enabled': False})
+    assert manager.backends == [FakeUPnP]
+    assert manager.wait_ready(2) and manager.backend == 'UPnP/FakeUPnP'
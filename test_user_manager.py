@@ -0,0 +1,127 @@
+import json
+import time
+import sqlite3
+import threading
+import user_manager
+from user_manager import UserManager, normalize_path, parse_basic_auth, session_from_cookie
+
+def test_legacy_json_is_migrated_and_upgraded(tmp_path):
+    path = tmp_path / 'users.json'
+    path.write_text(json.dumps({'alice': {'password': 'secret', 'role': 'admin'}, 'bob': {'password': 'pw'},
+                                'carol': {'role': 'admin'}, 'dave': {'password': None}}))
+    # Copie en clair laissée par une migration précédente
+    (tmp_path / 'users.json.migrated').write_text('{}')
+    db = str(tmp_path / 'users.db')
+    manager = UserManager(db, iterations=1000)
+    assert not path.exists() and not (tmp_path / 'users.json.migrated').exists()
+    # Les comptes sans mot de passe ne sont pas importés
+    assert manager.count_users() == 2
+    assert not manager.authenticate('carol', '')
+    assert not manager.authenticate('alice', 'wrong')
+    assert not manager.authenticate('carol', 'secret')
+    assert manager.authenticate('alice', 'secret')
+    with sqlite3.connect(db) as conn:
+        stored, role = conn.execute("SELECT password, role FROM users WHERE username = 'alice'").fetchone()
+    assert stored.startswith('pbkdf2_sha256$1000$') and role == 'admin'
+    with sqlite3.connect(db) as conn:
+        # Haché dès l'import, avant toute connexion
+        stored = conn.execute("SELECT password FROM users WHERE username = 'bob'").fetchone()[0]
+    assert stored.startswith('pbkdf2_sha256$1000$')
+    assert user_manager.verify_password('', '') == (False, False)
+    manager.close()
+    assert UserManager(db, iterations=1000).authenticate('alice', 'secret')
+
+def test_sessions_avoid_repeated_key_derivation(tmp_path, monkeypatch):
+    manager = UserManager(str(tmp_path / 'users.db'), iterations=1000)
+    manager.add_user('alice', 'secret')
+    calls = []
+    derive = user_manager._derive
+    monkeypatch.setattr(user_manager, '_derive', lambda *args: calls.append(1) or derive(*args))
+
+    token = manager.login('alice', 'secret')
+    assert manager.validate_session(token) == {'username': 'alice', 'role': 'user'}
+    basic = manager.authenticate_cached('alice', 'secret')
+    for _ in range(5):
+        assert manager.authenticate_cached('alice', 'secret') == basic
+    assert manager.validate_session(basic) == {'username': 'alice', 'role': 'user'}
+    assert not manager.authenticate_cached('alice', 'nope')
+    assert len(calls) == 3
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        manager.validate_session(token)
+    assert (time.perf_counter() - start) / 10000 < 50e-6
+
+    # Changer le mot de passe ferme les sessions existantes
+    manager.add_user('alice', 'changed')
+    assert manager.validate_session(token) is None
+    assert not manager.authenticate_cached('alice', 'secret')
+
+def test_header_parsing():
+    assert parse_basic_auth('Basic YWxpY2U6czpl') == ('alice', 's:e')
+    assert parse_basic_auth('Bearer abc') == (None, None)
+    assert parse_basic_auth('Basic !!!') == (None, None)
+    assert session_from_cookie('theme=dark; session=abc123') == 'abc123'
+    assert session_from_cookie(None) is None
+    assert normalize_path('/public/../private//a%2Fb?x=1') == '/private/a/b'
+
+def test_path_access_rules(tmp_path):
+    manager = UserManager(str(tmp_path / 'users.db'), iterations=1000)
+    manager.add_role('guest')
+    manager.add_user('alice', 'secret', 'guest')
+    manager.set_access_rule('guest', '/', allow=False)
+    manager.set_access_rule('guest', '/public/', allow=True)
+    manager.set_access_rule('guest', '/public/drafts', allow=False)
+    assert manager.is_allowed('alice', '/public/index.html')
+    assert not manager.is_allowed('alice', '/public/drafts/a.txt')
+    assert not manager.is_allowed('alice', '/publication')
+    assert not manager.is_allowed('alice', '/public/../secret.txt')
+    assert not manager.is_allowed('nobody', '/public/index.html')
+    # Tous les chemins doivent être autorisés ; comparaison sans casse pour les systèmes de fichiers qui l'ignorent
+    assert not manager.is_allowed('alice', '/public/a.min.js', '/public/drafts/a.js')
+    assert not manager.is_allowed('alice', '/PUBLIC/index.html')
+    assert manager.is_allowed('alice', '/PUBLIC/index.html', case_sensitive=False)
+    assert not manager.is_allowed('alice', '/public/DRAFTS/a.txt', case_sensitive=False)
+
+    # Sans règle, le rôle a accès à tout ; le changement de rôle s'applique aux sessions ouvertes
+    token = manager.login('alice', 'secret')
+    assert manager.set_role('alice', 'user')
+    assert manager.validate_session(token)['role'] == 'user'
+    assert manager.is_allowed('alice', '/secret.txt')
+    try:
+        manager.add_user('bob', 'pw', 'missing')
+        assert False
+    except ValueError:
+        pass
+    assert manager.remove_role('guest')
+    assert manager.get_access_rules('guest') == []
+    assert not manager.remove_role('user')
+
+def test_concurrent_writers_and_many_users(tmp_path):
+    path = tmp_path / 'users.json'
+    # Fichier écrit par une version qui hachait déjà les mots de passe : importé sans nouvelle dérivation
+    password = user_manager.hash_password('x', 1000)
+    path.write_text(json.dumps({f'user{i:05d}': {'password': password, 'role': 'user'} for i in range(20000)}))
+    manager = UserManager(str(tmp_path / 'users.db'), iterations=1000)
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(20):
+                manager.add_user(f'new{n}-{i}', 'pw')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert manager.count_users() == 20160
+
+    start = time.perf_counter()
+    for i in range(0, 20000, 20):
+        assert manager.get_user(f'user{i:05d}')['role'] == 'user'
+    assert (time.perf_counter() - start) / 1000 < 1e-3
+    assert [u['username'] for u in manager.list_users(160 + 100, 2)] == ['user00100', 'user00101']
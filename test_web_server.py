@@ -0,0 +1,228 @@
+import shutil
+import socket
+import ssl
+import subprocess
+import time
+import queue
+import urllib.error
+import urllib.request
+import zipfile
+import pytest
+from asset_optimizer import optimize_asset
+from ban_manager import BanManager
+from file_manager import FileManager
+from ip_manager import IPManager
+from network_scanner import NetworkScanner
+from user_manager import UserManager
+from web_server import WebServer
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class InlineOptimizer:
+    def submit(self, file_path, callback=None):
+        callback(optimize_asset(file_path))
+
+def _optimized_site(tmp_path, files):
+    """Téléverser un site dans une archive ; les variantes sont créées par l'optimiseur."""
+    archive = tmp_path / "site.zip"
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for name, text in files.items():
+            zf.writestr(name, text)
+    file_manager = FileManager(str(tmp_path / "site"))
+    file_manager.optimizer = InlineOptimizer()
+    file_manager.upload_archive(str(archive))
+    server = WebServer(file_manager.upload_dir)
+    server.variant_original = file_manager.variant_original
+    return server
+
+def test_serves_smaller_variant(tmp_path):
+    server = _optimized_site(tmp_path, {
+        "style.css": "body {\n    margin: 0;\n}\n",
+        # Fichier de l'utilisateur au nom de variante : jamais servi à la place de lib.css
+        "lib.css": "a {\n    color: red;\n}\n", "lib.min.css": "/* mine */"
+    })
+    server.set_serve_variants(True)
+    port = _free_port()
+    server.start_server(port, None)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        with urllib.request.urlopen(f"{url}/style.css") as response:
+            assert response.read() == b"body{margin: 0;}"
+        with urllib.request.urlopen(f"{url}/lib.css") as response:
+            assert response.read() == b"a {\n    color: red;\n}\n"
+        # Optimisation désactivée : les originaux sont servis tels quels
+        server.set_serve_variants(False)
+        with urllib.request.urlopen(f"{url}/style.css") as response:
+            assert response.read() == b"body {\n    margin: 0;\n}\n"
+    finally:
+        server.stop_server()
+
+def test_start_with_reserved_socket(tmp_path):
+    (tmp_path / "index.html").write_text("hello")
+    sock, port = NetworkScanner.reserve_port(0)
+    server = WebServer(str(tmp_path))
+    server.start_server(port, None, sock=sock)
+    try:
+        assert server.port == port
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/index.html") as response:
+            assert response.read() == b"hello"
+    finally:
+        server.stop_server()
+
+def _is_refused(url):
+    try:
+        urllib.request.urlopen(url, timeout=2)
+    except urllib.error.HTTPError:
+        return False
+    except (urllib.error.URLError, ConnectionError):
+        return True
+    return False
+
+def test_blocked_and_banned_clients_are_dropped(tmp_path):
+    (tmp_path / "index.html").write_text("hello")
+    ip_manager = IPManager(str(tmp_path / "allowed.json"), str(tmp_path / "blocked.json"))
+    server = WebServer(str(tmp_path))
+    server.ban_manager = BanManager(rules={'not_found': (3, 60)})
+    port = _free_port()
+    server.start_server(port, ip_manager)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(3):
+            assert not _is_refused(f"{url}/.env")
+        assert server.ban_manager.is_banned('127.0.0.1')
+        assert _is_refused(f"{url}/index.html")
+
+        server.ban_manager.unban('127.0.0.1')
+        with urllib.request.urlopen(f"{url}/index.html") as response:
+            assert response.read() == b"hello"
+        ip_manager.add_blocked_ip('127.0.0.0/8')
+        assert _is_refused(f"{url}/index.html")
+    finally:
+        server.stop_server()
+
+def test_request_rule_counts_requests(tmp_path):
+    (tmp_path / "index.html").write_text("hello")
+    server = WebServer(str(tmp_path))
+    server.ban_manager = BanManager(rules={'request': (3, 60)})
+    port = _free_port()
+    server.start_server(port, None)
+    url = f"http://127.0.0.1:{port}/index.html"
+    try:
+        # Connexions ouvertes par avance par un navigateur, sans requête : non comptées
+        for _ in range(3):
+            socket.create_connection(('127.0.0.1', port)).close()
+        for _ in range(2):
+            with urllib.request.urlopen(url) as response:
+                assert response.read() == b"hello"
+        assert not server.ban_manager.is_banned('127.0.0.1')
+        assert _is_refused(url)
+        assert server.ban_manager.is_banned('127.0.0.1')
+    finally:
+        server.stop_server()
+
+@pytest.mark.skipif(shutil.which('openssl') is None, reason="openssl not available")
+def test_failed_tls_handshakes_are_banned(tmp_path):
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run([
+        'openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+        '-subj', '/CN=localhost', '-keyout', str(key), '-out', str(cert)
+    ], check=True, capture_output=True)
+    (tmp_path / "index.html").write_text("hello")
+    server = WebServer(str(tmp_path))
+    server.ban_manager = BanManager(rules={'tls_error': (2, 60)})
+    port = _free_port()
+    server.start_server(port, None, ssl_enabled=True, certfile=str(cert), keyfile=str(key))
+    try:
+        context = ssl.create_default_context(cafile=str(cert))
+        with urllib.request.urlopen(f"https://localhost:{port}/index.html", context=context) as response:
+            assert response.read() == b"hello"
+        for _ in range(2):
+            # Requête en clair sur le port TLS : la poignée de main échoue
+            assert _is_refused(f"http://127.0.0.1:{port}/index.html")
+        # L'échec est enregistré par le thread du serveur, parfois après la fermeture côté client
+        deadline = time.monotonic() + 2
+        while not server.ban_manager.is_banned('127.0.0.1') and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.ban_manager.is_banned('127.0.0.1')
+    finally:
+        server.stop_server()
+
+def test_login_required(tmp_path):
+    server = _optimized_site(tmp_path, {
+        "index.html": "hello", "private.html": "secret", "app.css": "body {\n    margin: 0;\n}\n"
+    })
+    users = UserManager(str(tmp_path / "users.db"), iterations=1000)
+    users.add_user('alice', 'secret')
+    users.set_access_rule('user', '/private.html', allow=False)
+    users.set_access_rule('user', '/app.css', allow=False)
+    server.user_manager = users
+    server.auth_required = True
+    port = _free_port()
+    server.start_server(port, None)
+    url = f"http://127.0.0.1:{port}/index.html"
+    try:
+        try:
+            urllib.request.urlopen(url)
+            assert False
+        except urllib.error.HTTPError as e:
+            assert e.code == 401 and 'Basic' in e.headers['WWW-Authenticate']
+
+        request = urllib.request.Request(url, headers={'Authorization': 'Basic YWxpY2U6c2VjcmV0'})
+        with urllib.request.urlopen(request) as response:
+            assert response.read() == b"hello"
+            cookie = response.headers['Set-Cookie'].split(';')[0]
+        # Un client sans cookie (curl) retrouve la même session au lieu d'en ouvrir une par requête
+        sessions = len(users.sessions._entries)
+        with urllib.request.urlopen(request) as response:
+            assert response.headers['Set-Cookie'].split(';')[0] == cookie
+        assert len(users.sessions._entries) == sessions
+        with urllib.request.urlopen(urllib.request.Request(url, headers={'Cookie': cookie})) as response:
+            assert response.read() == b"hello"
+            assert response.headers['Set-Cookie'] is None
+        # La variante optimisée d'un fichier interdit est interdite elle aussi
+        for name in ('private.html', 'app.css', 'app.min.css', 'sub/../private.html'):
+            try:
+                urllib.request.urlopen(urllib.request.Request(url.replace('index.html', name), headers={'Cookie': cookie}))
+                assert False, name
+            except urllib.error.HTTPError as e:
+                assert e.code == 403
+    finally:
+        server.stop_server()
+
+def test_port_change_keeps_connections(tmp_path):
+    (tmp_path / "index.html").write_text("hello")
+    server = WebServer(str(tmp_path))
+    results = queue.Queue()
+    server.port_change_callback = lambda port, error: results.put((port, error))
+    old_port, new_port = _free_port(), _free_port()
+    server.start_server(old_port, None)
+    try:
+        client = socket.create_connection(('127.0.0.1', old_port))
+        client.sendall(b"GET /index.html HTTP/1.0\r\n")
+        time.sleep(0.1)
+        # Le changement se fait en arrière-plan et attend la fin de la requête en cours au lieu de la couper
+        start = time.monotonic()
+        server.on_config_change({'port': new_port})
+        assert time.monotonic() - start < 0.1
+        time.sleep(0.1)
+        client.sendall(b"\r\n")
+        response = b''.join(iter(lambda: client.recv(4096), b''))
+        client.close()
+        assert results.get(timeout=5) == (new_port, None)
+        assert response.startswith(b"HTTP/1.0 200") and response.endswith(b"hello")
+        with urllib.request.urlopen(f"http://127.0.0.1:{new_port}/index.html") as r:
+            assert r.read() == b"hello"
+        assert _is_refused(f"http://127.0.0.1:{old_port}/index.html")
+
+        # Port déjà pris : le serveur reste sur son port et l'erreur est signalée
+        with socket.create_server(('0.0.0.0', 0)) as busy:
+            server.on_config_change({'port': busy.getsockname()[1]})
+            port, error = results.get(timeout=5)
+        assert port == new_port and error
+        with urllib.request.urlopen(f"http://127.0.0.1:{new_port}/index.html") as r:
+            assert r.read() == b"hello"
+    finally:
+        server.stop_server()
@@ -0,0 +1,111 @@
+import time
+import logging
+import threading
+
+
+class TTLCache:
+    """Cache à durée de vie avec service des valeurs périmées pendant leur revalidation."""
+
+    def __init__(self, ttl=60, stale_ttl=600, error_ttl=10):
+        self.ttl = ttl
+        # Durée supplémentaire pendant laquelle une valeur périmée est servie pendant son rafraîchissement
+        self.stale_ttl = stale_ttl
+        # Délai avant de réessayer après un échec, pour ne pas surcharger un routeur lent
+        self.error_ttl = error_ttl
+        self._entries = {}
+        self._errors = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _load(self, key, loader):
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._errors[key] = (e, time.monotonic())
+            raise
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._errors.pop(key, None)
+        return value
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                logging.warning(f"Background refresh of {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self, key, loader, default=None):
+        """Obtenir une valeur ; une valeur périmée est retournée immédiatement et rafraîchie en arrière-plan."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            error = self._errors.get(key)
+        if entry:
+            value, fetched = entry
+            age = now - fetched
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                if not error or now - error[1] >= self.error_ttl:
+                    self._refresh_in_background(key, loader)
+                return value
+        if error and now - error[1] < self.error_ttl:
+            return default
+
+        # Un seul chargement synchrone à la fois par clé ; les autres appelants attendent son résultat
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            try:
+                return self._load(key, loader)
+            except Exception as e:
+                logging.error(f"Failed to load {key}: {e}")
+                return default
+
+    def peek(self, key, default=None):
+        """Obtenir la dernière valeur connue sans la charger."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry else default
+
+    def set(self, key, value):
+        """Enregistrer une valeur connue."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._errors.pop(key, None)
+
+    def update(self, key, func):
+        """Modifier une valeur en cache sans changer sa date de chargement."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries[key] = (func(entry[0]), entry[1])
+
+    def invalidate(self, key=None):
+        """Oublier une valeur, ou tout le cache."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._errors.clear()
+            else:
+                self._entries.pop(key, None)
+                self._errors.pop(key, None)
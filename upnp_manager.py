@@ -1,77 +1,405 @@
 import logging
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from igd_client import UNSUPPORTED_ACTION_CODES, WANIP_V2, IGDClient, SoapClient, UPnPError
+from natpmp_client import NatPmpClient
+from ttl_cache import TTLCache
 try:
     import miniupnpc
     UPNP_AVAILABLE = True
 except ImportError:
     UPNP_AVAILABLE = False
 
+# États de la découverte de la passerelle
+STATE_IDLE = 'idle'
+STATE_DISCOVERING = 'discovering'
+STATE_READY = 'ready'
+STATE_FAILED = 'failed'
+
+DEFAULT_DESCRIPTION = 'Port Forwarding App'
+PROTOCOLS = ('TCP', 'UDP')
+
+def parse_mapping(spec):
+    """Convertir '5000', '5000/udp' ou un tuple (port, protocole) en (port, protocole)."""
+    if isinstance(spec, int):
+        return spec, 'TCP'
+    if isinstance(spec, str):
+        port, _, protocol = spec.partition('/')
+        spec = (int(port), protocol or 'TCP')
+    port, protocol = int(spec[0]), spec[1].upper()
+    if protocol not in PROTOCOLS or not 1 <= port <= 65535:
+        raise ValueError(f"Invalid port mapping: {spec}")
+    return port, protocol
+
+def default_upnp_factory():
+    """Client UPnP par défaut : miniupnpc, ou le client IGD intégré (igd_client) s'il est absent."""
+    return miniupnpc.UPnP if UPNP_AVAILABLE else IGDClient
+
+def backend_name(client):
+    """Nom du protocole de redirection utilisé par un client ('PCP', 'NAT-PMP', 'UPnP/miniupnpc'...)."""
+    if isinstance(client, NatPmpClient):
+        return client.protocol_name
+    if isinstance(client, IGDClient):
+        return 'UPnP/built-in'
+    if UPNP_AVAILABLE and isinstance(client, miniupnpc.UPnP):
+        return 'UPnP/miniupnpc'
+    return f"UPnP/{type(client).__name__}"
+
 class UPnPManager:
-    def __init__(self):
+    def __init__(self, upnp_factory=None, discover_delay=None, background=True, cache_ttl=60, stale_ttl=600,
+                 backends=None):
         self.upnp = None
-        self.available = UPNP_AVAILABLE
-        if UPNP_AVAILABLE:
-            try:
-                self.upnp = miniupnpc.UPnP()
-                self.upnp.discoverdelay = 200
-                self.upnp.discover()
-                self.upnp.selectigd()
-            except Exception as e:
-                logging.error(f"UPnP initialization failed: {e}")
-                self.available = False
+        if upnp_factory is None:
+            upnp_factory = default_upnp_factory()
+            # NAT-PMP/PCP : un seul aller-retour UDP, essayé avant la découverte SSDP et les requêtes SOAP
+            default_backends = [NatPmpClient, upnp_factory]
+        else:
+            default_backends = [upnp_factory]
+        # Fabriques de clients essayées dans l'ordre ; la première qui trouve une passerelle est retenue
+        self.backends = default_backends if backends is None else list(backends)
+        self.backend = None
+        if discover_delay is None:
+            # miniupnpc attend toujours le délai complet ; le client intégré s'arrête à la première réponse
+            discover_delay = 2000 if upnp_factory is IGDClient else 200
+        # Les requêtes SOAP vers le routeur sont lentes ou limitées : adresses de la passerelle et table des règles
+        # sont mises en cache (l'IP publique l'est par NetworkState, qui la redemande après un changement de réseau)
+        self.cache = TTLCache(cache_ttl, stale_ttl)
+        self.upnp_factory = upnp_factory
+        self.discover_delay = discover_delay
+        self.available = bool(self.backends)
+        self.state = STATE_IDLE
+        self.error = None
+        self._ready_event = threading.Event()
+        self._lock = threading.Lock()
+        # Sérialise les appels aux clients qui ne sont pas sûrs entre threads (miniupnpc)
+        self._client_lock = threading.Lock()
+        self._thread = None
+        self._soap = None
+        self.bulk_listing = None  # None = pas encore essayé
+        if self.available:
+            self.start_discovery(background)
+
+    def _try_backend(self, factory):
+        upnp = factory()
+        if not isinstance(upnp, NatPmpClient):
+            upnp.discoverdelay = self.discover_delay
+        devices = upnp.discover()
+        if not devices:
+            raise RuntimeError(f"no {'NAT-PMP/PCP gateway' if isinstance(upnp, NatPmpClient) else 'UPnP device'} found")
+        return upnp, devices, upnp.selectigd()
+
+    def _discover(self):
+        errors = []
+        try:
+            for factory in self.backends:
+                try:
+                    upnp, devices, igd_url = self._try_backend(factory)
+                except Exception as e:
+                    errors.append(str(e) or e.__class__.__name__)
+                    continue
+                self.cache.invalidate()
+                self.cache.set('lan_address', upnp.lanaddr)
+                self.cache.set('igd_url', igd_url)
+                self.upnp = upnp
+                self.backend = backend_name(upnp)
+                self.available = True
+                self.state = STATE_READY
+                logging.info(f"Port mapping gateway found ({devices} devices, {self.backend})")
+                return
+            raise RuntimeError('; '.join(errors) or "no port mapping backend configured")
+        except Exception as e:
+            logging.error(f"UPnP initialization failed: {e}")
+            self.error = str(e)
+            self.available = False
+            self.state = STATE_FAILED
+        finally:
+            self._ready_event.set()
+
+    def start_discovery(self, background=True):
+        """Lancer la découverte de la passerelle, par défaut en arrière-plan."""
+        with self._lock:
+            if not self.backends or self.state == STATE_DISCOVERING:
+                return
+            self.state = STATE_DISCOVERING
+            self.error = None
+            self._ready_event.clear()
+        if background:
+            self._thread = threading.Thread(target=self._discover, daemon=True)
+            self._thread.start()
+        else:
+            self._discover()
+
+    def wait_ready(self, timeout=None):
+        """Attendre la fin de la découverte ; retourne True si une passerelle est prête."""
+        if self.state != STATE_IDLE:
+            self._ready_event.wait(timeout)
+        return self.state == STATE_READY
 
-    def add_port_mapping(self, port):
+    @property
+    def ready(self):
+        return self.state == STATE_READY
+
+    def get_lan_address(self):
+        """Obtenir l'adresse locale utilisée pour joindre la passerelle."""
+        if not self.ready:
+            return None
+        return self.cache.get('lan_address', lambda: self.upnp.lanaddr)
+
+    def get_gateway_info(self):
+        """Obtenir les informations connues sur la passerelle sans interroger le routeur."""
+        return {
+            'state': self.state,
+            'backend': self.backend,
+            'lan_address': self.cache.peek('lan_address'),
+            'igd_url': self.cache.peek('igd_url'),
+        }
+
+    def invalidate_cache(self):
+        """Oublier les valeurs mises en cache (changement de réseau)."""
+        self.cache.invalidate()
+
+    def on_network_change(self, state):
+        """Relancer la découverte si l'adresse locale utilisée pour la passerelle a disparu."""
+        lan_address = self.cache.peek('lan_address')
+        if not self.ready or not lan_address:
+            return
+        addresses = {entry['address'] for entries in state['interfaces'].values() for entry in entries}
+        if not addresses and state['default_ip']:
+            addresses = {state['default_ip']}
+        if addresses and lan_address not in addresses:
+            logging.info(f"LAN address {lan_address} is gone, rediscovering UPnP gateway")
+            self.cache.invalidate()
+            self.start_discovery()
+
+    def on_config_change(self, changes):
+        """Ajouter ou retirer NAT-PMP/PCP des protocoles essayés et relancer la découverte."""
+        if 'natpmp_enabled' not in changes:
+            return
+        backends = [factory for factory in self.backends if factory is not NatPmpClient] or [self.upnp_factory]
+        if changes['natpmp_enabled']:
+            backends.insert(0, NatPmpClient)
+        if backends != self.backends:
+            self.backends = backends
+            # Les redirections existantes restent en place ; seul le client utilisé pour les suivantes change
+            self.start_discovery()
+
+    def _call(self, method, *args):
+        """Appeler une méthode du client de la passerelle, sous verrou si le client n'est pas sûr entre threads."""
+        upnp = self.upnp
+        if getattr(upnp, 'thread_safe', False):
+            return getattr(upnp, method)(*args)
+        with self._client_lock:
+            return getattr(upnp, method)(*args)
+
+    def _max_workers(self, workers):
+        """Nombre de requêtes simultanées vers la passerelle : une seule pour un client sérialisé."""
+        return workers if getattr(self.upnp, 'thread_safe', False) else 1
+
+    def _add_mapping(self, port, protocol, internal_port, description, lease):
+        args = [port, protocol, self.get_lan_address(), internal_port or port, description, '']
+        if lease:
+            # Les anciennes versions de miniupnpc n'acceptent pas la durée du bail
+            args.append(lease)
+        return bool(self._call('addportmapping', *args))
+
+    def add_port_mapping(self, port, protocol='TCP', internal_port=None, description=DEFAULT_DESCRIPTION, lease=0):
         """Ajouter une règle de transfert de port UPnP."""
-        if not self.available or not self.upnp:
+        if not self.wait_ready(self.discover_delay / 1000 + 5):
             return False
         try:
-            result = self.upnp.addportmapping(port, 'TCP', self.upnp.lanaddr, port, 'Port Forwarding App', '')
-            logging.info(f"Port mapping added for port {port}")
+            result = self._add_mapping(port, protocol, internal_port, description, lease)
+            if result:
+                self._update_mapping_cache(added=[(port, protocol, internal_port or port, description, lease)])
+                logging.info(f"Port mapping added for port {port}/{protocol}")
+            else:
+                logging.warning(f"Router refused port mapping for port {port}/{protocol}")
             return result
         except Exception as e:
             logging.error(f"Failed to add port mapping: {e}")
             return False
 
-    def delete_port_mapping(self, port):
+    def delete_port_mapping(self, port, protocol='TCP'):
         """Supprimer une règle de transfert de port UPnP."""
-        if not self.available or not self.upnp:
+        if not self.wait_ready(self.discover_delay / 1000 + 5):
             return False
         try:
-            result = self.upnp.deleteportmapping(port, 'TCP')
-            logging.info(f"Port mapping deleted for port {port}")
+            result = self._call('deleteportmapping', port, protocol)
+            if result:
+                self._update_mapping_cache(deleted=[(port, protocol)])
+                logging.info(f"Port mapping deleted for port {port}/{protocol}")
+            else:
+                logging.error(f"Failed to delete port mapping for port {port}/{protocol}")
             return result
         except Exception as e:
             logging.error(f"Failed to delete port mapping: {e}")
             return False
 
-    def get_public_ip(self):
-        """Obtenir l'adresse IP publique."""
-        if not self.available or not self.upnp:
+    def get_specific_port_mapping(self, port, protocol='TCP'):
+        """Lire une règle existante ; retourne un dictionnaire ou None si elle n'existe pas."""
+        if not self.ready:
             return None
-        try:
-            return self.upnp.externalipaddress()
-        except Exception as e:
-            logging.error(f"Failed to get public IP: {e}")
+        entry = self._call('getspecificportmapping', port, protocol)
+        if not entry:
             return None
+        return {
+            'external_port': port,
+            'protocol': protocol,
+            'internal_ip': entry[0],
+            'internal_port': entry[1],
+            'description': entry[2],
+            'enabled': bool(entry[3]) if len(entry) > 3 else True,
+            'lease': entry[4] if len(entry) > 4 else 0
+        }
 
-    def list_port_mappings(self):
-        """Lister les règles de transfert de port UPnP."""
-        if not self.available or not self.upnp:
-            return []
-        mappings = []
-        try:
-            i = 0
-            while True:
-                p = self.upnp.getgenericportmapping(i)
-                if p is None:
-                    break
+    def _run_batch(self, action, specs, workers):
+        items = [parse_mapping(spec) for spec in specs]
+        results = [{'port': port, 'protocol': protocol, 'ok': False, 'error': None, 'code': None}
+                   for port, protocol in items]
+        if not items:
+            return results
+        if not self.wait_ready(self.discover_delay / 1000 + 5):
+            for result in results:
+                result['error'] = self.error or "UPnP gateway not available"
+            return results
+
+        def run(result):
+            try:
+                result['ok'] = bool(action(result['port'], result['protocol']))
+                if not result['ok']:
+                    result['error'] = "rejected by gateway"
+            except Exception as e:
+                result['error'] = str(e) or e.__class__.__name__
+                # Code d'erreur UPnP/NAT-PMP, si le client le fournit
+                result['code'] = getattr(e, 'code', None)
+
+        # Les requêtes SOAP sont envoyées en parallèle : une seule latence réseau pour tout le lot
+        with ThreadPoolExecutor(max_workers=max(1, min(self._max_workers(workers), len(results)))) as executor:
+            list(executor.map(run, results))
+        return results
+
+    def add_port_mappings(self, specs, description=DEFAULT_DESCRIPTION, lease=0, workers=8):
+        """Ajouter plusieurs règles (ex. [8080, '8443/tcp', (5000, 'UDP')]) ; retourne un résultat par règle."""
+        results = self._run_batch(
+            lambda port, protocol: self._add_mapping(port, protocol, None, description, lease), specs, workers)
+        self._update_mapping_cache(added=[(r['port'], r['protocol'], r['port'], description, lease)
+                                          for r in results if r['ok']])
+        added = [f"{r['port']}/{r['protocol']}" for r in results if r['ok']]
+        failed = [f"{r['port']}/{r['protocol']} ({r['error']})" for r in results if not r['ok']]
+        if added:
+            logging.info(f"Port mappings added: {', '.join(added)}")
+        if failed:
+            logging.error(f"Failed to add port mappings: {', '.join(failed)}")
+        return results
+
+    def delete_port_mappings(self, specs, workers=8):
+        """Supprimer plusieurs règles ; retourne un résultat par règle."""
+        results = self._run_batch(lambda port, protocol: self._call('deleteportmapping', port, protocol), specs,
+                                  workers)
+        self._update_mapping_cache(deleted=[(r['port'], r['protocol']) for r in results if r['ok']])
+        deleted = [f"{r['port']}/{r['protocol']}" for r in results if r['ok']]
+        if deleted:
+            logging.info(f"Port mappings deleted: {', '.join(deleted)}")
+        return results
+
+    def get_public_ip(self):
+        """Demander l'adresse IP publique à la passerelle (sans cache : voir NetworkState)."""
+        if not self.ready:
+            return None
+        return self._call('externalipaddress')
+
+    def _update_mapping_cache(self, added=(), deleted=()):
+        """Reporter nos propres modifications dans la table en cache au lieu de la relire."""
+        lan_address = self.cache.peek('lan_address')
+
+        def apply(mappings):
+            changed = {(port, protocol) for port, protocol, *_ in added} | set(deleted)
+            mappings = [m for m in mappings if (m['external_port'], m['protocol']) not in changed]
+            for port, protocol, internal_port, description, lease in added:
                 mappings.append({
-                    'external_port': p[0],
-                    'protocol': p[1],
-                    'internal_ip': p[2],
-                    'internal_port': p[3],
-                    'description': p[4]
+                    'external_port': port, 'protocol': protocol, 'internal_ip': lan_address,
+                    'internal_port': internal_port, 'description': description, 'lease': lease
                 })
-                i += 1
-        except Exception as e:
-            logging.error(f"Failed to list port mappings: {e}")
-        return mappings
+            return sorted(mappings, key=lambda m: (m['external_port'], m['protocol']))
+
+        if added or deleted:
+            self.cache.update('mappings', apply)
+
+    def _bulk_client(self):
+        control_url = self.cache.peek('igd_url')
+        if self.bulk_listing is False or not isinstance(control_url, str) or not control_url.startswith('http'):
+            return None
+        soap = getattr(self.upnp, 'soap', None)
+        if soap is not None and soap.service_type == WANIP_V2:
+            # Le client intégré a déjà une connexion ouverte vers l'URL de contrôle
+            return soap
+        if self._soap is None or self._soap.control_url != control_url:
+            self._soap = SoapClient(control_url, WANIP_V2)
+        return self._soap
+
+    def _generic_entry(self, index):
+        # None signale la fin de la table ; toute autre erreur remonte à l'appelant
+        p = self._call('getgenericportmapping', index)
+        if p is None:
+            return None
+        if isinstance(p[2], tuple):
+            # miniupnpc : (port, protocole, (client, port interne), description, ...)
+            (internal_ip, internal_port), description = p[2], p[3]
+        else:
+            internal_ip, internal_port, description = p[2], p[3], p[4]
+        return {
+            'external_port': p[0],
+            'protocol': p[1],
+            'internal_ip': internal_ip,
+            'internal_port': internal_port,
+            'description': description
+        }
+
+    def _fetch_mappings(self, workers=8):
+        """Lire toute la table des règles de la passerelle."""
+        client = self._bulk_client()
+        if client:
+            try:
+                mappings = [m for protocol in PROTOCOLS for m in client.get_list_of_port_mappings(protocol)]
+                self.bulk_listing = True
+                return sorted(mappings, key=lambda m: (m['external_port'], m['protocol']))
+            except UPnPError as e:
+                if e.code in UNSUPPORTED_ACTION_CODES or 400 <= e.code < 500:
+                    logging.info("Gateway does not support GetListOfPortMappings, using indexed listing")
+                    self.bulk_listing = False
+                else:
+                    logging.warning(f"Bulk port mapping listing failed: {e}")
+            except (OSError, ValueError, ET.ParseError) as e:
+                # Réponse illisible : la lecture par index prend le relais
+                logging.warning(f"Bulk port mapping listing failed: {e}")
+
+        count = None
+        # Le client IGD intégré n'expose pas ce nombre : lecture des index par lots
+        if hasattr(self.upnp, 'getportmappingnumberofentries'):
+            try:
+                count = int(self._call('getportmappingnumberofentries'))
+            except Exception:
+                count = None
+        mappings = []
+        with ThreadPoolExecutor(max_workers=self._max_workers(workers)) as executor:
+            if count is not None:
+                mappings = [m for m in executor.map(self._generic_entry, range(count)) if m]
+            else:
+                # Nombre d'entrées inconnu : lots d'index lus en parallèle jusqu'au premier index vide
+                index = 0
+                while True:
+                    batch = list(executor.map(self._generic_entry, range(index, index + workers)))
+                    mappings.extend(m for m in batch if m)
+                    if None in batch:
+                        break
+                    index += workers
+        return sorted(mappings, key=lambda m: (m['external_port'], m['protocol']))
+
+    def list_port_mappings(self, refresh=False):
+        """Lister les règles de transfert de port UPnP (table mise en cache)."""
+        if not self.ready:
+            return []
+        if refresh:
+            self.cache.invalidate('mappings')
+        return list(self.cache.get('mappings', self._fetch_mappings, default=[]))
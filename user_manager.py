@@ -1,25 +1,440 @@
 import json
 import os
+import hmac
+import time
+import queue
+import base64
+import hashlib
+import secrets
+import logging
+import sqlite3
+import posixpath
+import threading
+from contextlib import contextmanager
+from urllib.parse import unquote
+
+HASH_SCHEME = 'pbkdf2_sha256'
+# Recommandation OWASP pour PBKDF2-HMAC-SHA256
+PBKDF2_ITERATIONS = 600000
+SESSION_COOKIE = 'session'
+DEFAULT_ROLES = ('admin', 'user')
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS roles (
+        name TEXT PRIMARY KEY
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL REFERENCES roles (name),
+        created REAL NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS users_role ON users (role);
+    -- Règles par préfixe de chemin, normalisé comme les chemins des requêtes
+    CREATE TABLE IF NOT EXISTS access_rules (
+        role TEXT NOT NULL REFERENCES roles (name) ON DELETE CASCADE,
+        path TEXT NOT NULL,
+        allow INTEGER NOT NULL,
+        PRIMARY KEY (role, path)
+    ) WITHOUT ROWID;
+'''
+
+def _derive(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+def hash_password(password, iterations=PBKDF2_ITERATIONS):
+    """Dériver un condensat salé au format pbkdf2_sha256$itérations$sel$condensat."""
+    salt = secrets.token_bytes(16)
+    digest = _derive(password, salt, iterations)
+    return '$'.join((HASH_SCHEME, str(iterations), base64.b64encode(salt).decode('ascii'),
+                     base64.b64encode(digest).decode('ascii')))
+
+def verify_password(stored, password, iterations=PBKDF2_ITERATIONS):
+    """Vérifier un mot de passe ; retourne (valide, à re-hacher)."""
+    if not isinstance(stored, str) or not stored:
+        # Mot de passe absent : le compte est inutilisable, un mot de passe vide n'ouvre rien
+        return False, False
+    if not stored.startswith(HASH_SCHEME + '$'):
+        # Ancien format : mot de passe en clair, converti à la première connexion réussie
+        return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8')), True
+    try:
+        _, rounds, salt, digest = stored.split('$')
+        rounds = int(rounds)
+        expected = base64.b64decode(digest)
+        valid = hmac.compare_digest(_derive(password, base64.b64decode(salt), rounds), expected)
+    except ValueError:
+        return False, False
+    return valid, rounds < iterations
+
+def parse_basic_auth(header):
+    """Extraire (utilisateur, mot de passe) d'un en-tête Authorization: Basic ; (None, None) sinon."""
+    if not header or header[:6].lower() != 'basic ':
+        return None, None
+    try:
+        username, _, password = base64.b64decode(header[6:].strip(), validate=True).decode('utf-8').partition(':')
+    except (ValueError, UnicodeDecodeError):
+        return None, None
+    return username, password
+
+def normalize_path(path):
+    """Normaliser un chemin d'URL (décodage, '..', barres multiples) avant de le comparer aux règles d'accès."""
+    path = unquote(str(path).split('?', 1)[0].split('#', 1)[0])
+    return posixpath.normpath('/' + path.lstrip('/'))
+
+def session_from_cookie(header):
+    """Extraire le jeton de session d'un en-tête Cookie."""
+    for part in (header or '').split(';'):
+        name, _, value = part.strip().partition('=')
+        if name == SESSION_COOKIE:
+            return value
+    return None
+
+class SessionCache:
+    """Sessions en mémoire (jeton -> utilisateur) avec expiration glissante."""
+
+    def __init__(self, ttl=3600, max_sessions=10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def put(self, key, username):
+        with self._lock:
+            if len(self._entries) >= self.max_sessions:
+                now = time.monotonic()
+                for expired in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                    del self._entries[expired]
+                # Toujours plein : les plus anciennes sessions sont retirées en premier
+                while len(self._entries) >= self.max_sessions:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (username, time.monotonic() + self.ttl)
+
+    def create(self, username):
+        """Ouvrir une session ; retourne son jeton."""
+        token = secrets.token_urlsafe(32)
+        self.put(token, username)
+        return token
+
+    def get(self, key):
+        """Obtenir l'utilisateur d'une session valide (et prolonger la session), ou None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if entry[1] <= now:
+                self._entries.pop(key, None)
+                return None
+            # Une session fermée entre-temps (drop_user) ne doit pas être prolongée
+            if key not in self._entries:
+                return None
+            self._entries[key] = (entry[0], now + self.ttl)
+        return entry[0]
+
+    def drop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def drop_user(self, username):
+        """Fermer toutes les sessions d'un utilisateur (changement de mot de passe, suppression)."""
+        with self._lock:
+            for key in [k for k, (user, _) in self._entries.items() if user == username]:
+                del self._entries[key]
 
 class UserManager:
-    def __init__(self, users_file='users.json'):
-        self.users_file = users_file
-        self.users = self.load_users()
+    """Utilisateurs, rôles et règles d'accès par chemin dans une base SQLite (mode WAL)."""
+
+    def __init__(self, db_file='users.db', iterations=PBKDF2_ITERATIONS, session_ttl=3600, json_file=None,
+                 pool_size=8):
+        self.db_file = db_file
+        # Ancien stockage, importé au premier démarrage puis supprimé
+        self.json_file = json_file or os.path.splitext(db_file)[0] + '.json'
+        self.iterations = iterations
+        self.sessions = SessionCache(session_ttl)
+        # Clé propre au processus : le cache des identifiants HTTP Basic ne contient pas les mots de passe
+        self._cache_key = secrets.token_bytes(32)
+        self._dummy_hash = None
+        # Connexions réutilisées par les threads du serveur ; SQLite sérialise les écritures, WAL laisse lire en parallèle
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        with self._connection() as conn, conn:
+            conn.executescript(SCHEMA)
+            conn.executemany('INSERT OR IGNORE INTO roles (name) VALUES (?)', [(role,) for role in DEFAULT_ROLES])
+        self._migrate()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_file, timeout=10, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._pool.qsize() < self.pool_size:
+                self._pool.put(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        """Fermer les connexions à la base de données."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _migrate(self):
+        """Importer l'ancien fichier JSON dans la base puis le supprimer ; les comptes déjà présents dans la base
+        sont conservés, les mots de passe en clair sont hachés à l'import."""
+        # Copie laissée par les versions précédentes de la migration, avec les mots de passe en clair
+        self._remove_legacy_file(self.json_file + '.migrated')
+        if not os.path.exists(self.json_file):
+            return
+        try:
+            with open(self.json_file, 'r') as f:
+                users = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to read {self.json_file}: {e}")
+            return
+        now = time.time()
+        rows = []
+        for username, user in users.items():
+            if not isinstance(user, dict):
+                continue
+            password = user.get('password')
+            if not isinstance(password, str) or not password:
+                logging.warning(f"Skipping user {username} from {self.json_file}: no password")
+                continue
+            if not password.startswith(HASH_SCHEME + '$'):
+                password = hash_password(password, self.iterations)
+            rows.append((str(username), password, user.get('role') or 'user', now))
+        with self._connection() as conn, conn:
+            conn.executemany('INSERT OR IGNORE INTO roles (name) VALUES (?)', {(row[2],) for row in rows})
+            imported = conn.executemany(
+                'INSERT OR IGNORE INTO users (username, password, role, created) VALUES (?, ?, ?, ?)', rows
+            ).rowcount
+        self._remove_legacy_file(self.json_file)
+        logging.info(f"Migrated {imported} users from {self.json_file} to {self.db_file}")
 
-    def load_users(self):
-        if os.path.exists(self.users_file):
-            with open(self.users_file, 'r') as f:
-                return json.load(f)
-        return {}
+    def _remove_legacy_file(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.error(f"Failed to remove {path} after migration: {e}")
+
+    def get_user(self, username):
+        """Obtenir un utilisateur (sans son condensat), ou None."""
+        with self._connection() as conn:
+            row = conn.execute('SELECT username, role, created FROM users WHERE username = ?', (username,)).fetchone()
+        return dict(row) if row else None
+
+    def count_users(self, role=None):
+        with self._connection() as conn:
+            if role is None:
+                return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+            return conn.execute('SELECT COUNT(*) FROM users WHERE role = ?', (role,)).fetchone()[0]
+
+    def list_users(self, offset=0, limit=100, role=None):
+        """Obtenir une page d'utilisateurs triés par nom."""
+        with self._connection() as conn:
+            if role is None:
+                rows = conn.execute('SELECT username, role, created FROM users ORDER BY username LIMIT ? OFFSET ?',
+                                    (limit, offset)).fetchall()
+            else:
+                rows = conn.execute('SELECT username, role, created FROM users WHERE role = ? '
+                                    'ORDER BY username LIMIT ? OFFSET ?', (role, limit, offset)).fetchall()
+        return [dict(row) for row in rows]
 
     def authenticate(self, username, password):
-        user = self.users.get(username)
-        return user and user['password'] == password
+        """Vérifier un mot de passe (dérivation complète, à réserver à la connexion)."""
+        with self._connection() as conn:
+            row = conn.execute('SELECT password FROM users WHERE username = ?', (username,)).fetchone()
+        if not row:
+            # Même coût qu'un utilisateur existant : pas d'indice sur les noms valides
+            if self._dummy_hash is None:
+                self._dummy_hash = hash_password(secrets.token_hex(8), self.iterations)
+            verify_password(self._dummy_hash, password, self.iterations)
+            return False
+        valid, needs_rehash = verify_password(row['password'], password, self.iterations)
+        if valid and needs_rehash:
+            with self._connection() as conn, conn:
+                # Condition sur l'ancien condensat : un changement de mot de passe concurrent n'est pas écrasé
+                conn.execute('UPDATE users SET password = ? WHERE username = ? AND password = ?',
+                             (hash_password(password, self.iterations), username, row['password']))
+            logging.info(f"Password hash upgraded for user {username}")
+        return valid
+
+    def login(self, username, password):
+        """Ouvrir une session ; retourne un jeton, ou None si les identifiants sont invalides."""
+        if not self.authenticate(username, password):
+            return None
+        return self.sessions.create(username)
+
+    def logout(self, token):
+        self.sessions.drop(token)
+
+    def validate_session(self, token):
+        """Obtenir l'utilisateur d'un jeton de session valide, ou None."""
+        username = self.sessions.get(token)
+        if username is None:
+            return None
+        user = self.get_user(username)
+        if user is None:
+            return None
+        return {'username': username, 'role': user['role']}
+
+    def authenticate_cached(self, username, password):
+        """Vérifier des identifiants HTTP Basic ; retourne le jeton de la session liée à ces identifiants, ou None.
+
+        La dérivation n'est faite qu'une fois par session, et un client qui renvoie les mêmes identifiants à chaque
+        requête (curl, scripts) réutilise toujours la même session au lieu d'en ouvrir une nouvelle.
+        """
+        digest = hmac.new(self._cache_key, f"{username}\0{password}".encode('utf-8'), hashlib.sha256).digest()
+        token = base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+        if self.sessions.get(token) == username and self.get_user(username):
+            return token
+        if not self.authenticate(username, password):
+            return None
+        self.sessions.put(token, username)
+        return token
 
     def add_user(self, username, password, role='user'):
-        self.users[username] = {'password': password, 'role': role}
-        self.save_users()
+        """Créer un utilisateur ou remplacer son mot de passe et son rôle."""
+        try:
+            with self._connection() as conn, conn:
+                conn.execute('INSERT INTO users (username, password, role, created) VALUES (?, ?, ?, ?) '
+                             'ON CONFLICT (username) DO UPDATE SET password = excluded.password, role = excluded.role',
+                             (username, hash_password(password, self.iterations), role, time.time()))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Unknown role {role}")
+        self.sessions.drop_user(username)
+
+    def set_role(self, username, role):
+        """Changer le rôle d'un utilisateur ; retourne False si l'utilisateur n'existe pas."""
+        try:
+            with self._connection() as conn, conn:
+                changed = conn.execute('UPDATE users SET role = ? WHERE username = ?', (role, username)).rowcount
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Unknown role {role}")
+        return bool(changed)
+
+    def remove_user(self, username):
+        with self._connection() as conn, conn:
+            removed = conn.execute('DELETE FROM users WHERE username = ?', (username,)).rowcount
+        if not removed:
+            return False
+        self.sessions.drop_user(username)
+        return True
+
+    def get_roles(self):
+        with self._connection() as conn:
+            return [row['name'] for row in conn.execute('SELECT name FROM roles ORDER BY name')]
+
+    def add_role(self, name):
+        with self._connection() as conn, conn:
+            return bool(conn.execute('INSERT OR IGNORE INTO roles (name) VALUES (?)', (name,)).rowcount)
+
+    def remove_role(self, name):
+        """Supprimer un rôle et ses règles ; refusé (False) tant que des utilisateurs l'ont."""
+        try:
+            with self._connection() as conn, conn:
+                return bool(conn.execute('DELETE FROM roles WHERE name = ?', (name,)).rowcount)
+        except sqlite3.IntegrityError:
+            return False
+
+    def set_access_rule(self, role, path, allow=True):
+        """Autoriser ou interdire à un rôle un chemin et tout ce qu'il contient."""
+        try:
+            with self._connection() as conn, conn:
+                conn.execute('INSERT INTO access_rules (role, path, allow) VALUES (?, ?, ?) '
+                             'ON CONFLICT (role, path) DO UPDATE SET allow = excluded.allow',
+                             (role, normalize_path(path), int(bool(allow))))
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Unknown role {role}")
+
+    def remove_access_rule(self, role, path):
+        with self._connection() as conn, conn:
+            return bool(conn.execute('DELETE FROM access_rules WHERE role = ? AND path = ?',
+                                     (role, normalize_path(path))).rowcount)
+
+    def get_access_rules(self, role=None):
+        with self._connection() as conn:
+            if role is None:
+                rows = conn.execute('SELECT role, path, allow FROM access_rules ORDER BY role, path').fetchall()
+            else:
+                rows = conn.execute('SELECT role, path, allow FROM access_rules WHERE role = ? ORDER BY path',
+                                    (role,)).fetchall()
+        return [{'role': row['role'], 'path': row['path'], 'allow': bool(row['allow'])} for row in rows]
+
+    def is_allowed(self, username, *paths, case_sensitive=True):
+        """Vérifier l'accès d'un utilisateur à des chemins (tous doivent être autorisés) : la règle la plus précise
+        l'emporte, autorisé sans règle ; case_sensitive=False pour un système de fichiers insensible à la casse."""
+        with self._connection() as conn:
+            rows = conn.execute('SELECT r.path, r.allow FROM users u LEFT JOIN access_rules r ON r.role = u.role '
+                                'WHERE u.username = ?', (username,)).fetchall()
+        if not rows:
+            return False
+        rules = [(row['path'] if case_sensitive else row['path'].casefold(), bool(row['allow']))
+                 for row in rows if row['path'] is not None]
+        for path in paths:
+            path = normalize_path(path)
+            if not case_sensitive:
+                path = path.casefold()
+            best, allowed = -1, True
+            for rule, allow in rules:
+                if len(rule) > best and (rule == '/' or path == rule or path.startswith(rule + '/')):
+                    best, allowed = len(rule), allow
+            if not allowed:
+                return False
+        return True
+
+def main(argv=None):
+    import argparse
+    import getpass
+    parser = argparse.ArgumentParser(description="Manage web server and API users, roles and access rules.")
+    parser.add_argument('action', choices=['add', 'remove', 'list', 'allow', 'deny', 'rules'])
+    parser.add_argument('name', nargs='?', help="user name (role name for allow, deny and rules)")
+    parser.add_argument('--role', default='user')
+    parser.add_argument('--path', help="URL path prefix for allow and deny")
+    parser.add_argument('--db', default='users.db')
+    args = parser.parse_args(argv)
+
+    manager = UserManager(args.db)
+    if args.action == 'list':
+        offset = 0
+        while True:
+            users = manager.list_users(offset, 1000)
+            for user in users:
+                print(f"{user['username']}\t{user['role']}")
+            if len(users) < 1000:
+                break
+            offset += len(users)
+    elif args.action == 'rules':
+        for rule in manager.get_access_rules(args.name):
+            print(f"{rule['role']}\t{'allow' if rule['allow'] else 'deny'}\t{rule['path']}")
+    elif not args.name:
+        parser.error("name is required")
+    elif args.action in ('allow', 'deny'):
+        if not args.path:
+            parser.error("--path is required")
+        manager.add_role(args.name)
+        manager.set_access_rule(args.name, args.path, args.action == 'allow')
+    elif args.action == 'add':
+        manager.add_role(args.role)
+        manager.add_user(args.name, getpass.getpass(f"Password for {args.name}: "), args.role)
+    elif not manager.remove_user(args.name):
+        parser.error(f"unknown user {args.name}")
 
-    def save_users(self):
-        with open(self.users_file, 'w') as f:
-            json.dump(self.users, f)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,281 @@
 import ssl
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import socket
+import logging
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 import threading
 import os
 
+from asset_optimizer import best_variant
+from user_manager import SESSION_COOKIE, parse_basic_auth, session_from_cookie
+
+AUTH_REALM = 'Port Forwarding App'
+
+def is_case_sensitive(directory):
+    """Vérifier si le système de fichiers d'un répertoire distingue les majuscules (faux sous Windows et macOS)."""
+    parent, name = os.path.split(os.path.abspath(directory))
+    if name.swapcase() == name:
+        return os.path.normcase('A') == 'A'
+    try:
+        return not os.path.samefile(os.path.join(parent, name), os.path.join(parent, name.swapcase()))
+    except OSError:
+        # Le nom avec la casse inversée n'existe pas
+        return True
+
+class UploadRequestHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        self.new_session = None
+        super().__init__(*args, **kwargs)
+
+    def authorize(self):
+        """Vérifier le cookie de session ou les identifiants HTTP Basic ; répondre 401 sinon."""
+        user_manager = getattr(self.server, 'user_manager', None)
+        if not getattr(self.server, 'auth_required', False) or user_manager is None:
+            return True
+        token = session_from_cookie(self.headers.get('Cookie'))
+        user = user_manager.validate_session(token) if token else None
+        if user:
+            return self.check_access(user_manager, user['username'])
+        username, password = parse_basic_auth(self.headers.get('Authorization'))
+        if username is not None:
+            session = user_manager.authenticate_cached(username, password)
+            if session:
+                # Session liée aux identifiants : le cookie n'est envoyé qu'aux clients qui ne le présentent pas déjà
+                if session != token:
+                    self.new_session = session
+                return self.check_access(user_manager, username)
+            ban_manager = getattr(self.server, 'ban_manager', None)
+            if ban_manager:
+                ban_manager.record(self.client_address[0], 'auth_failure')
+        self.send_response(401)
+        self.send_header('WWW-Authenticate', f'Basic realm="{AUTH_REALM}", charset="UTF-8"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return False
+
+    def access_paths(self):
+        """Chemins soumis aux règles d'accès : celui du fichier demandé et, pour une variante, celui de l'original."""
+        file_path = SimpleHTTPRequestHandler.translate_path(self, self.path)
+        relative = os.path.relpath(file_path, self.directory).replace(os.sep, '/')
+        path = '/' if relative == '.' else '/' + relative
+        original = self.original_of(file_path)
+        if original is None:
+            return (path,)
+        return (path, '/' + os.path.relpath(original, self.directory).replace(os.sep, '/'))
+
+    def original_of(self, file_path):
+        """Original d'une variante créée par l'optimiseur, None pour un fichier de l'utilisateur."""
+        variant_original = getattr(self.server, 'variant_original', None)
+        if variant_original is None:
+            return None
+        return variant_original(file_path, case_sensitive=getattr(self.server, 'case_sensitive', True))
+
+    def check_access(self, user_manager, username):
+        """Appliquer les règles d'accès par chemin du rôle de l'utilisateur ; répondre 403 sinon."""
+        if user_manager.is_allowed(username, *self.access_paths(),
+                                   case_sensitive=getattr(self.server, 'case_sensitive', True)):
+            return True
+        self.send_response(403)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return False
+
+    def end_headers(self):
+        if self.new_session:
+            secure = '; Secure' if getattr(self.server, 'ssl_context', None) else ''
+            self.send_header('Set-Cookie', f"{SESSION_COOKIE}={self.new_session}; Path=/; HttpOnly; SameSite=Strict{secure}")
+            self.new_session = None
+        super().end_headers()
+
+    def parse_request(self):
+        """Compter chaque requête, et non chaque connexion, pour la règle des rafales ('request')."""
+        if not super().parse_request():
+            return False
+        ban_manager = getattr(self.server, 'ban_manager', None)
+        if ban_manager and ban_manager.record(self.client_address[0], 'request'):
+            # Adresse bannie pendant une connexion persistante : fermée sans réponse, comme à l'acceptation
+            self.close_connection = True
+            return False
+        return True
+
+    def do_GET(self):
+        if self.authorize():
+            super().do_GET()
+
+    def do_HEAD(self):
+        if self.authorize():
+            super().do_HEAD()
+
+    def translate_path(self, path):
+        """Servir la variante optimisée la plus légère, si elle existe et que l'optimisation est activée."""
+        file_path = super().translate_path(path)
+        if getattr(self.server, 'serve_variants', False) and os.path.isfile(file_path):
+            return best_variant(file_path, self.original_of)
+        return file_path
+
+    def send_error(self, code, message=None, explain=None):
+        ban_manager = getattr(self.server, 'ban_manager', None)
+        if ban_manager and code == 404:
+            ban_manager.record(self.client_address[0], 'not_found')
+        super().send_error(code, message, explain)
+
+class FilteringHTTPServer(ThreadingHTTPServer):
+    """Serveur qui écarte les adresses bloquées ou bannies dès l'acceptation, avant la poignée de main TLS.
+
+    Chaque connexion a son thread : une poignée de main lente ou une dérivation de mot de passe ne bloque pas
+    l'acceptation des autres clients.
+    """
+    ip_manager = None
+    ban_manager = None
+    user_manager = None
+    auth_required = False
+    ssl_context = None
+    handshake_timeout = 10
+    # Règles d'accès comparées sans tenir compte de la casse si le système de fichiers l'ignore
+    case_sensitive = True
+    # Variantes générées (FileManager.variant_original) et leur substitution à l'original
+    variant_original = None
+    serve_variants = False
+
+    def verify_request(self, request, client_address):
+        ip = client_address[0]
+        if self.ip_manager and not self.ip_manager.is_ip_allowed(ip):
+            return False
+        if self.ban_manager and self.ban_manager.is_banned(ip):
+            return False
+        return True
+
+    def finish_request(self, request, client_address):
+        if self.ssl_context is None:
+            super().finish_request(request, client_address)
+            return
+        # Poignée de main par connexion : un client lent ou invalide n'est imputé qu'à son adresse
+        request.settimeout(self.handshake_timeout)
+        try:
+            tls_request = self.ssl_context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError) as e:
+            logging.info(f"TLS handshake failed from {client_address[0]}: {e}")
+            if self.ban_manager:
+                self.ban_manager.record(client_address[0], 'tls_error')
+            return
+        tls_request.settimeout(None)
+        try:
+            super().finish_request(tls_request, client_address)
+        finally:
+            self.shutdown_request(tls_request)
+
 class WebServer:
     def __init__(self, upload_dir):
         self.upload_dir = upload_dir
         self.httpd = None
         self.server_thread = None
+        # Fonction (chemin, case_sensitive) -> original d'une variante générée, voir FileManager.variant_original
+        self.variant_original = None
+        self.serve_variants = False
+        self.port = None
+        self.ban_manager = None
+        self.user_manager = None
+        self.auth_required = False
+        # Rappel (port, erreur) à la fin d'un changement de port demandé par la configuration
+        self.port_change_callback = None
+        self._port_lock = threading.Lock()
 
-    def start_server(self, port, ip_manager, ssl_enabled=False, certfile=None, keyfile=None):
-        os.chdir(self.upload_dir)
-        handler = SimpleHTTPRequestHandler
-        self.httpd = HTTPServer(('0.0.0.0', port), handler)
+    def start_server(self, port, ip_manager, ssl_enabled=False, certfile=None, keyfile=None, sock=None):
+        """Démarrer le serveur ; sock est un socket déjà réservé par NetworkScanner.reserve_port."""
+        handler = partial(UploadRequestHandler, directory=self.upload_dir)
+        if sock:
+            self.httpd = FilteringHTTPServer(sock.getsockname()[:2], handler, bind_and_activate=False)
+            self.httpd.socket.close()
+            self.httpd.socket = sock
+        else:
+            self.httpd = FilteringHTTPServer(('0.0.0.0', port), handler)
+        self.httpd.ip_manager = ip_manager
+        self.httpd.ban_manager = self.ban_manager
+        self.httpd.user_manager = self.user_manager
+        self.httpd.auth_required = self.auth_required
+        self.httpd.case_sensitive = is_case_sensitive(self.upload_dir)
+        self.httpd.variant_original = self.variant_original
+        self.httpd.serve_variants = self.serve_variants
+        self.port = self.httpd.socket.getsockname()[1]
         if ssl_enabled and certfile and keyfile:
-            self.httpd.socket = ssl.wrap_socket(self.httpd.socket, certfile=certfile, keyfile=keyfile, server_side=True)
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.ssl_context = context
         self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
         self.server_thread.start()
         return True
 
-    def stop_server(self):
+    def set_auth_required(self, required):
+        """Exiger ou non une connexion, y compris sur le serveur en cours d'exécution."""
+        self.auth_required = required
         if self.httpd:
+            self.httpd.auth_required = required
+
+    def set_serve_variants(self, enabled):
+        """Servir ou non les variantes optimisées, y compris sur le serveur en cours d'exécution."""
+        self.serve_variants = enabled
+        if self.httpd:
+            self.httpd.serve_variants = enabled
+
+    def change_port(self, port, sock=None):
+        """Passer sur un autre port sans interrompre les connexions déjà acceptées (bloquant, hors de l'interface)."""
+        with self._port_lock:
+            if not self.httpd:
+                return False
+            # Le nouveau socket est ouvert avant l'arrêt de la boucle : un port occupé laisse le serveur intact
+            if sock is None:
+                sock = socket.create_server(('0.0.0.0', port), backlog=self.httpd.request_queue_size)
+            old_socket = self.httpd.socket
+            # shutdown() arrête la boucle d'acceptation ; les connexions déjà acceptées continuent sur leur thread
             self.httpd.shutdown()
-            self.httpd.server_close()
-            self.httpd = None
+            self.server_thread.join()
+            # Boucle arrêtée : les clients en attente sur l'ancien port sont confiés à leur thread avant sa fermeture,
+            # pendant que ceux du nouveau port attendent dans sa file
+            old_socket.setblocking(False)
+            while True:
+                try:
+                    request, client_address = old_socket.accept()
+                except OSError:
+                    break
+                request.setblocking(True)
+                if self.httpd.verify_request(request, client_address):
+                    try:
+                        self.httpd.process_request(request, client_address)
+                    except Exception:
+                        self.httpd.handle_error(request, client_address)
+                        self.httpd.shutdown_request(request)
+                else:
+                    self.httpd.shutdown_request(request)
+            old_socket.close()
+            self.httpd.socket = sock
+            self.httpd.server_address = sock.getsockname()[:2]
+            self.httpd.server_port = self.port = self.httpd.server_address[1]
+            self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+            self.server_thread.start()
+        logging.info(f"Web server moved to port {self.port}")
+        return True
+
+    def _move_to_port(self, port):
+        """Changer de port sur un thread de travail et signaler le résultat."""
+        error = None
+        try:
+            self.change_port(port)
+        except OSError as e:
+            error = str(e)
+            logging.error(f"Failed to move web server to port {port}: {e}")
+        if self.port_change_callback:
+            self.port_change_callback(self.port, error)
+
+    def on_config_change(self, changes):
+        """Appliquer port et authentification au serveur en cours d'exécution ; le port change en arrière-plan."""
+        if 'web_auth_enabled' in changes:
+            self.set_auth_required(changes['web_auth_enabled'])
+        if 'port' in changes and self.httpd and changes['port'] != self.port:
+            threading.Thread(target=self._move_to_port, args=(changes['port'],), daemon=True).start()
+
+    def stop_server(self):
+        with self._port_lock:
+            if self.httpd:
+                self.httpd.shutdown()
+                self.httpd.server_close()
+                self.httpd = None